@@ -1,8 +1,15 @@
-from flask import Blueprint, request, jsonify
-from database.conector import DatabaseManager
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from database.conector import DatabaseManager, reter_conexoes_no_stream
+from psycopg2 import IntegrityError
 from datetime import datetime, date, timedelta
+from decimal import Decimal, InvalidOperation
+import csv
+import io
 import re
 
+from precificacao import carregar_contexto_devolucao, calcular_devolucao
+from paginacao import resposta_ndjson
+
 aluguel_blueprint = Blueprint("aluguel", __name__)
 
 # =========================================================
@@ -23,485 +30,387 @@ def parse_date(s):
         return None
 
 # =========================================================
-# Funções de Cálculo de Multas
+# 1) ABRIR LOCAÇÃO - RESERVA ATÔMICA DO CARRO
 # =========================================================
+# O UPDATE só casa se o carro ainda estiver DISPONIVEL e trava a linha até o
+# fim da transação: de duas reservas simultâneas da mesma placa, a segunda
+# reavalia o WHERE depois do COMMIT da primeira e não encontra o carro.
+# Aluguel e HistoricoAluguel são gravados no mesmo comando.
+QUERY_RESERVAR_PLACA = """
+    WITH carro AS (
+        UPDATE Carro c
+        SET status_carro = 'ALUGADO'
+        FROM Categoria cat
+        WHERE c.placa = %(placa)s
+        AND c.status_carro = 'DISPONIVEL'
+        AND cat.tipo = c.tipo_categoria
+        RETURNING c.placa, cat.preco_diaria
+    ),
+"""
+
+# Qualquer carro livre do modelo/categoria: SKIP LOCKED pula os carros que
+# outro balcão está reservando neste instante em vez de esperar por eles
+# (idx_carro_disponivel_modelo / idx_carro_disponivel_categoria)
+QUERY_RESERVAR_QUALQUER = """
+    WITH escolhido AS (
+        SELECT placa
+        FROM Carro
+        WHERE status_carro = 'DISPONIVEL'
+        AND (%(modelo)s::text IS NULL OR lower(nome) = lower(%(modelo)s::text))
+        AND (%(tipo_categoria)s::text IS NULL OR tipo_categoria = %(tipo_categoria)s::text)
+        ORDER BY placa
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ),
+    carro AS (
+        UPDATE Carro c
+        SET status_carro = 'ALUGADO'
+        FROM escolhido e, Categoria cat
+        WHERE c.placa = e.placa
+        AND cat.tipo = c.tipo_categoria
+        RETURNING c.placa, cat.preco_diaria
+    ),
+"""
+
+QUERY_INSERIR_LOCACAO = """
+    novo AS (
+        INSERT INTO Aluguel (data_retirada, data_prevista_devolucao, valor_previsto,
+                             num_funcionario, placa, cpf_cliente, seguro_contratado, km_previsto)
+        SELECT %(data_retirada)s, %(data_prevista)s,
+               ROUND(carro.preco_diaria * %(dias)s * %(fator_seguro)s, 2),
+               %(num_funcionario)s, carro.placa, %(cpf_cliente)s, %(seguro)s, %(km_previsto)s
+        FROM carro
+        RETURNING num_locacao, placa, cpf_cliente, valor_previsto
+    ),
+    historico AS (
+        INSERT INTO HistoricoAluguel (num_locacao, cpf)
+        SELECT num_locacao, cpf_cliente FROM novo
+    )
+    SELECT num_locacao, placa, valor_previsto FROM novo;
+"""
+
+QUERY_ACESSORIOS = "INSERT INTO Aluguel_Acessorio (num_locacao, tipo_acessorio) VALUES %s"
+
+FATOR_SEGURO = Decimal("1.20")  # +20% com seguro (mesma regra do alugar.js)
+
+def validar_reserva(data, required):
+    """Valida o corpo da reserva; retorna (params, acessorios, None) ou (None, None, (erro, status))"""
+    missing = validate_fields(data, required)
+    if missing:
+        return None, None, ({"erro": "Campos faltando", "campos": missing}, 400)
+
+    data_retirada = parse_date(data["data_retirada"])
+    data_prevista = parse_date(data["data_prevista_devolucao"])
+    if not data_retirada or not data_prevista:
+        return None, None, ({"erro": "Formato de data inválido. Use YYYY-MM-DD."}, 400)
+    if data_prevista <= data_retirada:
+        return None, None, ({"erro": "data_prevista_devolucao deve ser posterior a data_retirada."}, 400)
+
+    acessorios = data.get("acessorios") or []
+    if not isinstance(acessorios, list):
+        return None, None, ({"erro": "'acessorios' deve ser uma lista"}, 400)
+
+    # franquia de km contratada (opcional; sem ela a quilometragem é livre)
+    km_previsto = data.get("km_previsto")
+    if km_previsto in (None, ""):
+        km_previsto = None
+    elif isinstance(km_previsto, bool) or not str(km_previsto).isdigit():
+        return None, None, ({"erro": "'km_previsto' deve ser um inteiro não negativo"}, 400)
+    else:
+        km_previsto = int(km_previsto)
+
+    seguro = bool(data.get("seguro_contratado", False))
+    params = {
+        "cpf_cliente": re.sub(r"\D", "", str(data["cpf_cliente"])),
+        "num_funcionario": data["num_funcionario"],
+        "data_retirada": data_retirada,
+        "data_prevista": data_prevista,
+        "dias": (data_prevista - data_retirada).days,
+        "seguro": seguro,
+        "fator_seguro": FATOR_SEGURO if seguro else Decimal("1"),
+        "km_previsto": km_previsto,
+    }
+    return params, acessorios, None
+
+# Chaves estrangeiras que a locação pode violar -> (campo do corpo, mensagem)
+RESTRICOES_LOCACAO = {
+    "aluguel_cpf_cliente_fkey": ("cpf_cliente", "Cliente inexistente"),
+    "historicoaluguel_cpf_fkey": ("cpf_cliente", "Cliente inexistente"),
+    "aluguel_num_funcionario_fkey": ("num_funcionario", "Funcionário inexistente"),
+    "aluguel_acessorio_tipo_acessorio_fkey": ("acessorios", "Acessório inexistente"),
+}
+
+def erro_integridade_locacao(e):
+    """Traduz a IntegrityError da gravação da locação em (corpo, status) com a causa real
+
+    Serve aos dois drivers: psycopg2 expõe o SQLSTATE em `pgcode`, psycopg 3 em `sqlstate`.
+    """
+    codigo = getattr(e, "pgcode", None) or getattr(e, "sqlstate", None)
+    restricao = e.diag.constraint_name
+    if restricao in RESTRICOES_LOCACAO:
+        campo, msg = RESTRICOES_LOCACAO[restricao]
+        return {"erro": msg, "campo": campo}, 400
+    if codigo == "23505":  # unique_violation
+        return {"erro": "Locação conflita com um registro existente", "restricao": restricao}, 409
+    if codigo == "23514":  # check_violation
+        return {"erro": "Dados da locação violam uma regra do banco", "restricao": restricao}, 400
+    return {"erro": "Dados da locação inválidos", "restricao": restricao}, 400
+
+def ler_reserva(data, required):
+    """validar_reserva() com o erro já em resposta JSON"""
+    params, acessorios, erro = validar_reserva(data, required)
+    if erro:
+        return None, None, (jsonify(erro[0]), erro[1])
+    return params, acessorios, None
+
+def registrar_locacao(db, query_reserva, params, acessorios):
+    """Reserva o carro e grava a locação em uma transação; None se nenhum carro foi reservado"""
+    with db.transaction():
+        locacao = db.execute_insert_returning(query_reserva + QUERY_INSERIR_LOCACAO, params)
+        if locacao:
+            db.execute_many(
+                QUERY_ACESSORIOS,
+                [(locacao["num_locacao"], tipo) for tipo in dict.fromkeys(acessorios)]
+            )
+    return locacao
 
-def calcular_multa_atraso(db, num_locacao, data_devolucao):
-    """Calcula multa por atraso na devolução"""
-    try:
-        # Buscar data prevista e preço da diária
-        query = """
-            SELECT a.data_prevista_devolucao, cat.preco_diaria
-            FROM Aluguel a
-            JOIN Carro c ON a.placa = c.placa
-            JOIN Categoria cat ON c.tipo_categoria = cat.tipo
-            WHERE a.num_locacao = %s
-        """
-        aluguel = db.execute_select_one(query, (num_locacao,))
-        
-        if not aluguel:
-            return 0, 0
-        
-        data_prevista = aluguel['data_prevista_devolucao']
-        preco_diaria = float(aluguel['preco_diaria'])
-        
-        if data_devolucao <= data_prevista:
-            return 0, 0
-        
-        dias_atraso = (data_devolucao - data_prevista).days
-        valor_multa = dias_atraso * preco_diaria * 0.5  # 50% da diária por dia
-        
-        return valor_multa, dias_atraso
-        
-    except Exception as e:
-        print(f"Erro ao calcular multa por atraso: {e}")
-        return 0, 0
-
-def calcular_multa_tanque(combustivel_completo):
-    """Calcula multa por tanque não cheio"""
-    if not combustivel_completo:
-        return 100.00  # Valor fixo de R$ 100,00
-    return 0.00
+def corpo_locacao_criada(locacao):
+    return {
+        "mensagem": "Aluguel criado com sucesso!",
+        "num_locacao": locacao["num_locacao"],
+        "placa": locacao["placa"],
+        "valor_previsto": locacao["valor_previsto"]
+    }
 
-def calcular_multa_danos(valor_danos):
-    """Calcula multa por danos no veículo"""
-    try:
-        return float(valor_danos or 0)
-    except (ValueError, TypeError):
-        return 0.00
+def locacao_criada(locacao):
+    return jsonify(corpo_locacao_criada(locacao)), 201
 
-def calcular_multa_km(db, num_locacao, km_registro):
-    """Calcula multa por excesso de quilometragem"""
-    try:
-        # Buscar km previsto
-        query = "SELECT km_previsto FROM Aluguel WHERE num_locacao = %s"
-        aluguel = db.execute_select_one(query, (num_locacao,))
-        
-        if not aluguel or not aluguel.get('km_previsto'):
-            return 0, 0
-        
-        km_previsto = aluguel['km_previsto']
-        km_excedente = max(km_registro - km_previsto, 0)
-        valor_por_km = 0.50  # R$ 0,50 por km excedente
-        valor_multa = km_excedente * valor_por_km
-        
-        return valor_multa, km_excedente
-        
-    except Exception as e:
-        print(f"Erro ao calcular multa por km: {e}")
-        return 0, 0
+@aluguel_blueprint.route("/aluguel", methods=["POST"])
+def abrir_locacao():
+    data = request.json or {}
+    required = ["placa", "cpf_cliente", "num_funcionario", "data_retirada", "data_prevista_devolucao"]
+    params, acessorios, erro = ler_reserva(data, required)
+    if erro:
+        return erro
+    params["placa"] = data["placa"]
 
-def calcular_multa_atraso_progressivo(db, num_locacao, data_devolucao):
-    """Calcula multa progressiva por atraso"""
+    db = DatabaseManager()
     try:
-        query = """
-            SELECT a.data_prevista_devolucao, cat.preco_diaria
-            FROM Aluguel a
-            JOIN Carro c ON a.placa = c.placa
-            JOIN Categoria cat ON c.tipo_categoria = cat.tipo
-            WHERE a.num_locacao = %s
-        """
-        aluguel = db.execute_select_one(query, (num_locacao,))
-        
-        if not aluguel:
-            return 0, 0
-        
-        data_prevista = aluguel['data_prevista_devolucao']
-        preco_diaria = float(aluguel['preco_diaria'])
-        
-        if data_devolucao <= data_prevista:
-            return 0, 0
-        
-        dias_atraso = (data_devolucao - data_prevista).days
-        
-        # Faixas progressivas
-        if dias_atraso <= 3:
-            multiplicador = 0.5  # 50% da diária
-        elif dias_atraso <= 7:
-            multiplicador = 1.0  # 100% da diária
-        else:
-            multiplicador = 1.5  # 150% da diária
-        
-        valor_multa = dias_atraso * preco_diaria * multiplicador
-        return valor_multa, dias_atraso
-        
+        locacao = registrar_locacao(db, QUERY_RESERVAR_PLACA, params, acessorios)
+
+        if not locacao:
+            carro = db.execute_select_one("SELECT status_carro FROM Carro WHERE placa = %s", (data["placa"],))
+            if not carro:
+                return jsonify({"erro": "Carro inexistente"}), 404
+            return jsonify({
+                "erro": "Carro indisponível para locação",
+                "status_carro": carro["status_carro"]
+            }), 409
+
+        return locacao_criada(locacao)
+
+    except IntegrityError as e:
+        # a transação inteira foi desfeita: nem o carro ficou reservado
+        corpo, status = erro_integridade_locacao(e)
+        return jsonify(corpo), status
     except Exception as e:
-        print(f"Erro ao calcular multa progressiva: {e}")
-        return 0, 0
+        return internal_error(f"Erro ao abrir locação: {str(e)}")
 
 # =========================================================
-# Funções de Cálculo de Descontos
+# 2) ABRIR LOCAÇÃO - QUALQUER CARRO DO MODELO/CATEGORIA
 # =========================================================
+@aluguel_blueprint.route("/aluguel/auto", methods=["POST"])
+def abrir_locacao_automatica():
+    data = request.json or {}
+    if not data.get("modelo") and not data.get("tipo_categoria"):
+        return jsonify({"erro": "Informe 'modelo' ou 'tipo_categoria'"}), 400
 
-def calcular_desconto_cliente_fiel(db, cpf_cliente):
-    """Desconto para clientes com 5 ou mais locações"""
-    try:
-        query = "SELECT COUNT(*) as total FROM Aluguel WHERE cpf_cliente = %s"
-        resultado = db.execute_select_one(query, (cpf_cliente,))
-        
-        if resultado and resultado['total'] >= 5:
-            return 50.00  # R$ 50,00 fixo
-        return 0.00
-    except Exception as e:
-        print(f"Erro ao calcular desconto fidelidade: {e}")
-        return 0.00
+    required = ["cpf_cliente", "num_funcionario", "data_retirada", "data_prevista_devolucao"]
+    params, acessorios, erro = ler_reserva(data, required)
+    if erro:
+        return erro
+    params["modelo"] = (data.get("modelo") or "").strip() or None
+    params["tipo_categoria"] = data.get("tipo_categoria") or None
 
-def calcular_desconto_reserva_antecipada(db, num_locacao):
-    """Desconto por reserva antecipada (mais de 7 dias)"""
+    db = DatabaseManager()
     try:
-        query = "SELECT data_retirada FROM Aluguel WHERE num_locacao = %s"
-        aluguel = db.execute_select_one(query, (num_locacao,))
-        
-        if not aluguel:
-            return 0.00
-        
-        # Se a data de retirada for mais de 7 dias após a data atual de criação
-        # (Aqui estamos usando a data atual como proxy para data da reserva)
-        dias_antecedencia = (aluguel['data_retirada'] - date.today()).days
-        
-        if dias_antecedencia >= 7:
-            return 30.00  # R$ 30,00 fixo
-        return 0.00
-        
-    except Exception as e:
-        print(f"Erro ao calcular desconto reserva antecipada: {e}")
-        return 0.00
+        locacao = registrar_locacao(db, QUERY_RESERVAR_QUALQUER, params, acessorios)
 
-def calcular_desconto_sem_multas(db, cpf_cliente, num_locacao_atual):
-    """Desconto por não ter multas nas últimas 5 locações"""
-    try:
-        # Buscar últimas 5 locações (excluindo a atual)
-        query = """
-            SELECT a.num_locacao
-            FROM Aluguel a
-            WHERE a.cpf_cliente = %s AND a.num_locacao != %s
-            ORDER BY a.data_retirada DESC
-            LIMIT 5
-        """
-        locacoes = db.execute_select_all(query, (cpf_cliente, num_locacao_atual))
-        
-        if len(locacoes) < 5:
-            return 0.00
-        
-        # Verificar se alguma dessas locações teve multa
-        for locacao in locacoes:
-            query_multas = """
-                SELECT 1 FROM Multa m
-                JOIN Pagamento p ON m.num_pagamento = p.num_pagamento
-                JOIN Devolucao d ON d.num_pagamento = p.num_pagamento
-                WHERE d.num_locacao = %s
-            """
-            tem_multa = db.execute_select_one(query_multas, (locacao['num_locacao'],))
-            if tem_multa:
-                return 0.00
-        
-        return 40.00  # R$ 40,00 fixo
-        
-    except Exception as e:
-        print(f"Erro ao calcular desconto sem multas: {e}")
-        return 0.00
+        if not locacao:
+            return jsonify({
+                "erro": "Nenhum carro disponível para o modelo/categoria informado",
+                "modelo": params["modelo"],
+                "tipo_categoria": params["tipo_categoria"]
+            }), 409
 
-def calcular_desconto_todas_categorias(db, cpf_cliente):
-    """Desconto por ter alugado todas as categorias"""
-    try:
-        query = """
-            SELECT COUNT(DISTINCT c.tipo_categoria) as categorias_utilizadas
-            FROM Aluguel a
-            JOIN Carro c ON a.placa = c.placa
-            WHERE a.cpf_cliente = %s
-        """
-        resultado = db.execute_select_one(query, (cpf_cliente,))
-        
-        total_categorias_query = "SELECT COUNT(*) as total FROM Categoria"
-        total_categorias = db.execute_select_one(total_categorias_query)
-        
-        if (resultado and total_categorias and 
-            resultado['categorias_utilizadas'] == total_categorias['total']):
-            return 60.00  # R$ 60,00 fixo
-        return 0.00
-        
-    except Exception as e:
-        print(f"Erro ao calcular desconto todas categorias: {e}")
-        return 0.00
+        return locacao_criada(locacao)
 
-def calcular_desconto_todos_acessorios(db, cpf_cliente):
-    """Desconto por ter usado todos os acessórios"""
-    try:
-        query = """
-            SELECT COUNT(DISTINCT aa.tipo_acessorio) as acessorios_utilizados
-            FROM Aluguel a
-            JOIN Aluguel_Acessorio aa ON a.num_locacao = aa.num_locacao
-            WHERE a.cpf_cliente = %s
-        """
-        resultado = db.execute_select_one(query, (cpf_cliente,))
-        
-        total_acessorios_query = "SELECT COUNT(*) as total FROM Acessorio"
-        total_acessorios = db.execute_select_one(total_acessorios_query)
-        
-        if (resultado and total_acessorios and 
-            resultado['acessorios_utilizados'] == total_acessorios['total']):
-            return 45.00  # R$ 45,00 fixo
-        return 0.00
-        
+    except IntegrityError as e:
+        corpo, status = erro_integridade_locacao(e)
+        return jsonify(corpo), status
     except Exception as e:
-        print(f"Erro ao calcular desconto todos acessórios: {e}")
-        return 0.00
+        return internal_error(f"Erro ao abrir locação: {str(e)}")
 
 # =========================================================
 # 4) REALIZAR DEVOLUÇÃO - ATUALIZADA COM MULTAS E DESCONTOS
 # =========================================================
+QUERY_PAGAMENTO = "INSERT INTO Pagamento (valor_total, forma_pagamento) VALUES (%s, %s) RETURNING num_pagamento;"
+QUERY_DEVOLUCAO = """
+    INSERT INTO Devolucao 
+    (num_locacao, num_pagamento, combustivel_completo, estado_carro, data_real_devolucao, km_registro, valor_danos)
+    VALUES (%s, %s, %s, %s, %s, %s, %s);
+"""
+QUERY_MULTAS = "INSERT INTO Multa (num_pagamento, tipo_multa, valor, codigo_motivo, referencia) VALUES %s"
+QUERY_DESCONTOS = "INSERT INTO Desconto (num_pagamento, tipo_desconto, valor, codigo_desconto, flag_ativo) VALUES %s"
+QUERY_MANUTENCAO = """
+    INSERT INTO Manutencao (placa_carro, custo, data_inicio, descricao) 
+    VALUES (%s, %s, %s, %s) 
+    RETURNING num_manutencao;
+"""
+LIMITE_VALOR_DANOS = Decimal("100000000")  # maior valor de NUMERIC(10,2) + 0.01
+
+def validar_devolucao(data):
+    """Valida o corpo da devolução; retorna None ou (erro, status)"""
+    missing = validate_fields(data, ["num_locacao", "estado_carro", "combustivel_completo"])
+    if missing:
+        return {"erro": "Campos faltando", "campos": missing}, 400
+
+    km_registro = data.get("km_registro")
+    if km_registro not in (None, ""):
+        if isinstance(km_registro, bool) or not str(km_registro).isdigit():
+            return {"erro": "'km_registro' deve ser um inteiro não negativo"}, 400
+        data["km_registro"] = int(km_registro)
+
+    # Devolucao.valor_danos é NUMERIC(10,2) com CHECK >= 0: fora disso o INSERT daria 500
+    valor_danos = data.get("valor_danos")
+    if valor_danos not in (None, ""):
+        try:
+            valor = Decimal(str(valor_danos))
+            valido = not isinstance(valor_danos, bool) and valor.is_finite() and 0 <= valor < LIMITE_VALOR_DANOS
+        except (InvalidOperation, ValueError):
+            valido = False
+        if not valido:
+            return {"erro": "'valor_danos' deve ser um número entre 0 e 99999999.99"}, 400
+    return None
+
+TERMOS_DANO = ("BATIDO", "AVARIA", "QUEBRADO", "AMASSADO", "COLISAO", "COLISÃO", "COLIDIDO", "DANIFICADO")
+
+def descricao_manutencao(estado, multa_danos):
+    """Descrição da manutenção a abrir na devolução, ou None se o carro volta DISPONIVEL"""
+    if any(tok in estado for tok in TERMOS_DANO) or multa_danos > 0:
+        return f"Manutenção necessária: {estado}" if multa_danos == 0 else f"Manutenção por danos no valor de R$ {multa_danos}"
+    return None
+
+def corpo_devolucao(calculo, num_pagamento, data_devolucao, novo_status, novo_num_manut):
+    response_data = {
+        "mensagem": "Devolução realizada com sucesso!",
+        "num_pagamento": num_pagamento,
+        "resumo_financeiro": {
+            "valor_base": calculo["valor_base"],
+            "total_multas": calculo["valor_total_multas"],
+            "total_descontos": calculo["valor_total_descontos"],
+            "valor_final": calculo["valor_final"]
+        },
+        "multas_aplicadas": calculo["multas"],
+        "descontos_aplicados": calculo["descontos"],
+        "detalhes": {
+            "dias_locacao": calculo["dias_locacao"],
+            "data_devolucao": data_devolucao.isoformat(),
+            "status_carro": novo_status
+        }
+    }
+    
+    if calculo["dias_atraso"] > 0:
+        response_data["detalhes"]["dias_atraso"] = calculo["dias_atraso"]
+        
+    if novo_num_manut:
+        response_data["num_manutencao"] = novo_num_manut
+        response_data["observacao"] = "Carro enviado para manutenção."
+    return response_data
+
 @aluguel_blueprint.route("/aluguel/devolver", methods=["POST"])
 def devolver_carro():
     data = request.json or {}
-    required = ["num_locacao", "estado_carro", "combustivel_completo"]
-    missing = validate_fields(data, required)
-    if missing:
-        return jsonify({"erro": "Campos faltando", "campos": missing}), 400
+    erro = validar_devolucao(data)
+    if erro:
+        return jsonify(erro[0]), erro[1]
 
     db = DatabaseManager()
     try:
-        # 1) Buscar aluguel e verificar se não foi devolvido
-        aluguel = db.execute_select_one("""
-            SELECT a.*, c.tipo_categoria, cat.preco_diaria, c.placa, a.cpf_cliente
-            FROM Aluguel a
-            JOIN Carro c ON a.placa = c.placa
-            JOIN Categoria cat ON c.tipo_categoria = cat.tipo
-            WHERE a.num_locacao = %s 
-            AND NOT EXISTS (
-                SELECT 1 FROM Devolucao d WHERE d.num_locacao = a.num_locacao
-            )
-        """, (data["num_locacao"],))
-        
+        # 1) Buscar aluguel em aberto e histórico do cliente (uma consulta)
+        aluguel = carregar_contexto_devolucao(db, data["num_locacao"])
+
         if not aluguel:
             return jsonify({"erro": "Aluguel não encontrado ou já devolvido"}), 404
 
         placa = aluguel["placa"]
-        cpf_cliente = aluguel["cpf_cliente"]
         data_devolucao = date.today()
 
-        # 2) Calcular valor base do aluguel
-        data_prevista = aluguel["data_prevista_devolucao"]
-        dias_locacao = max((data_devolucao - aluguel["data_retirada"]).days, 1)
-        valor_base = float(aluguel["preco_diaria"]) * dias_locacao
-
-        # 3) CALCULAR MULTAS
-        multas = []
-        valor_total_multas = 0.0
-
-        # Multa por Atraso
-        multa_atraso, dias_atraso = calcular_multa_atraso(db, data["num_locacao"], data_devolucao)
-        if multa_atraso > 0:
-            multas.append({
-                "tipo": "ATRASO",
-                "valor": multa_atraso,
-                "referencia": f"{dias_atraso} dias",
-                "codigo_motivo": "ATRASO"
-            })
-            valor_total_multas += multa_atraso
-
-        # Multa por Tanque não cheio
-        multa_tanque = calcular_multa_tanque(data["combustivel_completo"])
-        if multa_tanque > 0:
-            multas.append({
-                "tipo": "TANQUE_NAO_CHEIO",
-                "valor": multa_tanque,
-                "referencia": None,
-                "codigo_motivo": "TANQUE"
-            })
-            valor_total_multas += multa_tanque
-
-        # Multa por Danos
-        valor_danos = data.get("valor_danos", 0)
-        multa_danos = calcular_multa_danos(valor_danos)
-        if multa_danos > 0:
-            multas.append({
-                "tipo": "DANOS_VEICULO",
-                "valor": multa_danos,
-                "referencia": f"Valor danos: R$ {multa_danos}",
-                "codigo_motivo": "DANO"
-            })
-            valor_total_multas += multa_danos
-
-        # Multa por Quilometragem (se km_registro fornecido)
-        km_registro = data.get("km_registro")
-        if km_registro:
-            multa_km, km_excedente = calcular_multa_km(db, data["num_locacao"], km_registro)
-            if multa_km > 0:
-                multas.append({
-                    "tipo": "EXCESSO_QUILOMETRAGEM",
-                    "valor": multa_km,
-                    "referencia": f"{km_excedente} km excedentes",
-                    "codigo_motivo": "KM_EXC"
-                })
-                valor_total_multas += multa_km
-
-        # 4) CALCULAR DESCONTOS
-        descontos = []
-        valor_total_descontos = 0.0
-
-        # Desconto Cliente Fiel
-        desc_fiel = calcular_desconto_cliente_fiel(db, cpf_cliente)
-        if desc_fiel > 0:
-            descontos.append({
-                "tipo": "CLIENTE_FIEL",
-                "valor": desc_fiel,
-                "codigo_desconto": "LOYALTY_50"
-            })
-            valor_total_descontos += desc_fiel
-
-        # Desconto Reserva Antecipada
-        desc_reserva = calcular_desconto_reserva_antecipada(db, data["num_locacao"])
-        if desc_reserva > 0:
-            descontos.append({
-                "tipo": "RESERVA_ANTECIPADA",
-                "valor": desc_reserva,
-                "codigo_desconto": "EARLY_BOOKING"
-            })
-            valor_total_descontos += desc_reserva
-
-        # Desconto Sem Multas
-        desc_sem_multas = calcular_desconto_sem_multas(db, cpf_cliente, data["num_locacao"])
-        if desc_sem_multas > 0:
-            descontos.append({
-                "tipo": "SEM_MULTAS",
-                "valor": desc_sem_multas,
-                "codigo_desconto": "NOFINE"
-            })
-            valor_total_descontos += desc_sem_multas
-
-        # Desconto Todas Categorias
-        desc_categorias = calcular_desconto_todas_categorias(db, cpf_cliente)
-        if desc_categorias > 0:
-            descontos.append({
-                "tipo": "TODAS_CATEGORIAS",
-                "valor": desc_categorias,
-                "codigo_desconto": "ALLCATS"
-            })
-            valor_total_descontos += desc_categorias
-
-        # Desconto Todos Acessórios
-        desc_acessorios = calcular_desconto_todos_acessorios(db, cpf_cliente)
-        if desc_acessorios > 0:
-            descontos.append({
-                "tipo": "TODOS_ACESSORIOS",
-                "valor": desc_acessorios,
-                "codigo_desconto": "ALLACC"
-            })
-            valor_total_descontos += desc_acessorios
-
-        # 5) Calcular valor final
-        valor_final = valor_base + valor_total_multas - valor_total_descontos
-        valor_final = max(valor_final, 0)  # Não permitir valor negativo
-
-        # 6) Criar Pagamento
-        query_pag = "INSERT INTO Pagamento (valor_total, forma_pagamento) VALUES (%s, %s) RETURNING num_pagamento;"
-        forma_pagamento = data.get("forma_pagamento", "Cartão Crédito")
-        pag = db.execute_insert_returning(query_pag, (valor_final, forma_pagamento))
-        num_pagamento_final = pag["num_pagamento"]
-
-        # 7) Inserir Devolucao com dados adicionais
-        query_dev = """
-            INSERT INTO Devolucao 
-            (num_locacao, num_pagamento, combustivel_completo, estado_carro, data_real_devolucao, km_registro, valor_danos)
-            VALUES (%s, %s, %s, %s, %s, %s, %s);
-        """
-        db.execute_statement(query_dev, (
-            data["num_locacao"],
-            num_pagamento_final,
-            data["combustivel_completo"],
-            data["estado_carro"],
-            data_devolucao,
-            km_registro,
-            valor_danos
-        ))
-
-        # 8) Registrar Multas no banco
-        for multa in multas:
-            db.execute_statement(
-                "INSERT INTO Multa (num_pagamento, tipo_multa, valor, codigo_motivo, referencia) VALUES (%s, %s, %s, %s, %s)",
-                (num_pagamento_final, multa["tipo"], multa["valor"], multa["codigo_motivo"], multa["referencia"])
-            )
-
-        # 9) Registrar Descontos no banco
-        for desconto in descontos:
-            db.execute_statement(
-                "INSERT INTO Desconto (num_pagamento, tipo_desconto, valor, codigo_desconto, flag_ativo) VALUES (%s, %s, %s, %s, %s)",
-                (num_pagamento_final, desconto["tipo"], desconto["valor"], desconto["codigo_desconto"], True)
-            )
+        # 2-5) Valor base, multas, descontos e valor final
+        calculo = calcular_devolucao(aluguel, data, data_devolucao)
+        multas = calculo["multas"]
+        descontos = calculo["descontos"]
+        valor_final = calculo["valor_final"]
 
-        # 10) Atualizar status do carro baseado no estado
+        # 6-10) Gravações da devolução em uma única transação
         estado = (data["estado_carro"] or "").upper()
         novo_status = "DISPONIVEL"
         novo_num_manut = None
 
-        if any(tok in estado for tok in ("BATIDO", "AVARIA", "QUEBRADO", "AMASSADO", "COLISAO", "COLISÃO", "COLIDIDO", "DANIFICADO")) or multa_danos > 0:
-            # Criar Manutencao
-            query_ins_m = """
-                INSERT INTO Manutencao (placa_carro, custo, data_inicio, descricao) 
-                VALUES (%s, %s, %s, %s) 
-                RETURNING num_manutencao;
-            """
-            descricao = f"Manutenção necessária: {estado}" if multa_danos == 0 else f"Manutenção por danos no valor de R$ {multa_danos}"
-            m = db.execute_insert_returning(query_ins_m, (
-                placa, 
-                multa_danos,
+        with db.transaction():
+            # 6) Criar Pagamento
+            forma_pagamento = data.get("forma_pagamento", "Cartão Crédito")
+            pag = db.execute_insert_returning(QUERY_PAGAMENTO, (valor_final, forma_pagamento))
+            num_pagamento_final = pag["num_pagamento"]
+
+            # 7) Inserir Devolucao com dados adicionais
+            db.execute_statement(QUERY_DEVOLUCAO, (
+                data["num_locacao"],
+                num_pagamento_final,
+                data["combustivel_completo"],
+                data["estado_carro"],
                 data_devolucao,
-                descricao
+                calculo["km_registro"],
+                calculo["multa_danos"]
             ))
-            if m:
-                novo_num_manut = m["num_manutencao"]
-                novo_status = "MANUTENCAO"
 
-        # Atualizar carro
-        if novo_num_manut:
-            db.execute_statement(
-                "UPDATE Carro SET status_carro = %s, num_manutencao = %s WHERE placa = %s",
-                (novo_status, novo_num_manut, placa)
+            # 8) Registrar Multas no banco (um único INSERT multi-row)
+            db.execute_many(
+                QUERY_MULTAS,
+                [(num_pagamento_final, m["tipo"], m["valor"], m["codigo_motivo"], m["referencia"]) for m in multas]
+            )
+
+            # 9) Registrar Descontos no banco (um único INSERT multi-row)
+            db.execute_many(
+                QUERY_DESCONTOS,
+                [(num_pagamento_final, d["tipo"], d["valor"], d["codigo_desconto"], True) for d in descontos]
             )
-        else:
+
+            # 10) Atualizar status do carro baseado no estado
+            descricao = descricao_manutencao(estado, calculo["multa_danos"])
+            if descricao:
+                # Criar Manutencao
+                m = db.execute_insert_returning(QUERY_MANUTENCAO, (
+                    placa, 
+                    calculo["multa_danos"],
+                    data_devolucao,
+                    descricao
+                ))
+                if m:
+                    novo_num_manut = m["num_manutencao"]
+                    novo_status = "MANUTENCAO"
+
+            # Atualizar carro (a manutenção aberta já aponta para ele por placa_carro)
             db.execute_statement(
                 "UPDATE Carro SET status_carro = %s WHERE placa = %s",
                 (novo_status, placa)
             )
 
-        # Commit final
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
-
         # 11) Preparar resposta detalhada
-        response_data = {
-            "mensagem": "Devolução realizada com sucesso!",
-            "num_pagamento": num_pagamento_final,
-            "resumo_financeiro": {
-                "valor_base": valor_base,
-                "total_multas": valor_total_multas,
-                "total_descontos": valor_total_descontos,
-                "valor_final": valor_final
-            },
-            "multas_aplicadas": multas,
-            "descontos_aplicados": descontos,
-            "detalhes": {
-                "dias_locacao": dias_locacao,
-                "data_devolucao": data_devolucao.isoformat(),
-                "status_carro": novo_status
-            }
-        }
-        
-        if dias_atraso > 0:
-            response_data["detalhes"]["dias_atraso"] = dias_atraso
-            
-        if novo_num_manut:
-            response_data["num_manutencao"] = novo_num_manut
-            response_data["observacao"] = "Carro enviado para manutenção."
-
+        response_data = corpo_devolucao(calculo, num_pagamento_final, data_devolucao, novo_status, novo_num_manut)
         return jsonify(response_data), 200
 
     except Exception as e:
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(f"Erro na devolução: {str(e)}")
 
 # =========================================================
@@ -560,4 +469,75 @@ def historico_multas_cliente(cpf):
         multas = db.execute_select_all(query, (cpf,))
         return jsonify({"multas": multas}), 200
     except Exception as e:
-        return internal_error(str(e))
\ No newline at end of file
+        return internal_error(str(e))
+
+# =========================================================
+# Exportação do histórico de aluguéis (streaming)
+# =========================================================
+
+COLUNAS_EXPORTACAO = [
+    "num_locacao", "data_retirada", "data_prevista_devolucao", "valor_previsto",
+    "num_funcionario", "placa", "cpf_cliente", "seguro_contratado",
+    "data_real_devolucao", "valor_final",
+]
+
+def _linhas_csv(linhas):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUNAS_EXPORTACAO)
+    writer.writeheader()
+    for linha in linhas:
+        writer.writerow(linha)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+@aluguel_blueprint.route("/aluguel/exportar", methods=["GET"])
+def exportar_alugueis():
+    """Exporta aluguéis (NDJSON ou CSV) lendo o banco em lotes, sem montar a lista em memória"""
+    filtros = []
+    params = []
+    for campo, operador in (("de", ">="), ("ate", "<")):
+        valor = request.args.get(campo)
+        if not valor:
+            continue
+        dia = parse_date(valor)
+        if not dia:
+            return jsonify({"erro": f"Parâmetro '{campo}' inválido. Use YYYY-MM-DD."}), 400
+        if campo == "ate":
+            dia += timedelta(days=1)  # inclui o dia inteiro
+        filtros.append(f"a.data_retirada {operador} %s")
+        params.append(dia)
+
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    query = f"""
+        SELECT
+            a.num_locacao,
+            a.data_retirada,
+            a.data_prevista_devolucao,
+            a.valor_previsto,
+            a.num_funcionario,
+            a.placa,
+            a.cpf_cliente,
+            a.seguro_contratado,
+            d.data_real_devolucao,
+            p.valor_total AS valor_final
+        FROM Aluguel a
+        LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+        LEFT JOIN Pagamento p ON p.num_pagamento = d.num_pagamento
+        {where}
+        ORDER BY a.num_locacao;
+    """
+
+    db = DatabaseManager()
+    try:
+        linhas = db.iter_select(query, params, batch_size=5000)
+        if request.args.get("formato") == "csv":
+            return reter_conexoes_no_stream(Response(
+                stream_with_context(_linhas_csv(linhas)),
+                mimetype="text/csv",
+                headers={"Content-Disposition": "attachment; filename=alugueis.csv"},
+            ))
+        return resposta_ndjson(linhas)
+    except Exception as e:
+        return internal_error(str(e))
@@ -5,21 +5,40 @@ from carros_rota import carros_blueprint
 from aluguel_rota import aluguel_blueprint
 from clientes_rota import clientes_blueprint
 from funcionarios_rota import funcionarios_blueprint
+from database.conector import init_app as init_db
+from condicional import init_app as init_condicional
+from json_rapido import init_app as init_json
+from compressao import init_app as init_compressao
 
-app = Flask(__name__)
-CORS(app)
 
-# registra as rotas
-app.register_blueprint(carros_blueprint)
-app.register_blueprint(aluguel_blueprint)
-app.register_blueprint(clientes_blueprint)
-app.register_blueprint(funcionarios_blueprint)
+def create_app():
+    """Cria a aplicação; usada pelo servidor de produção (wsgi.py) e pelo modo dev"""
+    app = Flask(__name__)
+    CORS(app)
 
+    # JSON via orjson e respostas grandes comprimidas (gzip/br)
+    init_json(app)
+    init_compressao(app)
 
-@app.route("/")
-def home():
-    return "API Locadora de Carros ativa!"
+    # devolve ao pool a conexão usada em cada requisição
+    init_db(app)
+
+    # GET condicional (ETag/304) nos catálogos
+    init_condicional(app)
+
+    # registra as rotas
+    app.register_blueprint(carros_blueprint)
+    app.register_blueprint(aluguel_blueprint)
+    app.register_blueprint(clientes_blueprint)
+    app.register_blueprint(funcionarios_blueprint)
+
+    @app.route("/")
+    def home():
+        return "API Locadora de Carros ativa!"
+
+    return app
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    # servidor de desenvolvimento; em produção: gunicorn wsgi:app (ver gunicorn.conf.py)
+    create_app().run(debug=True)
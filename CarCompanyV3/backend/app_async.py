@@ -0,0 +1,196 @@
+import asyncio
+import logging
+from datetime import date
+
+from psycopg import IntegrityError
+from quart import Blueprint, Quart, jsonify, request
+from quart_cors import cors
+
+from aluguel_rota import (
+    QUERY_ACESSORIOS, QUERY_DESCONTOS, QUERY_DEVOLUCAO, QUERY_INSERIR_LOCACAO,
+    QUERY_MANUTENCAO, QUERY_MULTAS, QUERY_PAGAMENTO, QUERY_RESERVAR_PLACA,
+    QUERY_RESERVAR_QUALQUER, corpo_devolucao, corpo_locacao_criada,
+    descricao_manutencao, erro_integridade_locacao, validar_devolucao, validar_reserva,
+)
+from condicional import invalidar_versoes
+from database.conector_async import DatabaseManagerAsync, init_app as init_db
+from precificacao import QUERY_CONTEXTO_DEVOLUCAO, calcular_devolucao, completar_contexto
+
+# ============================================================
+# Rotas do balcão em asyncio (Quart)
+# ============================================================
+# Abrir locação e devolver são as rotas que os balcões chamam a todo momento
+# e as que mais vão ao banco; aqui cada ida ao banco libera o event loop em
+# vez de prender uma thread. SQL, validação e JSON são os de aluguel_rota.py.
+# As demais rotas continuam no app Flask (ver asgi.py).
+balcao_blueprint = Blueprint("balcao", __name__)
+
+logger = logging.getLogger("carcompany.balcao")
+
+
+def internal_error(msg="Erro interno no servidor"):
+    # chamado dentro do except: o traceback vai junto para o log
+    logger.exception(msg)
+    return jsonify({"erro": msg}), 500
+
+
+async def registrar_locacao(db, query_reserva, params, acessorios):
+    """Reserva o carro e grava a locação em uma transação; None se nenhum carro foi reservado"""
+    async with db.transaction():
+        locacao = await db.execute_insert_returning(query_reserva + QUERY_INSERIR_LOCACAO, params)
+        if locacao:
+            await db.execute_many(
+                QUERY_ACESSORIOS,
+                [(locacao["num_locacao"], tipo) for tipo in dict.fromkeys(acessorios)]
+            )
+    return locacao
+
+
+@balcao_blueprint.route("/aluguel", methods=["POST"])
+async def abrir_locacao():
+    data = await request.get_json(silent=True) or {}
+    required = ["placa", "cpf_cliente", "num_funcionario", "data_retirada", "data_prevista_devolucao"]
+    params, acessorios, erro = validar_reserva(data, required)
+    if erro:
+        return jsonify(erro[0]), erro[1]
+    params["placa"] = data["placa"]
+
+    db = DatabaseManagerAsync()
+    try:
+        locacao = await registrar_locacao(db, QUERY_RESERVAR_PLACA, params, acessorios)
+
+        if not locacao:
+            carro = await db.execute_select_one("SELECT status_carro FROM Carro WHERE placa = %s", (data["placa"],))
+            if not carro:
+                return jsonify({"erro": "Carro inexistente"}), 404
+            return jsonify({
+                "erro": "Carro indisponível para locação",
+                "status_carro": carro["status_carro"]
+            }), 409
+
+        return jsonify(corpo_locacao_criada(locacao)), 201
+
+    except IntegrityError as e:
+        corpo, status = erro_integridade_locacao(e)
+        return jsonify(corpo), status
+    except Exception as e:
+        return internal_error(f"Erro ao abrir locação: {str(e)}")
+
+
+@balcao_blueprint.route("/aluguel/auto", methods=["POST"])
+async def abrir_locacao_automatica():
+    data = await request.get_json(silent=True) or {}
+    if not data.get("modelo") and not data.get("tipo_categoria"):
+        return jsonify({"erro": "Informe 'modelo' ou 'tipo_categoria'"}), 400
+
+    required = ["cpf_cliente", "num_funcionario", "data_retirada", "data_prevista_devolucao"]
+    params, acessorios, erro = validar_reserva(data, required)
+    if erro:
+        return jsonify(erro[0]), erro[1]
+    params["modelo"] = (data.get("modelo") or "").strip() or None
+    params["tipo_categoria"] = data.get("tipo_categoria") or None
+
+    db = DatabaseManagerAsync()
+    try:
+        locacao = await registrar_locacao(db, QUERY_RESERVAR_QUALQUER, params, acessorios)
+
+        if not locacao:
+            return jsonify({
+                "erro": "Nenhum carro disponível para o modelo/categoria informado",
+                "modelo": params["modelo"],
+                "tipo_categoria": params["tipo_categoria"]
+            }), 409
+
+        return jsonify(corpo_locacao_criada(locacao)), 201
+
+    except IntegrityError as e:
+        corpo, status = erro_integridade_locacao(e)
+        return jsonify(corpo), status
+    except Exception as e:
+        return internal_error(f"Erro ao abrir locação: {str(e)}")
+
+
+@balcao_blueprint.route("/aluguel/devolver", methods=["POST"])
+async def devolver_carro():
+    data = await request.get_json(silent=True) or {}
+    erro = validar_devolucao(data)
+    if erro:
+        return jsonify(erro[0]), erro[1]
+
+    db = DatabaseManagerAsync()
+    try:
+        aluguel = await db.execute_select_one(QUERY_CONTEXTO_DEVOLUCAO, (data["num_locacao"], data["num_locacao"]))
+        if not aluguel:
+            return jsonify({"erro": "Aluguel não encontrado ou já devolvido"}), 404
+        # o cache de referência pode ir ao banco (driver síncrono): fora do event loop
+        aluguel = await asyncio.to_thread(completar_contexto, aluguel)
+
+        placa = aluguel["placa"]
+        data_devolucao = date.today()
+        calculo = calcular_devolucao(aluguel, data, data_devolucao)
+
+        estado = (data["estado_carro"] or "").upper()
+        novo_status = "DISPONIVEL"
+        novo_num_manut = None
+
+        async with db.transaction():
+            forma_pagamento = data.get("forma_pagamento", "Cartão Crédito")
+            pag = await db.execute_insert_returning(QUERY_PAGAMENTO, (calculo["valor_final"], forma_pagamento))
+            num_pagamento = pag["num_pagamento"]
+
+            await db.execute_statement(QUERY_DEVOLUCAO, (
+                data["num_locacao"],
+                num_pagamento,
+                data["combustivel_completo"],
+                data["estado_carro"],
+                data_devolucao,
+                calculo["km_registro"],
+                calculo["multa_danos"]
+            ))
+            await db.execute_many(
+                QUERY_MULTAS,
+                [(num_pagamento, m["tipo"], m["valor"], m["codigo_motivo"], m["referencia"]) for m in calculo["multas"]]
+            )
+            await db.execute_many(
+                QUERY_DESCONTOS,
+                [(num_pagamento, d["tipo"], d["valor"], d["codigo_desconto"], True) for d in calculo["descontos"]]
+            )
+
+            descricao = descricao_manutencao(estado, calculo["multa_danos"])
+            if descricao:
+                m = await db.execute_insert_returning(QUERY_MANUTENCAO, (
+                    placa, calculo["multa_danos"], data_devolucao, descricao
+                ))
+                if m:
+                    novo_num_manut = m["num_manutencao"]
+                    novo_status = "MANUTENCAO"
+
+            # a manutenção aberta já aponta para o carro por placa_carro
+            await db.execute_statement(
+                "UPDATE Carro SET status_carro = %s WHERE placa = %s",
+                (novo_status, placa)
+            )
+
+        return jsonify(corpo_devolucao(calculo, num_pagamento, data_devolucao, novo_status, novo_num_manut)), 200
+
+    except Exception as e:
+        return internal_error(f"Erro na devolução: {str(e)}")
+
+
+def create_app_async():
+    """App ASGI só com as rotas do balcão; montado junto do app Flask em asgi.py"""
+    app = Quart(__name__, static_folder=None)
+    app = cors(app, allow_origin="*")
+
+    # pool assíncrono aberto no startup de cada worker
+    init_db(app)
+
+    @app.after_request
+    async def _invalidar_apos_escrita(resposta):
+        # mesmo efeito do condicional.init_app no app Flask
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            invalidar_versoes()
+        return resposta
+
+    app.register_blueprint(balcao_blueprint)
+    return app
@@ -0,0 +1,33 @@
+# Ponto de entrada ASGI (modo assíncrono):
+#   WEB_MODO=async gunicorn asgi:app     (workers uvicorn, ver gunicorn.conf.py)
+#   uvicorn asgi:app --workers 4
+#
+# As rotas do balcão (app_async.py) rodam no event loop; todas as outras vão
+# para o app Flask de sempre, executado em um pool de WEB_THREADS threads.
+import os
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+from app_async import create_app_async
+
+app_async = create_app_async()
+app_wsgi = WSGIMiddleware(create_app(), workers=int(os.environ.get("WEB_THREADS", 10)))
+_rotas_async = app_async.url_map.bind("")
+
+
+def _rota_async(scope) -> bool:
+    try:
+        _rotas_async.match(scope["path"], method=scope["method"])
+        return True
+    except HTTPException:
+        return False
+
+
+async def app(scope, receive, send):
+    # lifespan (abre/fecha o pool assíncrono) vai sempre para o app Quart
+    if scope["type"] == "http" and not _rota_async(scope):
+        await app_wsgi(scope, receive, send)
+    else:
+        await app_async(scope, receive, send)
@@ -0,0 +1,146 @@
+"""Compara as consultas de clientes_rota: subconsultas por linha x ClienteResumo.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_clientes --gerar --clientes 100000 --alugueis 1000000
+    python -m benchmarks.bench_clientes            # reaproveita o schema já gerado
+"""
+import argparse
+import statistics
+import time
+
+import psycopg2
+
+from database.conector import CONEXAO
+from benchmarks.dados_sinteticos import ESCALA_PADRAO, criar_base
+
+# Versões anteriores (uma subconsulta em Aluguel por linha de Cliente)
+ANTES = {
+    "listar_clientes": """
+        SELECT cpf, nome, endereco, telefone,
+               (SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = cpf) as total_alugueis
+        FROM Cliente
+        ORDER BY nome;
+    """,
+    "obter_cliente": """
+        SELECT cpf, nome, endereco, telefone,
+               (SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf) as total_alugueis,
+               (SELECT MAX(data_retirada) FROM Aluguel WHERE cpf_cliente = Cliente.cpf) as ultimo_aluguel
+        FROM Cliente
+        WHERE cpf = %(cpf)s;
+    """,
+    "buscar_por_nome": """
+        SELECT cpf, nome, endereco, telefone,
+               (SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf) as total_alugueis
+        FROM Cliente
+        WHERE nome ILIKE %(busca)s
+        ORDER BY nome;
+    """,
+    "estatisticas_clientes": """
+        SELECT COUNT(*) as total_clientes,
+               COUNT(CASE WHEN EXISTS (SELECT 1 FROM Aluguel WHERE cpf_cliente = Cliente.cpf) THEN 1 END) as clientes_ativos,
+               AVG((SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf)) as media_alugueis_por_cliente,
+               MAX((SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf)) as max_alugueis_cliente
+        FROM Cliente;
+    """,
+    "clientes_todas_categorias": """
+        SELECT cli.cpf, cli.nome, COUNT(DISTINCT car.tipo_categoria) as categorias_utilizadas
+        FROM Cliente cli
+        JOIN Aluguel al ON al.cpf_cliente = cli.cpf
+        JOIN Carro car ON car.placa = al.placa
+        GROUP BY cli.cpf, cli.nome
+        HAVING COUNT(DISTINCT car.tipo_categoria) = (SELECT COUNT(*) FROM Categoria)
+        ORDER BY cli.nome;
+    """,
+}
+
+# Versões atuais (mesmo formato de clientes_rota.py; totais vêm de ClienteResumo)
+DEPOIS = {
+    "listar_clientes": """
+        WITH pagina AS (
+            SELECT cpf, nome, endereco, telefone FROM Cliente ORDER BY nome, cpf
+        )
+        SELECT pg.cpf, pg.nome, pg.endereco, pg.telefone,
+               COALESCE(r.total_alugueis, 0) as total_alugueis
+        FROM pagina pg
+        LEFT JOIN ClienteResumo r ON r.cpf = pg.cpf
+        ORDER BY pg.nome, pg.cpf;
+    """,
+    "obter_cliente": """
+        SELECT cli.cpf, cli.nome, cli.endereco, cli.telefone,
+               COALESCE(r.total_alugueis, 0) as total_alugueis, r.ultimo_aluguel
+        FROM Cliente cli
+        LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf
+        WHERE cli.cpf = %(cpf)s;
+    """,
+    "buscar_por_nome": """
+        SELECT cli.cpf, cli.nome, cli.endereco, cli.telefone,
+               COALESCE(r.total_alugueis, 0) as total_alugueis
+        FROM Cliente cli
+        LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf
+        WHERE cli.nome ILIKE %(busca)s
+        ORDER BY cli.nome;
+    """,
+    "estatisticas_clientes": """
+        SELECT COUNT(*) as total_clientes,
+               COUNT(*) FILTER (WHERE r.total_alugueis > 0) as clientes_ativos,
+               AVG(COALESCE(r.total_alugueis, 0)) as media_alugueis_por_cliente,
+               MAX(COALESCE(r.total_alugueis, 0)) as max_alugueis_cliente
+        FROM Cliente cli
+        LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf;
+    """,
+    "clientes_todas_categorias": """
+        SELECT cli.cpf, cli.nome, r.categorias_utilizadas
+        FROM ClienteResumo r
+        JOIN Cliente cli ON cli.cpf = r.cpf
+        WHERE r.categorias_utilizadas = (SELECT COUNT(*) FROM Categoria)
+        ORDER BY cli.nome;
+    """,
+}
+
+PARAMS = {"cpf": "20000000001", "busca": "%ab%"}
+
+
+def medir(cur, sql, repeticoes):
+    """Tempos (ms) de `repeticoes` execuções, após uma execução de aquecimento"""
+    cur.execute(sql, PARAMS)
+    cur.fetchall()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        cur.execute(sql, PARAMS)
+        cur.fetchall()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schema", default="aluguel_bench")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--gerar", action="store_true", help="recria a base sintética antes de medir")
+    parser.add_argument("--clientes", type=int, default=ESCALA_PADRAO["clientes"])
+    parser.add_argument("--alugueis", type=int, default=ESCALA_PADRAO["alugueis"])
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**CONEXAO)
+    try:
+        if args.gerar:
+            criar_base(conn, schema=args.schema, clientes=args.clientes, alugueis=args.alugueis)
+
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {args.schema}, public;")
+            cur.execute("SELECT (SELECT COUNT(*) FROM Cliente), (SELECT COUNT(*) FROM Aluguel);")
+            clientes, alugueis = cur.fetchone()
+            print(f"{clientes} clientes, {alugueis} aluguéis ({args.repeticoes} repetições, mediana em ms)\n")
+            print(f"{'consulta':<28}{'antes':>12}{'depois':>12}{'ganho':>10}")
+            for nome in ANTES:
+                antes = statistics.median(medir(cur, ANTES[nome], args.repeticoes))
+                depois = statistics.median(medir(cur, DEPOIS[nome], args.repeticoes))
+                print(f"{nome:<28}{antes:>12.1f}{depois:>12.1f}{antes / depois:>9.1f}x")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
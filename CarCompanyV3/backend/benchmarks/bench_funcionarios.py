@@ -0,0 +1,102 @@
+"""Ranking de funcionários: subconsultas por linha x FuncionarioResumo, com Aluguel crescendo.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_funcionarios --escalas 100000,1000000,3000000
+
+Cada escala recria a base sintética com aquele número de aluguéis (mesmos
+funcionários, clientes e carros) e mede as duas versões da consulta.
+"""
+import argparse
+import statistics
+import time
+
+import psycopg2
+
+from database.conector import CONEXAO
+from benchmarks.dados_sinteticos import ESCALA_PADRAO, criar_base
+
+# Versão anterior (três subconsultas em Aluguel por funcionário)
+ANTES = """
+    SELECT 
+        num_funcionario, 
+        cpf, 
+        nome, 
+        qnt_vendas,
+        (SELECT COUNT(*) FROM Aluguel WHERE num_funcionario = Funcionario.num_funcionario) as total_alugueis,
+        (SELECT COALESCE(SUM(valor_previsto), 0) FROM Aluguel WHERE num_funcionario = Funcionario.num_funcionario) as valor_total_vendas,
+        (CURRENT_DATE - data_inicio) as dias_empresa,
+        CASE 
+            WHEN qnt_vendas > 0 THEN 
+                ROUND((qnt_vendas::decimal / (SELECT COUNT(*) FROM Aluguel WHERE num_funcionario = Funcionario.num_funcionario)) * 100, 2)
+            ELSE 0
+        END as taxa_conversao
+    FROM Funcionario
+    ORDER BY qnt_vendas DESC, valor_total_vendas DESC;
+"""
+
+# Versão atual (mesmo formato de funcionarios_rota.ranking_vendas)
+DEPOIS = """
+    SELECT 
+        f.num_funcionario, 
+        f.cpf, 
+        f.nome, 
+        f.qnt_vendas,
+        COALESCE(r.total_alugueis, 0) as total_alugueis,
+        COALESCE(r.valor_total_vendas, 0) as valor_total_vendas,
+        (CURRENT_DATE - f.data_inicio) as dias_empresa,
+        CASE 
+            WHEN f.qnt_vendas > 0 THEN 
+                ROUND((f.qnt_vendas::decimal / NULLIF(r.total_alugueis, 0)) * 100, 2)
+            ELSE 0
+        END as taxa_conversao
+    FROM Funcionario f
+    LEFT JOIN FuncionarioResumo r ON r.num_funcionario = f.num_funcionario
+    ORDER BY f.qnt_vendas DESC, valor_total_vendas DESC;
+"""
+
+
+def medir(cur, sql, repeticoes):
+    """Mediana (ms) de `repeticoes` execuções, após uma execução de aquecimento"""
+    cur.execute(sql)
+    cur.fetchall()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        cur.execute(sql)
+        cur.fetchall()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schema", default="aluguel_bench")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--escalas", default="100000,1000000,3000000", help="números de aluguéis")
+    parser.add_argument("--funcionarios", type=int, default=ESCALA_PADRAO["funcionarios"])
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**CONEXAO)
+    try:
+        print(f"{args.funcionarios} funcionários ({args.repeticoes} repetições, mediana em ms)\n")
+        print(f"{'alugueis':>10}{'antes':>12}{'depois':>12}{'ganho':>10}")
+        for alugueis in (int(e) for e in args.escalas.split(",")):
+            criar_base(conn, schema=args.schema, verbose=False,
+                       funcionarios=args.funcionarios, alugueis=alugueis)
+            with conn.cursor() as cur:
+                cur.execute(f"SET search_path TO {args.schema}, public;")
+                # qnt_vendas acompanha as locações, como no balcão
+                cur.execute("""
+                    UPDATE Funcionario f SET qnt_vendas = r.total_alugueis
+                    FROM FuncionarioResumo r WHERE r.num_funcionario = f.num_funcionario;
+                """)
+                antes = medir(cur, ANTES, args.repeticoes)
+                depois = medir(cur, DEPOIS, args.repeticoes)
+            conn.rollback()
+            print(f"{alugueis:>10}{antes:>12.1f}{depois:>12.1f}{antes / depois:>9.1f}x")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compara serialização e compressão da listagem de carros (GET /carros).
+
+Não usa o banco: gera em memória linhas no formato de listar_carros.
+
+Uso (a partir de backend/):
+    python -m benchmarks.bench_json --carros 10000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import compressao
+from json_rapido import ProvedorJSONRapido, orjson
+
+CATEGORIAS = {
+    "ECONOMICO": (Decimal("89.90"), "Carros compactos e econômicos"),
+    "SUV": (Decimal("189.90"), "Utilitários esportivos"),
+    "LUXO": (Decimal("349.90"), "Sedãs e esportivos de luxo"),
+}
+MODELOS = ["Onix", "HB20", "Compass", "Renegade", "Corolla", "Civic", "BMW 320i", "Kicks"]
+
+
+def gerar_carros(quantidade, semente=42):
+    aleatorio = random.Random(semente)
+    base = datetime(2024, 1, 1)
+    carros = []
+    for i in range(quantidade):
+        categoria = aleatorio.choice(list(CATEGORIAS))
+        preco, descricao = CATEGORIAS[categoria]
+        carros.append({
+            "placa": f"BNC{i % 10}{chr(65 + i // 10 % 26)}{i // 260 % 100:02d}",
+            "nome": aleatorio.choice(MODELOS),
+            "tipo_categoria": categoria,
+            "imagem": f"https://exemplo.com/carros/{i}.jpg",
+            "status_carro": aleatorio.choice(["DISPONIVEL", "ALUGADO", "MANUTENCAO"]),
+            "ano": aleatorio.randint(2015, 2025),
+            "quilometragem": aleatorio.randint(0, 150000),
+            "chassi": f"9BW{i:014d}",
+            "preco": preco,
+            "descricao_categoria": descricao,
+            "atualizado_em": base + timedelta(minutes=i),
+        })
+    return carros
+
+
+def medir(funcao, repeticoes):
+    """(resultado, mediana em ms) de `repeticoes` execuções, após um aquecimento"""
+    resultado = funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--carros", type=int, default=10000)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    carros = {"carros": gerar_carros(args.carros)}
+    app = Flask(__name__)
+    provedores = {
+        "jsonify padrão": DefaultJSONProvider(app),
+        "orjson" if orjson else "rápido (sem orjson)": ProvedorJSONRapido(app),
+    }
+
+    print(f"{args.carros} carros ({args.repeticoes} repetições, mediana em ms)\n")
+    print(f"{'serialização':<24}{'bytes':>12}{'ms':>10}")
+    corpo = None
+    with app.app_context():
+        for nome, provedor in provedores.items():
+            resposta, ms = medir(lambda: provedor.response(carros), args.repeticoes)
+            corpo = resposta.get_data()
+            print(f"{nome:<24}{len(corpo):>12}{ms:>10.1f}")
+
+    print(f"\n{'compressão':<24}{'bytes':>12}{'ms':>10}")
+    codificacoes = ["gzip"] + (["br"] if compressao.brotli else [])
+    for codificacao in codificacoes:
+        comprimido, ms = medir(lambda: compressao._comprimir(corpo, codificacao), args.repeticoes)
+        print(f"{codificacao:<24}{len(comprimido):>12}{ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Teste de carga da API: vazão, latência e consultas por requisição em cenários do balcão.
+
+Uso (a partir de backend/):
+    python -m benchmarks.carga --gerar --carros 50000 --clientes 100000 --alugueis 1000000
+    python -m benchmarks.carga --cenarios navegar,historico --requisicoes 2000 --concorrencia 8
+    python -m benchmarks.carga --gerar --saida base.json        # guarda o resultado
+    python -m benchmarks.carga --gerar --comparar base.json     # compara com o guardado
+    python -m benchmarks.carga --cenarios paineis --replica 127.0.0.1:5433
+
+O app Flask roda no próprio processo (um test client por thread) sobre o
+schema sintético de dados_sinteticos.py. Base regerada com --gerar, sementes
+fixas e aquecimento antes de medir: execuções com os mesmos parâmetros são
+comparáveis. Reservar e devolver alteram a base; para comparar execuções,
+use --gerar nas duas. Com --replica, as rotas de leitura (painéis, histórico)
+vão para um segundo Postgres em streaming replication do primeiro.
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import date, timedelta
+
+import psycopg2
+
+from app import create_app
+from benchmarks.dados_sinteticos import ESCALA_PADRAO, criar_base
+from database import conector
+from database.conector import CONEXAO
+
+# ============================================================
+# Massa de dados usada pelos cenários (lida uma vez da base)
+# ============================================================
+
+class Massa:
+    def __init__(self, conn, schema, amostra=2000):
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {schema}, public;")
+            cur.execute("SELECT setseed(0.42);")
+            cur.execute("SELECT placa FROM Carro ORDER BY random() LIMIT %s;", (amostra,))
+            self.placas = [r[0] for r in cur.fetchall()]
+            cur.execute("SELECT cpf FROM Cliente ORDER BY random() LIMIT %s;", (amostra,))
+            self.cpfs = [r[0] for r in cur.fetchall()]
+            cur.execute("SELECT num_funcionario FROM Funcionario ORDER BY num_funcionario;")
+            self.funcionarios = [r[0] for r in cur.fetchall()]
+            cur.execute("SELECT tipo FROM Categoria ORDER BY tipo;")
+            self.categorias = [r[0] for r in cur.fetchall()]
+            cur.execute("""
+                SELECT a.num_locacao FROM Aluguel a
+                WHERE NOT EXISTS (SELECT 1 FROM Devolucao d WHERE d.num_locacao = a.num_locacao)
+                ORDER BY a.num_locacao;
+            """)
+            # locações em aberto; as reservas do cenário "reservar" entram no fim
+            self.em_aberto = deque(r[0] for r in cur.fetchall())
+        conn.rollback()
+        self._lock = threading.Lock()
+
+    def proxima_em_aberto(self):
+        with self._lock:
+            return self.em_aberto.popleft() if self.em_aberto else None
+
+    def nova_em_aberto(self, num_locacao):
+        with self._lock:
+            self.em_aberto.append(num_locacao)
+
+# ============================================================
+# Cenários: cada um gera a próxima requisição (rótulo, método, url, corpo)
+# ============================================================
+
+def navegar(rng, massa):
+    hoje = date.today()
+    escolha = rng.random()
+    if escolha < 0.3:
+        return "GET /carros?limit", "GET", "/carros?limit=100", None
+    if escolha < 0.6:
+        return "GET /carros/<placa>", "GET", f"/carros/{rng.choice(massa.placas)}", None
+    if escolha < 0.7:
+        return "GET /categorias", "GET", "/categorias", None
+    de = hoje + timedelta(days=rng.randint(0, 30))
+    ate = de + timedelta(days=rng.randint(1, 10))
+    return "GET /carros/disponiveis", "GET", f"/carros/disponiveis?de={de}&ate={ate}&limit=50", None
+
+
+def reservar(rng, massa):
+    retirada = date.today() + timedelta(days=rng.randint(0, 5))
+    corpo = {
+        "tipo_categoria": rng.choice(massa.categorias),
+        "cpf_cliente": rng.choice(massa.cpfs),
+        "num_funcionario": rng.choice(massa.funcionarios),
+        "data_retirada": retirada.isoformat(),
+        "data_prevista_devolucao": (retirada + timedelta(days=rng.randint(1, 10))).isoformat(),
+        "seguro_contratado": rng.random() < 0.5,
+        "acessorios": rng.sample(["GPS", "Cadeirinha"], rng.randint(0, 2)),
+    }
+    return "POST /aluguel/auto", "POST", "/aluguel/auto", corpo
+
+
+def devolver(rng, massa):
+    num_locacao = massa.proxima_em_aberto()
+    if num_locacao is None:
+        return None
+    avaria = rng.random() < 0.1
+    corpo = {
+        "num_locacao": num_locacao,
+        "estado_carro": "AMASSADO" if avaria else "OK",
+        "combustivel_completo": rng.random() > 0.2,
+        "valor_danos": rng.choice([500, 1500, 4000]) if avaria else 0,
+        "km_registro": rng.randint(100, 3000),
+        "forma_pagamento": "Pix",
+    }
+    return "POST /aluguel/devolver", "POST", "/aluguel/devolver", corpo
+
+
+def historico(rng, massa):
+    cpf = rng.choice(massa.cpfs)
+    if rng.random() < 0.7:
+        return "GET /clientes/<cpf>/historico", "GET", f"/clientes/{cpf}/historico", None
+    return "GET /clientes/<cpf>", "GET", f"/clientes/{cpf}", None
+
+
+PAINEIS = [
+    "/carros/estatisticas",
+    "/clientes/estatisticas",
+    "/funcionarios/estatisticas",
+    "/funcionarios/ranking",
+    "/funcionarios/top-mes",
+]
+
+
+def paineis(rng, massa):
+    url = rng.choice(PAINEIS)
+    return f"GET {url}", "GET", url, None
+
+
+CENARIOS = {
+    "navegar": navegar,
+    "reservar": reservar,
+    "devolver": devolver,
+    "historico": historico,
+    "paineis": paineis,
+}
+
+# ============================================================
+# Execução e relatório
+# ============================================================
+
+def _executar(cliente, requisicao, massa):
+    """(rótulo, ms, consultas, ok) de uma requisição"""
+    rotulo, metodo, url, corpo = requisicao
+    inicio = time.perf_counter()
+    resposta = cliente.open(url, method=metodo, json=corpo)
+    ms = (time.perf_counter() - inicio) * 1000
+    if rotulo == "POST /aluguel/auto" and resposta.status_code == 201:
+        massa.nova_em_aberto(resposta.get_json()["num_locacao"])
+    consultas = int(resposta.headers.get("X-DB-Queries", 0))
+    return rotulo, ms, consultas, resposta.status_code < 500
+
+
+def rodar_cenario(app, massa, gerar, requisicoes, concorrencia, aquecimento, semente):
+    """Amostras por rótulo e duração total (s) de `requisicoes` requisições em `concorrencia` threads"""
+    amostras = defaultdict(list)
+    lock = threading.Lock()
+    por_thread = [requisicoes // concorrencia + (i < requisicoes % concorrencia) for i in range(concorrencia)]
+
+    def trabalhar(indice):
+        rng = random.Random(semente * 1000 + indice)
+        cliente = app.test_client()
+        locais = []
+        for i in range(aquecimento + por_thread[indice]):
+            requisicao = gerar(rng, massa)
+            if requisicao is None:
+                break
+            resultado = _executar(cliente, requisicao, massa)
+            if i >= aquecimento:
+                locais.append(resultado)
+        with lock:
+            for rotulo, ms, consultas, ok in locais:
+                amostras[rotulo].append((ms, consultas, ok))
+
+    threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(concorrencia)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return amostras, time.perf_counter() - inicio
+
+
+def resumir(amostras, duracao):
+    resumo = {}
+    for rotulo, linhas in sorted(amostras.items()):
+        tempos = sorted(ms for ms, _, _ in linhas)
+        percentis = statistics.quantiles(tempos, n=100, method="inclusive") if len(tempos) > 1 else tempos * 99
+        resumo[rotulo] = {
+            "requisicoes": len(linhas),
+            "rps": len(linhas) / duracao,
+            "p50": percentis[49],
+            "p95": percentis[94],
+            "p99": percentis[98],
+            "consultas": statistics.mean(c for _, c, _ in linhas),
+            "erros": sum(1 for _, _, ok in linhas if not ok),
+        }
+    return resumo
+
+
+def imprimir(cenario, resumo, anterior=None, tolerancia=0.10):
+    print(f"\n[{cenario}]")
+    print(f"{'endpoint':<34}{'n':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>7}{'erros':>7}")
+    for rotulo, r in resumo.items():
+        linha = (f"{rotulo:<34}{r['requisicoes']:>7}{r['rps']:>9.1f}{r['p50']:>9.1f}"
+                 f"{r['p95']:>9.1f}{r['p99']:>9.1f}{r['consultas']:>7.1f}{r['erros']:>7}")
+        base = (anterior or {}).get(rotulo)
+        if base:
+            variacao = r["p95"] / base["p95"] - 1 if base["p95"] else 0.0
+            linha += f"   p95 {variacao:+.0%}"
+            if variacao > tolerancia or r["consultas"] > base["consultas"]:
+                linha += "  << REGRESSÃO"
+        print(linha)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schema", default="aluguel_bench")
+    parser.add_argument("--gerar", action="store_true", help="recria a base sintética antes de medir")
+    for nome, valor in ESCALA_PADRAO.items():
+        parser.add_argument(f"--{nome}", type=int, default=valor)
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--requisicoes", type=int, default=1000, help="por cenário")
+    parser.add_argument("--concorrencia", type=int, default=8)
+    parser.add_argument("--aquecimento", type=int, default=20, help="por thread, fora da medição")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="piora de p95 tolerada")
+    parser.add_argument("--replica", metavar="HOST[:PORTA]", help="réplica de leitura (ver CONEXAO_REPLICA)")
+    args = parser.parse_args()
+
+    cenarios = args.cenarios.split(",")
+    desconhecidos = set(cenarios) - set(CENARIOS)
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    conn = psycopg2.connect(**CONEXAO)
+    try:
+        if args.gerar:
+            escala = {nome: getattr(args, nome) for nome in ESCALA_PADRAO}
+            criar_base(conn, schema=args.schema, **escala)
+        massa = Massa(conn, args.schema)
+    finally:
+        conn.close()
+
+    # o pool do app passa a usar o schema sintético
+    conector.SEARCH_PATH = f"{args.schema}, public"
+    conector.configurar_pool(maxconn=max(args.concorrencia, conector.POOL_CONFIG["maxconn"]))
+    if args.replica:
+        host, _, porta = args.replica.partition(":")
+        conector.CONEXAO_REPLICA = {"host": host} if host else {}
+        if porta:
+            conector.CONEXAO_REPLICA["port"] = int(porta)
+    # X-DB-Queries vem da instrumentação do DatabaseManager
+    app = create_app()
+
+    anterior = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)["cenarios"]
+
+    print(f"{args.requisicoes} requisições por cenário, {args.concorrencia} threads, semente {args.semente}"
+          f" (latências em ms)")
+    resultado = {"parametros": vars(args), "cenarios": {}}
+    for cenario in cenarios:
+        amostras, duracao = rodar_cenario(
+            app, massa, CENARIOS[cenario], args.requisicoes, args.concorrencia, args.aquecimento, args.semente
+        )
+        resumo = resumir(amostras, duracao)
+        resultado["cenarios"][cenario] = resumo
+        imprimir(cenario, resumo, anterior.get(cenario), args.tolerancia)
+
+    conector.close_pool()
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
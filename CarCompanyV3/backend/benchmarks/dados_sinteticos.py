@@ -0,0 +1,214 @@
+"""Gera uma base sintética com o schema do banco.sql em escala configurável.
+
+Uso (a partir de backend/):
+    python -m benchmarks.dados_sinteticos --clientes 100000 --alugueis 1000000
+
+A base vai para um schema separado (padrão `aluguel_bench`), recriado a cada
+execução; o schema `aluguel` da aplicação não é tocado. A mesma semente gera
+sempre os mesmos dados, para que execuções diferentes sejam comparáveis.
+"""
+import argparse
+import os
+import re
+import time
+
+import psycopg2
+
+from database.conector import CONEXAO
+
+BANCO_SQL = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "banco.sql")
+
+ESCALA_PADRAO = {
+    "funcionarios": 200,
+    "clientes": 100_000,
+    "carros": 50_000,
+    "alugueis": 1_000_000,
+}
+
+FUNCOES_AUXILIARES = """
+    CREATE FUNCTION placa_sintetica(i BIGINT) RETURNS TEXT
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT chr(65 + ((i / 36000) / 676 % 26)::int)
+            || chr(65 + ((i / 36000) / 26 % 26)::int)
+            || chr(65 + ((i / 36000) % 26)::int)
+            || ((i / 3600) % 10)::text
+            || substr('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ', ((i / 100) % 36)::int + 1, 1)
+            || lpad((i % 100)::text, 2, '0')
+    $$;
+
+    CREATE FUNCTION cpf_sintetico(base BIGINT, i BIGINT) RETURNS CHAR(11)
+    LANGUAGE sql IMMUTABLE AS $$
+        SELECT lpad((base + i)::text, 11, '0')::char(11)
+    $$;
+"""
+
+CARGA = [
+    ("funcionarios", """
+        INSERT INTO Funcionario (cpf, nome, data_inicio, endereco, telefone, qnt_vendas)
+        SELECT cpf_sintetico(30000000000, i), 'Funcionario ' || i,
+               CURRENT_DATE - (i %% 1500)::int, 'Rua ' || i, '1190' || lpad(i::text, 7, '0'), 0
+        FROM generate_series(1, %(funcionarios)s) i;
+    """),
+    ("clientes", """
+        INSERT INTO Cliente (cpf, nome, endereco, telefone)
+        SELECT cpf_sintetico(20000000000, i), 'Cliente ' || substr(md5(i::text), 1, 10),
+               'Av Sintetica, ' || i, '1198' || lpad(i::text, 7, '0')
+        FROM generate_series(1, %(clientes)s) i;
+    """),
+    ("carros", """
+        INSERT INTO Carro (placa, nome, chassi, ano, quilometragem, tipo_categoria, imagem_url, status_carro)
+        SELECT placa_sintetica(i),
+               (ARRAY['Fiat Mobi', 'Jeep Compass', 'BMW 320i', 'Toyota Corolla'])[1 + i %% 4],
+               'CHS' || lpad(i::text, 12, '0'),
+               2015 + (i %% 10),
+               (random() * 150000)::int,
+               (ARRAY['Economico', 'SUV', 'Luxo', 'Intermediario'])[1 + i %% 4],
+               'placeholder.png',
+               'DISPONIVEL'
+        FROM generate_series(1, %(carros)s) i;
+    """),
+    ("alugueis", """
+        INSERT INTO Aluguel (data_retirada, data_prevista_devolucao, valor_previsto,
+                             num_funcionario, placa, cpf_cliente, seguro_contratado)
+        SELECT r.retirada,
+               r.retirada + r.dias * INTERVAL '1 day',
+               r.dias * 150.00,
+               1 + (random() * (%(funcionarios)s - 1))::int,
+               placa_sintetica(1 + (random() * (%(carros)s - 1))::bigint),
+               cpf_sintetico(20000000000, 1 + (random() * (%(clientes)s - 1))::bigint),
+               random() < 0.5
+        FROM (
+            SELECT i,
+                   CASE WHEN i > %(alugueis)s * 0.98
+                        THEN CURRENT_TIMESTAMP - random() * INTERVAL '3 days'
+                        ELSE CURRENT_TIMESTAMP - INTERVAL '10 days' - random() * INTERVAL '1095 days'
+                   END AS retirada,
+                   1 + (random() * 9)::int AS dias
+            FROM generate_series(1, %(alugueis)s) i
+        ) r
+        ORDER BY r.i;
+    """),
+    ("pagamentos", """
+        INSERT INTO Pagamento (valor_total, forma_pagamento)
+        SELECT a.valor_previsto, (ARRAY['Pix', 'Cartao Credito', 'Dinheiro'])[1 + a.num_locacao %% 3]
+        FROM Aluguel a
+        WHERE a.num_locacao <= %(alugueis)s * 0.98
+        ORDER BY a.num_locacao;
+    """),
+    ("devolucoes", """
+        INSERT INTO Devolucao (num_locacao, num_pagamento, combustivel_completo, estado_carro, data_real_devolucao)
+        SELECT a.num_locacao, a.num_locacao, random() > 0.1, 'OK', a.data_prevista_devolucao
+        FROM Aluguel a
+        WHERE a.num_locacao <= %(alugueis)s * 0.98;
+    """),
+    ("multas", """
+        INSERT INTO Multa (num_pagamento, tipo_multa, valor)
+        SELECT d.num_pagamento, 'Combustivel Incompleto', 100.00
+        FROM Devolucao d
+        WHERE NOT d.combustivel_completo;
+    """),
+    ("descontos", """
+        INSERT INTO Desconto (num_pagamento, tipo_desconto, valor, flag_ativo)
+        SELECT p.num_pagamento, 'Fidelidade', 50.00, TRUE
+        FROM Pagamento p
+        WHERE random() < 0.03;
+    """),
+    ("acessorios", """
+        INSERT INTO Aluguel_Acessorio (num_locacao, tipo_acessorio)
+        SELECT a.num_locacao, (ARRAY['GPS', 'Cadeirinha', 'Condutor Adicional', 'Seguro Vidros', 'Porta-Bike'])[1 + (random() * 4)::int]
+        FROM Aluguel a
+        WHERE random() < 0.3;
+    """),
+    ("carros_alugados", """
+        UPDATE Carro c SET status_carro = 'ALUGADO'
+        FROM Aluguel a
+        WHERE a.placa = c.placa
+        AND a.num_locacao > %(alugueis)s * 0.98;
+    """),
+]
+
+# Tabelas de resumo mantidas por trigger, reconstruídas após a carga
+RESUMOS = [
+    ("cliente_resumo", "SELECT recalcular_cliente_resumo();"),
+    ("frota_resumo", "SELECT recalcular_frota_resumo();"),
+    ("agenda_carro", "SELECT recalcular_agenda_carro();"),
+    ("funcionario_resumo", "SELECT recalcular_funcionario_resumo();"),
+    ("vendas_mensais", "SELECT recalcular_vendas_mensais();"),
+]
+
+
+def _ddl_e_referencias(schema):
+    """DDL do banco.sql (tabelas, índices, triggers) + Categoria/Acessorio, no schema pedido"""
+    with open(BANCO_SQL, encoding="utf-8") as f:
+        sql = f.read()
+    corte = sql.index("\nINSERT INTO ")
+    ddl, carga = sql[:corte], sql[corte:]
+    ddl = re.sub(r"\b(SCHEMA IF EXISTS|SCHEMA|search_path TO) aluguel\b", rf"\1 {schema}", ddl)
+    referencias = []
+    for stmt in carga.split(";"):
+        # os blocos de comentário (-- 2. ACESSORIO ...) vêm antes do INSERT
+        stmt = "\n".join(linha for linha in stmt.splitlines() if not linha.lstrip().startswith("--")).strip()
+        if stmt.startswith(("INSERT INTO Categoria", "INSERT INTO Acessorio")):
+            referencias.append(stmt + ";")
+    return ddl, referencias
+
+
+def criar_base(conn, schema="aluguel_bench", semente=0.42, verbose=True, **escala):
+    """Recria `schema` e carrega os dados sintéticos; retorna tempo por etapa"""
+    escala = {**ESCALA_PADRAO, **escala}
+    ddl, referencias = _ddl_e_referencias(schema)
+    tempos = {}
+
+    with conn.cursor() as cur:
+        cur.execute(ddl)
+        cur.execute(f"SET search_path TO {schema}, public;")
+        cur.execute(FUNCOES_AUXILIARES)
+        for stmt in referencias:
+            cur.execute(stmt)
+        cur.execute("SELECT setseed(%s);", (semente,))
+        # carga em massa sem triggers (resumos e FKs); os resumos são
+        # reconstruídos de uma vez no final
+        cur.execute("SET session_replication_role = replica;")
+        for etapa, sql in CARGA:
+            inicio = time.perf_counter()
+            cur.execute(sql, escala)
+            tempos[etapa] = time.perf_counter() - inicio
+            if verbose:
+                print(f"  {etapa:<16} {cur.rowcount:>10} linhas  {tempos[etapa]:.1f}s")
+        cur.execute("SET session_replication_role = DEFAULT;")
+        for etapa, sql in RESUMOS:
+            inicio = time.perf_counter()
+            cur.execute(sql)
+            tempos[etapa] = time.perf_counter() - inicio
+            if verbose:
+                print(f"  {etapa:<16} {'':>10}        {tempos[etapa]:.1f}s")
+    conn.commit()
+
+    # estatísticas atualizadas para o planner antes de medir
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"SET search_path TO {schema}, public;")
+        cur.execute("ANALYZE;")
+    conn.autocommit = False
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schema", default="aluguel_bench")
+    parser.add_argument("--semente", type=float, default=0.42)
+    for nome, valor in ESCALA_PADRAO.items():
+        parser.add_argument(f"--{nome}", type=int, default=valor)
+    args = parser.parse_args()
+
+    escala = {nome: getattr(args, nome) for nome in ESCALA_PADRAO}
+    print(f"Gerando schema {args.schema}: {escala}")
+    conn = psycopg2.connect(**CONEXAO)
+    try:
+        criar_base(conn, schema=args.schema, semente=args.semente, **escala)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+
+class CacheTTL:
+    """Cache em memória do processo, com expiração por tempo e invalidação explícita"""
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._valores = {}  # chave -> (valor, instante de expiração)
+        self._carregando = {}  # chave -> lock de quem está recarregando a chave
+        self._geracao = 0  # incrementada a cada invalidar()
+        # protege só os dicionários; carregar() roda fora dele
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable, carregar: Callable[[], Any]) -> Any:
+        """Valor em cache, ou o resultado de `carregar()` se ausente/expirado
+
+        Cada chave tem seu próprio lock de carga: uma recarga lenta não trava
+        leituras de outras chaves, e threads que pedem a mesma chave expirada
+        esperam uma única chamada de `carregar()` (single-flight).
+        """
+        item = self._valores.get(chave)
+        if item is not None and item[1] > time.monotonic():
+            return item[0]
+
+        with self._lock:
+            lock_chave = self._carregando.setdefault(chave, threading.Lock())
+
+        with lock_chave:
+            # outra thread pode ter recarregado enquanto esperávamos o lock
+            item = self._valores.get(chave)
+            if item is not None and item[1] > time.monotonic():
+                return item[0]
+            geracao = self._geracao
+            valor = carregar()
+            with self._lock:
+                # invalidar() durante a carga: o valor pode ser anterior à
+                # escrita que invalidou, então serve só a esta chamada
+                if self._geracao == geracao:
+                    self._valores[chave] = (valor, time.monotonic() + self.ttl)
+            return valor
+
+    def invalidar(self, chave: Optional[Hashable] = None) -> None:
+        """Descarta uma chave (ou todas); a próxima leitura recarrega"""
+        with self._lock:
+            self._geracao += 1
+            if chave is None:
+                self._valores.clear()
+            else:
+                self._valores.pop(chave, None)
@@ -1,5 +1,10 @@
 from flask import Blueprint, jsonify, request
 from database.conector import DatabaseManager
+from datetime import datetime, timedelta
+from psycopg2 import IntegrityError
+from paginacao import ler_paginacao, proxima_chave, quer_ndjson, resposta_ndjson
+from referencia import anexar_categoria, categorias
+from condicional import condicional
 
 carros_blueprint = Blueprint("carros", __name__)
 
@@ -19,30 +24,62 @@ def validate_fields(data, required):
     missing = [f for f in required if f not in data or data[f] in (None, "")]
     return missing
 
+def parse_date(s):
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date()
+    except Exception:
+        return None
+
 # ============================================================
 # 1. Listar todos os carros
 # ============================================================
 @carros_blueprint.route("/carros", methods=["GET"])
+@condicional("Carro", "Categoria")
 def listar_carros():
+    try:
+        after, limit = ler_paginacao(str, str)
+    except ValueError as e:
+        return bad_request(str(e))
+
     db = DatabaseManager()
     try:
-        query = """
+        params = []
+        filtro = ""
+        if after:
+            # continua depois da última linha da página anterior (ordem nome, placa)
+            filtro = "WHERE (c.nome, c.placa) > (%s, %s)"
+            params.extend(after)
+        limite = ""
+        if limit:
+            limite = "LIMIT %s"
+            params.append(limit)
+
+        query = f"""
             SELECT 
                 c.placa, 
                 c.nome, 
                 c.tipo_categoria, 
                 c.imagem_url AS imagem,
                 c.status_carro,
-                cat.preco_diaria AS preco,
-                cat.descricao AS descricao_categoria,
                 c.ano,
                 c.quilometragem,
                 c.chassi
             FROM Carro c
-            JOIN Categoria cat ON cat.tipo = c.tipo_categoria
-            ORDER BY c.nome;
+            {filtro}
+            ORDER BY c.nome, c.placa
+            {limite};
         """
-        carros = db.execute_select_all(query)
+        # preço e descrição da categoria vêm do cache de referência
+        if quer_ndjson():
+            return resposta_ndjson(
+                anexar_categoria(carro, descricao="descricao_categoria")
+                for carro in db.iter_select(query, params)
+            )
+
+        carros = [anexar_categoria(carro, descricao="descricao_categoria")
+                  for carro in db.execute_select_all(query, params)]
+        if limit:
+            return jsonify({"carros": carros, "proximo": proxima_chave(carros, limit, "nome", "placa")}), 200
         return jsonify({"carros": carros}), 200
     except Exception as e:
         print(f"Erro: {e}")
@@ -52,6 +89,7 @@ def listar_carros():
 # 2. Obter carro por placa
 # ============================================================
 @carros_blueprint.route("/carros/<placa>", methods=["GET"])
+@condicional("Carro", "Categoria")
 def obter_carro(placa):
     db = DatabaseManager()
     try:
@@ -64,11 +102,8 @@ def obter_carro(placa):
                 c.chassi,
                 c.tipo_categoria, 
                 c.imagem_url AS imagem,
-                c.status_carro,
-                cat.descricao,
-                cat.preco_diaria AS preco
+                c.status_carro
             FROM Carro c
-            JOIN Categoria cat ON cat.tipo = c.tipo_categoria
             WHERE c.placa = %s;
         """
         carro = db.execute_select_one(query, (placa,))
@@ -76,6 +111,8 @@ def obter_carro(placa):
         if not carro:
             return jsonify({"erro": "Carro não encontrado"}), 404
 
+        anexar_categoria(carro, descricao="descricao")
+
         return jsonify(carro), 200
     except Exception:
         return internal_error()
@@ -134,32 +171,23 @@ def criar_carro():
             INSERT INTO Carro (placa, nome, chassi, ano, tipo_categoria, imagem_url, status_carro, quilometragem)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
         """
-        db.execute_statement(
-            query,
-            (
-                data["placa"],
-                data["nome"],
-                data["chassi"],
-                data["ano"],
-                data["tipo_categoria"],
-                data.get("imagem_url", "placeholder.png"),
-                data.get("status_carro", "DISPONIVEL"),
-                data.get("quilometragem", 0)
-            ),
-        )
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(
+                query,
+                (
+                    data["placa"],
+                    data["nome"],
+                    data["chassi"],
+                    data["ano"],
+                    data["tipo_categoria"],
+                    data.get("imagem_url", "placeholder.png"),
+                    data.get("status_carro", "DISPONIVEL"),
+                    data.get("quilometragem", 0)
+                ),
+            )
 
         return jsonify({"mensagem": "Carro cadastrado com sucesso!"}), 201
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         print(f"Erro: {e}")
         return internal_error()
 
@@ -190,31 +218,22 @@ def atualizar_carro(placa):
                 status_carro = COALESCE(%s, status_carro)
             WHERE placa = %s;
         """
-        db.execute_statement(
-            query,
-            (
-                data.get("nome"),
-                data.get("ano"),
-                data.get("quilometragem"),
-                data.get("tipo_categoria"),
-                data.get("imagem_url"),
-                data.get("status_carro"),
-                placa,
-            ),
-        )
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(
+                query,
+                (
+                    data.get("nome"),
+                    data.get("ano"),
+                    data.get("quilometragem"),
+                    data.get("tipo_categoria"),
+                    data.get("imagem_url"),
+                    data.get("status_carro"),
+                    placa,
+                ),
+            )
 
         return jsonify({"mensagem": "Carro atualizado com sucesso!"}), 200
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         print("ERRO:", e)
         return internal_error()
 
@@ -250,63 +269,123 @@ def deletar_carro(placa):
             return jsonify({"erro": "Carro possui aluguel em andamento"}), 400
 
         query = "DELETE FROM Carro WHERE placa = %s;"
-        success = db.execute_statement(query, (placa,))
-        
-        if not success:
+        try:
+            with db.transaction():
+                db.execute_statement(query, (placa,))
+        except IntegrityError:
+            # ainda referenciado por Aluguel/Manutencao
             return jsonify({"erro": "Não foi possível remover o carro"}), 400
 
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
-
         return jsonify({"mensagem": "Carro removido com sucesso!"}), 200
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ============================================================
 # 7. Listar categorias
 # ============================================================
 @carros_blueprint.route("/categorias", methods=["GET"])
+@condicional("Categoria")
 def listar_categorias():
-    db = DatabaseManager()
     try:
-        query = "SELECT tipo, preco_diaria AS preco, descricao FROM Categoria ORDER BY tipo;"
-        categorias = db.execute_select_all(query)
-        return jsonify({"categorias": categorias}), 200
+        dados = [
+            {"tipo": cat["tipo"], "preco": cat["preco_diaria"], "descricao": cat["descricao"]}
+            for cat in categorias().values()
+        ]
+        return jsonify({"categorias": dados}), 200
     except Exception as e:
         return internal_error(str(e))
 
 # ============================================================
 # 8. Carros disponíveis - CORRIGIDO
 # ============================================================
+# Sem datas: carros com status DISPONIVEL agora.
+# Com ?de=AAAA-MM-DD&ate=AAAA-MM-DD (ate inclusivo): carros sem locação ou
+# manutenção no período, pela agenda (AgendaCarro, índice GiST em periodo).
+# Locações em aberto já vencidas bloqueiam qualquer período: o carro ainda
+# não tem data para voltar. Por isso a resposta com período muda com o
+# relógio, sem escrita nenhuma, e fica fora do GET condicional.
+QUERY_DISPONIVEIS_PERIODO = """
+    WITH ocupados AS (
+        SELECT placa FROM AgendaCarro
+        WHERE periodo && tsrange(%(de)s, %(ate)s)
+        UNION
+        SELECT placa FROM AgendaCarro
+        WHERE em_aberto AND upper(periodo) <= LOCALTIMESTAMP
+    )
+    SELECT 
+        c.placa, 
+        c.nome, 
+        c.tipo_categoria, 
+        c.imagem_url AS imagem,
+        c.status_carro,
+        c.ano,
+        c.quilometragem
+    FROM Carro c
+    WHERE NOT EXISTS (SELECT 1 FROM ocupados o WHERE o.placa = c.placa)
+    {filtro}
+    ORDER BY c.nome, c.placa
+    {limite};
+"""
+
 @carros_blueprint.route("/carros/disponiveis", methods=["GET"])
+@condicional("Carro", "Categoria", quando=lambda: "de" not in request.args and "ate" not in request.args)
 def carros_disponiveis():
+    de = request.args.get("de")
+    ate = request.args.get("ate")
+    if (de is None) != (ate is None):
+        return bad_request("Informe 'de' e 'ate' juntos")
+    periodo = None
+    if de is not None:
+        inicio, fim = parse_date(de), parse_date(ate)
+        if not inicio or not fim:
+            return bad_request("Formato de data inválido. Use YYYY-MM-DD.")
+        if fim < inicio:
+            return bad_request("'ate' não pode ser anterior a 'de'")
+        periodo = {"de": inicio, "ate": fim + timedelta(days=1)}
+
+    try:
+        after, limit = ler_paginacao(str, str)
+    except ValueError as e:
+        return bad_request(str(e))
+
     db = DatabaseManager()
     try:
-        query = """
-            SELECT 
-                c.placa, 
-                c.nome, 
-                c.tipo_categoria, 
-                c.imagem_url AS imagem,
-                c.status_carro,
-                cat.preco_diaria AS preco,
-                cat.descricao AS descricao_categoria,
-                c.ano,
-                c.quilometragem
-            FROM Carro c
-            JOIN Categoria cat ON cat.tipo = c.tipo_categoria
-            WHERE c.status_carro = 'DISPONIVEL'
-            ORDER BY c.nome;
-        """
-        carros = db.execute_select_all(query)
-        return jsonify({"carros": carros}), 200
+        params = dict(periodo or {})
+        filtro = ""
+        if after:
+            filtro = "AND (c.nome, c.placa) > (%(after_nome)s, %(after_placa)s)"
+            params["after_nome"], params["after_placa"] = after
+        limite = ""
+        if limit:
+            limite = "LIMIT %(limit)s"
+            params["limit"] = limit
+
+        if periodo:
+            query = QUERY_DISPONIVEIS_PERIODO.format(filtro=filtro, limite=limite)
+        else:
+            query = f"""
+                SELECT 
+                    c.placa, 
+                    c.nome, 
+                    c.tipo_categoria, 
+                    c.imagem_url AS imagem,
+                    c.status_carro,
+                    c.ano,
+                    c.quilometragem
+                FROM Carro c
+                WHERE c.status_carro = 'DISPONIVEL'
+                {filtro}
+                ORDER BY c.nome, c.placa
+                {limite};
+            """
+        carros = [anexar_categoria(carro, descricao="descricao_categoria")
+                  for carro in db.execute_select_all(query, params)]
+        resposta = {"carros": carros}
+        if periodo:
+            resposta["periodo"] = {"de": de, "ate": ate}
+        if limit:
+            resposta["proximo"] = proxima_chave(carros, limit, "nome", "placa")
+        return jsonify(resposta), 200
     except Exception as e:
         print(f"Erro: {e}")
         return internal_error()
@@ -327,15 +406,13 @@ def carros_em_manutencao():
                 m.num_manutencao,
                 m.custo,
                 m.data_inicio,
-                m.descricao,
-                cat.preco_diaria AS preco
+                m.descricao
             FROM Carro c
             JOIN Manutencao m ON c.placa = m.placa_carro
-            JOIN Categoria cat ON c.tipo_categoria = cat.tipo
             WHERE m.data_retorno IS NULL
             ORDER BY m.data_inicio DESC;
         """
-        dados = db.execute_select_all(query)
+        dados = [anexar_categoria(carro) for carro in db.execute_select_all(query)]
         return jsonify({"carros_manutencao": dados}), 200
     except Exception as e:
         print(f"Erro: {e}")
@@ -368,20 +445,11 @@ def atualizar_status_carro(placa):
             return jsonify({"erro": "Carro não encontrado"}), 404
 
         query = "UPDATE Carro SET status_carro = %s WHERE placa = %s;"
-        db.execute_statement(query, (status, placa))
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(query, (status, placa))
 
         return jsonify({"mensagem": "Status atualizado com sucesso!"}), 200
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ============================================================
@@ -397,15 +465,13 @@ def carros_por_categoria(categoria):
                 c.nome, 
                 c.tipo_categoria, 
                 c.imagem_url AS imagem,
-                c.status_carro,
-                cat.preco_diaria AS preco,
-                cat.descricao AS descricao_categoria
+                c.status_carro
             FROM Carro c
-            JOIN Categoria cat ON cat.tipo = c.tipo_categoria
             WHERE c.tipo_categoria = %s
             ORDER BY c.nome;
         """
-        carros = db.execute_select_all(query, (categoria,))
+        carros = [anexar_categoria(carro, descricao="descricao_categoria")
+                  for carro in db.execute_select_all(query, (categoria,))]
         return jsonify({"carros": carros}), 200
     except Exception as e:
         print(f"Erro: {e}")
@@ -416,18 +482,20 @@ def carros_por_categoria(categoria):
 # ============================================================
 @carros_blueprint.route("/carros/estatisticas", methods=["GET"])
 def estatisticas_carros():
-    db = DatabaseManager()
+    db = DatabaseManager(leitura=True)
     try:
+        # Contadores mantidos por trigger em FrotaResumo: custo proporcional
+        # ao número de categorias/anos, não ao tamanho da frota
         query = """
             SELECT 
-                COUNT(*) as total_carros,
-                COUNT(CASE WHEN status_carro = 'DISPONIVEL' THEN 1 END) as disponiveis,
-                COUNT(CASE WHEN status_carro = 'ALUGADO' THEN 1 END) as alugados,
-                COUNT(CASE WHEN status_carro = 'MANUTENCAO' THEN 1 END) as manutencao,
-                AVG(quilometragem) as media_km,
-                MIN(ano) as ano_mais_antigo,
-                MAX(ano) as ano_mais_novo
-            FROM Carro;
+                COALESCE(SUM(quantidade), 0) as total_carros,
+                COALESCE(SUM(quantidade) FILTER (WHERE status_carro = 'DISPONIVEL'), 0) as disponiveis,
+                COALESCE(SUM(quantidade) FILTER (WHERE status_carro = 'ALUGADO'), 0) as alugados,
+                COALESCE(SUM(quantidade) FILTER (WHERE status_carro = 'MANUTENCAO'), 0) as manutencao,
+                SUM(soma_km) / NULLIF(SUM(qtd_com_km), 0) as media_km,
+                MIN(ano) FILTER (WHERE quantidade > 0) as ano_mais_antigo,
+                MAX(ano) FILTER (WHERE quantidade > 0) as ano_mais_novo
+            FROM FrotaResumo;
         """
         estatisticas = db.execute_select_one(query)
         
@@ -435,10 +503,11 @@ def estatisticas_carros():
         query_categorias = """
             SELECT 
                 tipo_categoria,
-                COUNT(*) as quantidade,
-                AVG(quilometragem) as media_km
-            FROM Carro
+                SUM(quantidade) as quantidade,
+                SUM(soma_km) / NULLIF(SUM(qtd_com_km), 0) as media_km
+            FROM FrotaResumo
             GROUP BY tipo_categoria
+            HAVING SUM(quantidade) > 0
             ORDER BY quantidade DESC;
         """
         categorias_stats = db.execute_select_all(query_categorias)
@@ -465,19 +534,17 @@ def carros_manutencao_preventiva():
                 c.tipo_categoria,
                 c.quilometragem,
                 c.ano,
-                cat.preco_diaria AS preco,
                 CASE 
                     WHEN c.quilometragem > 100000 THEN 'ALTA'
                     WHEN c.quilometragem > 50000 THEN 'MEDIA'
                     ELSE 'BAIXA'
                 END as prioridade_manutencao
             FROM Carro c
-            JOIN Categoria cat ON c.tipo_categoria = cat.tipo
             WHERE c.status_carro != 'MANUTENCAO'
             AND c.quilometragem > 30000  # Acima de 30k km pode precisar de revisão
             ORDER BY c.quilometragem DESC;
         """
-        carros = db.execute_select_all(query)
+        carros = [anexar_categoria(carro) for carro in db.execute_select_all(query)]
         return jsonify({"carros_manutencao_preventiva": carros}), 200
     except Exception as e:
         print(f"Erro: {e}")
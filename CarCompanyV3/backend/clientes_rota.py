@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from database.conector import DatabaseManager
 import re
 
+from paginacao import ler_paginacao, proxima_chave, quer_ndjson, resposta_ndjson
+from referencia import total_acessorios, total_categorias
+
 clientes_blueprint = Blueprint("clientes", __name__)
 
 # ============================================================
@@ -37,19 +40,49 @@ def formatar_cpf(cpf: str):
 # ============================================================
 @clientes_blueprint.route("/clientes", methods=["GET"])
 def listar_clientes():
+    try:
+        after, limit = ler_paginacao(str, str)
+    except ValueError as e:
+        return bad_request(str(e))
+
     db = DatabaseManager()
     try:
-        query = """
-            SELECT 
-                cpf, 
-                nome, 
-                endereco, 
-                telefone,
-                (SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = cpf) as total_alugueis
-            FROM Cliente
-            ORDER BY nome;
+        params = []
+        filtro = ""
+        if after:
+            # continua depois da última linha da página anterior (ordem nome, cpf)
+            filtro = "WHERE (nome, cpf) > (%s, %s)"
+            params.extend(after)
+        limite = ""
+        if limit:
+            limite = "LIMIT %s"
+            params.append(limit)
+
+        # total de aluguéis vem de ClienteResumo (mantido por trigger)
+        query = f"""
+            WITH pagina AS (
+                SELECT cpf, nome, endereco, telefone
+                FROM Cliente
+                {filtro}
+                ORDER BY nome, cpf
+                {limite}
+            )
+            SELECT
+                pg.cpf,
+                pg.nome,
+                pg.endereco,
+                pg.telefone,
+                COALESCE(r.total_alugueis, 0) as total_alugueis
+            FROM pagina pg
+            LEFT JOIN ClienteResumo r ON r.cpf = pg.cpf
+            ORDER BY pg.nome, pg.cpf;
         """
-        clientes = db.execute_select_all(query)
+        if quer_ndjson():
+            return resposta_ndjson(db.iter_select(query, params))
+
+        clientes = db.execute_select_all(query, params)
+        if limit:
+            return jsonify({"clientes": clientes, "proximo": proxima_chave(clientes, limit, "nome", "cpf")}), 200
         return jsonify({"clientes": clientes}), 200
     except Exception as e:
         return internal_error(str(e))
@@ -67,14 +100,15 @@ def obter_cliente(cpf):
 
         query = """
             SELECT 
-                cpf, 
-                nome, 
-                endereco, 
-                telefone,
-                (SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf) as total_alugueis,
-                (SELECT MAX(data_retirada) FROM Aluguel WHERE cpf_cliente = Cliente.cpf) as ultimo_aluguel
-            FROM Cliente 
-            WHERE cpf = %s;
+                cli.cpf, 
+                cli.nome, 
+                cli.endereco, 
+                cli.telefone,
+                COALESCE(r.total_alugueis, 0) as total_alugueis,
+                r.ultimo_aluguel
+            FROM Cliente cli
+            LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf
+            WHERE cli.cpf = %s;
         """
         cliente = db.execute_select_one(query, (cpf_formatado,))
 
@@ -96,15 +130,16 @@ def buscar_por_nome(nome):
             return bad_request("Termo de busca deve ter pelo menos 2 caracteres")
 
         query = """
-            SELECT 
-                cpf, 
-                nome, 
-                endereco, 
-                telefone,
-                (SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf) as total_alugueis
-            FROM Cliente
-            WHERE nome ILIKE %s
-            ORDER BY nome;
+            SELECT
+                cli.cpf,
+                cli.nome,
+                cli.endereco,
+                cli.telefone,
+                COALESCE(r.total_alugueis, 0) as total_alugueis
+            FROM Cliente cli
+            LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf
+            WHERE cli.nome ILIKE %s
+            ORDER BY cli.nome;
         """
         dados = db.execute_select_all(query, (f"%{nome}%",))
         return jsonify({"clientes": dados}), 200
@@ -143,22 +178,16 @@ def criar_cliente():
             VALUES (%s, %s, %s, %s);
         """
         
-        success = db.execute_statement(
-            query,
-            (
-                cpf_formatado,
-                data["nome"].strip(),
-                data.get("endereco", "").strip(),
-                data.get("telefone", "").strip(),
-            ),
-        )
-
-        if not success:
-            return internal_error("Falha ao cadastrar cliente")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(
+                query,
+                (
+                    cpf_formatado,
+                    data["nome"].strip(),
+                    data.get("endereco", "").strip(),
+                    data.get("telefone", "").strip(),
+                ),
+            )
 
         return jsonify({
             "mensagem": "Cliente cadastrado com sucesso!",
@@ -166,12 +195,6 @@ def criar_cliente():
         }), 201
 
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ============================================================
@@ -206,32 +229,20 @@ def atualizar_cliente(cpf):
             WHERE cpf = %s;
         """
         
-        success = db.execute_statement(
-            query,
-            (
-                data.get("nome", "").strip() or None,
-                data.get("endereco", "").strip() or None,
-                data.get("telefone", "").strip() or None,
-                cpf_formatado,
-            ),
-        )
-
-        if not success:
-            return internal_error("Falha ao atualizar cliente")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(
+                query,
+                (
+                    data.get("nome", "").strip() or None,
+                    data.get("endereco", "").strip() or None,
+                    data.get("telefone", "").strip() or None,
+                    cpf_formatado,
+                ),
+            )
 
         return jsonify({"mensagem": "Cliente atualizado com sucesso!"}), 200
 
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ============================================================
@@ -245,57 +256,36 @@ def deletar_cliente(cpf):
 
     db = DatabaseManager()
     try:
-        # Verificar se cliente existe
-        cliente = db.execute_select_one(
-            "SELECT cpf, nome FROM Cliente WHERE cpf = %s", 
-            (cpf_formatado,)
-        )
+        # Verificar se cliente existe (com totais de aluguel do resumo)
+        cliente = db.execute_select_one("""
+            SELECT cli.cpf, cli.nome,
+                   COALESCE(r.total_alugueis, 0) as total_alugueis,
+                   COALESCE(r.alugueis_ativos, 0) as alugueis_ativos
+            FROM Cliente cli
+            LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf
+            WHERE cli.cpf = %s
+        """, (cpf_formatado,))
         if not cliente:
             return jsonify({"erro": "Cliente não encontrado"}), 404
 
         # Verificar se cliente tem aluguéis ativos
-        aluguel_ativo = db.execute_select_one("""
-            SELECT 1 FROM Aluguel 
-            WHERE cpf_cliente = %s 
-            AND NOT EXISTS (
-                SELECT 1 FROM Devolucao WHERE num_locacao = Aluguel.num_locacao
-            )
-        """, (cpf_formatado,))
-
-        if aluguel_ativo:
+        if cliente["alugueis_ativos"] > 0:
             return jsonify({"erro": "Não é possível remover cliente com aluguel em andamento"}), 400
 
         # Verificar histórico geral de aluguéis
-        historico_alugueis = db.execute_select_one(
-            "SELECT COUNT(*) as total FROM Aluguel WHERE cpf_cliente = %s",
-            (cpf_formatado,)
-        )
-
-        if historico_alugueis and historico_alugueis["total"] > 0:
+        if cliente["total_alugueis"] > 0:
             return jsonify({
                 "erro": "Não é possível remover cliente com histórico de aluguel",
-                "total_alugueis": historico_alugueis["total"]
+                "total_alugueis": cliente["total_alugueis"]
             }), 400
 
         query = "DELETE FROM Cliente WHERE cpf = %s;"
-        success = db.execute_statement(query, (cpf_formatado,))
-        
-        if not success:
-            return internal_error("Falha ao remover cliente")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(query, (cpf_formatado,))
 
         return jsonify({"mensagem": "Cliente removido com sucesso!"}), 200
 
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ============================================================
@@ -307,13 +297,18 @@ def historico_cliente(cpf):
     if not cpf_formatado:
         return bad_request("CPF inválido")
 
-    db = DatabaseManager()
+    db = DatabaseManager(leitura=True)
     try:
-        # Verificar se cliente existe
-        cliente = db.execute_select_one(
-            "SELECT nome FROM Cliente WHERE cpf = %s", 
-            (cpf_formatado,)
-        )
+        # Verificar se cliente existe (estatísticas já consolidadas no resumo)
+        cliente = db.execute_select_one("""
+            SELECT cli.nome,
+                   COALESCE(r.total_alugueis, 0) as total_alugueis,
+                   COALESCE(r.alugueis_ativos, 0) as alugueis_ativos,
+                   r.total_gasto
+            FROM Cliente cli
+            LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf
+            WHERE cli.cpf = %s
+        """, (cpf_formatado,))
         if not cliente:
             return jsonify({"erro": "Cliente não encontrado"}), 404
 
@@ -343,19 +338,17 @@ def historico_cliente(cpf):
             ORDER BY a.data_retirada DESC;
         """
         dados = db.execute_select_all(query, (cpf_formatado,))
-        
-        # Calcular estatísticas
-        total_alugueis = len(dados)
-        alugueis_ativos = len([a for a in dados if a["status"] == "EM ANDAMENTO"])
-        total_gasto = sum([a["valor_final"] or a["valor_previsto"] for a in dados if a["valor_final"] or a["valor_previsto"]])
+
+        # sem aluguéis o total é o 0 numérico (soma vazia), não o "0.00" do NUMERIC
+        total_gasto = cliente["total_gasto"] if cliente["total_alugueis"] else 0
 
         return jsonify({
             "cliente": cliente["nome"],
             "cpf": cpf_formatado,
             "historico": dados,
             "estatisticas": {
-                "total_alugueis": total_alugueis,
-                "alugueis_ativos": alugueis_ativos,
+                "total_alugueis": cliente["total_alugueis"],
+                "alugueis_ativos": cliente["alugueis_ativos"],
                 "total_gasto": total_gasto
             }
         }), 200
@@ -368,18 +361,16 @@ def historico_cliente(cpf):
 # ============================================================
 @clientes_blueprint.route("/clientes/promocao/todas-categorias", methods=["GET"])
 def clientes_todas_categorias():
-    db = DatabaseManager()
+    db = DatabaseManager(leitura=True)
     try:
         query = """
-            SELECT cli.cpf, cli.nome, COUNT(DISTINCT car.tipo_categoria) as categorias_utilizadas
-            FROM Cliente cli
-            JOIN Aluguel al ON al.cpf_cliente = cli.cpf
-            JOIN Carro car ON car.placa = al.placa
-            GROUP BY cli.cpf, cli.nome
-            HAVING COUNT(DISTINCT car.tipo_categoria) = (SELECT COUNT(*) FROM Categoria)
+            SELECT cli.cpf, cli.nome, r.categorias_utilizadas
+            FROM ClienteResumo r
+            JOIN Cliente cli ON cli.cpf = r.cpf
+            WHERE r.categorias_utilizadas = %s
             ORDER BY cli.nome;
         """
-        dados = db.execute_select_all(query)
+        dados = db.execute_select_all(query, (total_categorias(),))
         return jsonify({"clientes_elite": dados}), 200
     except Exception as e:
         return internal_error(str(e))
@@ -389,18 +380,16 @@ def clientes_todas_categorias():
 # ============================================================
 @clientes_blueprint.route("/clientes/promocao/todos-acessorios", methods=["GET"])
 def clientes_todos_acessorios():
-    db = DatabaseManager()
+    db = DatabaseManager(leitura=True)
     try:
         query = """
-            SELECT cli.cpf, cli.nome, COUNT(DISTINCT aa.tipo_acessorio) as acessorios_utilizados
-            FROM Cliente cli
-            JOIN Aluguel al ON al.cpf_cliente = cli.cpf
-            JOIN Aluguel_Acessorio aa ON aa.num_locacao = al.num_locacao
-            GROUP BY cli.cpf, cli.nome
-            HAVING COUNT(DISTINCT aa.tipo_acessorio) = (SELECT COUNT(*) FROM Acessorio)
+            SELECT cli.cpf, cli.nome, r.acessorios_utilizados
+            FROM ClienteResumo r
+            JOIN Cliente cli ON cli.cpf = r.cpf
+            WHERE r.acessorios_utilizados = %s
             ORDER BY cli.nome;
         """
-        dados = db.execute_select_all(query)
+        dados = db.execute_select_all(query, (total_acessorios(),))
         return jsonify({"clientes_premium": dados}), 200
     except Exception as e:
         return internal_error(str(e))
@@ -410,33 +399,30 @@ def clientes_todos_acessorios():
 # ============================================================
 @clientes_blueprint.route("/clientes/estatisticas", methods=["GET"])
 def estatisticas_clientes():
-    db = DatabaseManager()
+    db = DatabaseManager(leitura=True)
     try:
+        # Totais por cliente lidos de ClienteResumo, sem varrer Aluguel
         query = """
-            SELECT 
+            SELECT
                 COUNT(*) as total_clientes,
-                COUNT(CASE WHEN EXISTS (
-                    SELECT 1 FROM Aluguel WHERE cpf_cliente = Cliente.cpf
-                ) THEN 1 END) as clientes_ativos,
-                AVG((SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf)) as media_alugueis_por_cliente,
-                MAX((SELECT COUNT(*) FROM Aluguel WHERE cpf_cliente = Cliente.cpf)) as max_alugueis_cliente
-            FROM Cliente;
+                COUNT(*) FILTER (WHERE r.total_alugueis > 0) as clientes_ativos,
+                AVG(COALESCE(r.total_alugueis, 0)) as media_alugueis_por_cliente,
+                MAX(COALESCE(r.total_alugueis, 0)) as max_alugueis_cliente
+            FROM Cliente cli
+            LEFT JOIN ClienteResumo r ON r.cpf = cli.cpf;
         """
         estatisticas = db.execute_select_one(query)
-        
-        # Top clientes
+
+        # Top clientes (idx_cliente_resumo_gasto)
         query_top = """
-            SELECT 
+            SELECT
                 c.cpf,
                 c.nome,
-                COUNT(a.num_locacao) as total_alugueis,
-                SUM(COALESCE(p.valor_total, a.valor_previsto)) as total_gasto
-            FROM Cliente c
-            LEFT JOIN Aluguel a ON a.cpf_cliente = c.cpf
-            LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
-            LEFT JOIN Pagamento p ON p.num_pagamento = d.num_pagamento
-            GROUP BY c.cpf, c.nome
-            ORDER BY total_gasto DESC NULLS LAST
+                r.total_alugueis,
+                CASE WHEN r.total_alugueis > 0 THEN r.total_gasto END as total_gasto
+            FROM ClienteResumo r
+            JOIN Cliente c ON c.cpf = r.cpf
+            ORDER BY r.total_gasto DESC
             LIMIT 10;
         """
         top_clientes = db.execute_select_all(query_top)
@@ -491,59 +477,35 @@ def upsert_cliente():
         return bad_request("Campos obrigatórios ausentes", missing)
 
     cpf_formatado = formatar_cpf(data["cpf"])
-    if not cpf_formatado:
+    if not validar_cpf(cpf_formatado):
         return bad_request("CPF inválido. Deve conter 11 dígitos numéricos.")
 
     db = DatabaseManager()
     try:
-        # Verificar se cliente já existe
-        cliente_existente = db.execute_select_one(
-            "SELECT cpf FROM Cliente WHERE cpf = %s", 
-            (cpf_formatado,)
+        # Um único comando: dois upserts simultâneos do mesmo CPF não disputam
+        # o INSERT (o segundo vira UPDATE). Na atualização, endereço/telefone
+        # vazios mantêm o valor atual; xmax = 0 só na linha recém-inserida.
+        query = """
+            INSERT INTO Cliente AS c (cpf, nome, endereco, telefone)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (cpf) DO UPDATE SET
+                nome = EXCLUDED.nome,
+                endereco = COALESCE(NULLIF(EXCLUDED.endereco, ''), c.endereco),
+                telefone = COALESCE(NULLIF(EXCLUDED.telefone, ''), c.telefone)
+            RETURNING (xmax = 0) AS criado;
+        """
+        resultado = db.execute_insert_returning(
+            query,
+            (
+                cpf_formatado,
+                data["nome"].strip(),
+                (data.get("endereco") or "").strip(),
+                (data.get("telefone") or "").strip(),
+            ),
         )
-
-        if cliente_existente:
-            # Atualizar cliente existente
-            query = """
-                UPDATE Cliente
-                SET nome = %s,
-                    endereco = COALESCE(%s, endereco),
-                    telefone = COALESCE(%s, telefone)
-                WHERE cpf = %s;
-            """
-            success = db.execute_statement(
-                query,
-                (
-                    data["nome"].strip(),
-                    data.get("endereco", "").strip() or None,
-                    data.get("telefone", "").strip() or None,
-                    cpf_formatado,
-                ),
-            )
-            acao = "atualizado"
-        else:
-            # Criar novo cliente
-            query = """
-                INSERT INTO Cliente (cpf, nome, endereco, telefone)
-                VALUES (%s, %s, %s, %s);
-            """
-            success = db.execute_statement(
-                query,
-                (
-                    cpf_formatado,
-                    data["nome"].strip(),
-                    data.get("endereco", "").strip(),
-                    data.get("telefone", "").strip(),
-                ),
-            )
-            acao = "criado"
-
-        if not success:
-            return internal_error(f"Falha ao {acao} cliente")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        if not resultado:
+            return internal_error("Erro ao salvar cliente")
+        acao = "criado" if resultado["criado"] else "atualizado"
 
         return jsonify({
             "mensagem": f"Cliente {acao} com sucesso!",
@@ -552,10 +514,4 @@ def upsert_cliente():
         }), 200
 
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
\ No newline at end of file
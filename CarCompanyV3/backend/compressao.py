@@ -0,0 +1,59 @@
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # sem brotli: só gzip
+    brotli = None
+
+# ============================================================
+# Compressão das respostas (Accept-Encoding: br / gzip)
+# ============================================================
+# Respostas pequenas vão sem compressão: abaixo de ~1 pacote o ganho em
+# bytes não paga o tempo de CPU. Streams (NDJSON) também não são tocados.
+TAMANHO_MINIMO = 1400
+NIVEL_GZIP = 5
+QUALIDADE_BROTLI = 4
+TIPOS_COMPRIMIVEIS = ("application/json", "text/")
+
+
+def _comprimir(corpo, codificacao):
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI)
+    return gzip.compress(corpo, compresslevel=NIVEL_GZIP)
+
+
+def codificacao_aceita():
+    """'br' ou 'gzip' conforme o Accept-Encoding do cliente, ou None"""
+    oferecidas = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(oferecidas)
+
+
+def comprimir_resposta(resposta):
+    if (
+        resposta.status_code != 200
+        or resposta.direct_passthrough
+        or resposta.is_streamed
+        or "Content-Encoding" in resposta.headers
+        or not (resposta.mimetype or "").startswith(TIPOS_COMPRIMIVEIS)
+    ):
+        return resposta
+
+    # mesmo sem comprimir agora, a resposta depende do Accept-Encoding
+    resposta.vary.add("Accept-Encoding")
+    corpo = resposta.get_data()
+    if len(corpo) < TAMANHO_MINIMO:
+        return resposta
+
+    codificacao = codificacao_aceita()
+    if codificacao is None:
+        return resposta
+
+    resposta.set_data(_comprimir(corpo, codificacao))
+    resposta.headers["Content-Encoding"] = codificacao
+    return resposta
+
+
+def init_app(app) -> None:
+    app.after_request(comprimir_resposta)
@@ -0,0 +1,107 @@
+import hashlib
+from functools import wraps
+
+from flask import make_response, request
+
+from cache import CacheTTL
+from database.conector import DatabaseManager
+from referencia import invalidar_referencias
+
+# ============================================================
+# GET condicional (ETag / Last-Modified) por versão de tabela
+# ============================================================
+# A versão de cada tabela é a soma das fatias dela em VersaoTabela; a transação
+# que altera a tabela soma 1 em uma fatia, visível só depois do COMMIT dela
+# (ver a seção 18 do banco.sql). A versão é lida no máximo
+# uma vez por segundo por processo; um If-None-Match que ainda confere recebe
+# 304 sem ir ao banco.
+TABELAS_VERSIONADAS = ("Carro", "Categoria", "AgendaCarro")
+INTERVALO_VERSOES = 1.0
+
+QUERY_VERSOES = """
+    SELECT t.tabela, COALESCE(SUM(v.versao), 0) AS versao,
+           date_trunc('second', MAX(v.modificado_em)) AS modificado_em
+    FROM unnest(%s::text[]) AS t(tabela)
+    LEFT JOIN VersaoTabela v ON v.tabela = lower(t.tabela)
+    GROUP BY t.tabela;
+"""
+
+_cache = CacheTTL(INTERVALO_VERSOES)
+# última versão de Categoria vista por este processo
+_versao_categoria = None
+
+
+def _carregar_versoes():
+    global _versao_categoria
+    db = DatabaseManager()
+    try:
+        linhas = db.execute_select_all(QUERY_VERSOES, (list(TABELAS_VERSIONADAS),))
+    finally:
+        db.close()
+
+    atuais = {linha["tabela"]: (linha["versao"], linha["modificado_em"]) for linha in linhas}
+    # Categoria mudou em outro processo: não servir a descrição antiga com ETag nova
+    if _versao_categoria is not None and atuais["Categoria"][0] != _versao_categoria:
+        invalidar_referencias()
+    _versao_categoria = atuais["Categoria"][0]
+    return atuais
+
+
+def versoes():
+    """{tabela: (versão, instante da última modificação ou None)} das tabelas versionadas"""
+    return _cache.obter("versoes", _carregar_versoes)
+
+
+def invalidar_versoes():
+    _cache.invalidar()
+
+
+def condicional(*tabelas, quando=None):
+    """Decora um GET cuja resposta depende só de `tabelas` (e da URL).
+
+    `quando`: função sem argumentos; se devolver False a requisição é
+    atendida sem ETag (ex.: variantes que dependem do relógio, não só dos dados).
+
+    A ETag combina URL e versões; é lida antes da consulta, e uma versão só
+    aparece depois do COMMIT que a criou: o corpo é sempre pelo menos tão novo
+    quanto a ETag, e uma escrita concorrente no máximo faz o cliente baixar de
+    novo. O 304 depende só da ETag: If-Modified-Since sozinho (resolução de um
+    segundo) não distingue duas escritas no mesmo segundo e é ignorado.
+    Last-Modified vem de VersaoTabela, o mesmo em todos os workers.
+    """
+    def decorador(func):
+        @wraps(func)
+        def envolver(*args, **kwargs):
+            if quando is not None and not quando():
+                return func(*args, **kwargs)
+            atuais = versoes()
+            assinatura = request.full_path + "|" + "|".join(
+                f"{tabela}:{atuais[tabela][0]}" for tabela in tabelas
+            )
+            etag = hashlib.blake2b(assinatura.encode(), digest_size=12).hexdigest()
+            modificados = [atuais[tabela][1] for tabela in tabelas if atuais[tabela][1] is not None]
+
+            if request.if_none_match.contains_weak(etag):
+                resposta = make_response("", 304)
+            else:
+                resposta = make_response(func(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+
+            # fraca: a compressão pode mudar os bytes sem mudar o conteúdo
+            resposta.set_etag(etag, weak=True)
+            if modificados:
+                resposta.last_modified = max(modificados)
+            resposta.cache_control.no_cache = True
+            return resposta
+        return envolver
+    return decorador
+
+
+def init_app(app) -> None:
+    @app.after_request
+    def _invalidar_apos_escrita(resposta):
+        # escritas deste processo aparecem na próxima leitura, sem esperar o intervalo
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            invalidar_versoes()
+        return resposta
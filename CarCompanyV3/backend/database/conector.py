@@ -1,43 +1,501 @@
-from typing import Any, Optional
-import psycopg2
-from psycopg2.extras import DictCursor
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+from psycopg2.extras import DictCursor, execute_values
+from flask import g, has_app_context
+
+from database.configuracao import CHAVES_CONEXAO, CHAVES_SESSAO, ler_configuracao, opcoes_pool
+from database.instrumentacao import (
+    init_app as init_instrumentacao, registrar_consulta, registrar_erro, registrar_evento,
+)
+from database.pool import ConnectionPool
+
+CONEXAO = {
+    "dbname": "carcompany",
+    "user": "postgres",
+    "host": "127.0.0.1",
+    "password": "123",
+    "port": 5432,
+    "client_encoding": "utf8",
+    "application_name": "carcompany-api",
+}
+# campos que dizem onde conectar; um dsn configurado substitui os padrões
+CAMPOS_ENDERECO = ("dsn", "host", "port", "dbname", "user", "password")
+
+# Aplicados em cada conexão aberta pelo pool (e herdados por todo cursor dela).
+# statement_timeout abaixo do WEB_TIMEOUT do gunicorn: a consulta é cancelada
+# antes de o worker ser morto com a conexão na mão. Atrás do PgBouncer em modo
+# transaction, SETs de sessão não se mantêm: use ALTER ROLE ... SET.
+SESSAO = {
+    "statement_timeout": "25s",
+    "idle_in_transaction_session_timeout": "60s",
+}
+
+# schema usado pelas conexões do pool (os benchmarks apontam para aluguel_bench)
+SEARCH_PATH = "aluguel"
+
+POOL_CONFIG = {
+    "minconn": 1,
+    "maxconn": 10,
+    "timeout": 5.0,
+    "validar_apos": 30.0,
+}
+
+# Réplica de leitura (opcional): só os campos que mudam em relação a
+# CONEXAO, ex. {"host": "10.0.0.12"} ou {"port": 5433}. None = tudo no primário.
+CONEXAO_REPLICA: Optional[dict] = None
+# réplica mais atrasada que isso (segundos) não recebe leituras
+ATRASO_MAXIMO_REPLICA = 5.0
+# de quanto em quanto tempo o atraso é medido de novo (por processo)
+INTERVALO_CHECAGEM_REPLICA = 2.0
+# réplica fora do ar: nova tentativa após RETENTATIVA_REPLICA segundos,
+# dobrando a cada falha seguida até RETENTATIVA_MAXIMA_REPLICA
+RETENTATIVA_REPLICA = 0.5
+RETENTATIVA_MAXIMA_REPLICA = 30.0
+
+QUERY_ATRASO_REPLICA = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        -- tudo que chegou já foi aplicado: em dia, mesmo sem escrita recente no primário
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END;
+"""
+
+_pool: Optional[ConnectionPool] = None
+_pool_replica: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_pools_herdados = []
+
+# Estado da réplica no processo. _checagem_lock só garante uma medição por
+# vez (quem não o consegue usa o último valor, sem esperar a rede);
+# _estado_lock protege as variáveis abaixo e nunca é segurado durante I/O.
+_checagem_lock = threading.Lock()
+_estado_lock = threading.Lock()
+_atraso_replica: Optional[float] = None
+_proxima_checagem = 0.0
+_falhas_replica = 0
+
+
+def aplicar_configuracao(valores: dict) -> None:
+    """Aplica as chaves lidas por ler_configuracao(); vale para os próximos pools"""
+    global CONEXAO_REPLICA, ATRASO_MAXIMO_REPLICA
+    if "dsn" in valores:
+        for campo in CAMPOS_ENDERECO:
+            CONEXAO.pop(campo, None)
+    CONEXAO.update({chave: valores[chave] for chave in CHAVES_CONEXAO if chave in valores})
+    SESSAO.update({chave: valores[chave] for chave in CHAVES_SESSAO if chave in valores})
+    configurar_pool(**opcoes_pool(valores))
+    if "replica_dsn" in valores:
+        CONEXAO_REPLICA = {"dsn": valores["replica_dsn"]}
+    if "replica_atraso_maximo" in valores:
+        ATRASO_MAXIMO_REPLICA = float(valores["replica_atraso_maximo"])
+
+
+def sql_sessao():
+    """(sql, params) que aplica SEARCH_PATH e SESSAO em uma ida ao banco"""
+    parametros = {"search_path": SEARCH_PATH, **SESSAO}
+    sql = "SELECT " + ", ".join(["set_config(%s, %s, false)"] * len(parametros)) + ";"
+    return sql, [str(v) for item in parametros.items() for v in item]
+
+
+def _preparar_conexao(conn) -> None:
+    """Executado uma vez por conexão física, ao ser aberta pelo pool"""
+    with conn.cursor() as cur:
+        cur.execute(*sql_sessao())
+    conn.commit()
+
+
+def configurar_pool(**opcoes) -> None:
+    """Altera tamanho/timeout do pool; vale para o próximo pool criado"""
+    desconhecidas = set(opcoes) - set(POOL_CONFIG)
+    if desconhecidas:
+        raise ValueError(f"Opções de pool desconhecidas: {', '.join(sorted(desconhecidas))}")
+    POOL_CONFIG.update(opcoes)
+
+
+# DB_* do ambiente / arquivo de DB_CONFIG (ver database/configuracao.py)
+aplicar_configuracao(ler_configuracao())
+
+
+def get_pool() -> ConnectionPool:
+    """Pool único do processo, criado sob demanda"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    ao_conectar=_preparar_conexao,
+                    **POOL_CONFIG,
+                    **CONEXAO,
+                )
+    return _pool
+
+
+def _parametros_replica() -> dict:
+    base = dict(CONEXAO)
+    if "dsn" in CONEXAO_REPLICA:
+        # o dsn da réplica diz onde conectar; do primário ficam só as opções
+        for campo in CAMPOS_ENDERECO:
+            base.pop(campo, None)
+    return {**base, **CONEXAO_REPLICA}
+
+
+def get_pool_replica() -> ConnectionPool:
+    """Pool da réplica de leitura (CONEXAO_REPLICA), criado sob demanda"""
+    global _pool_replica
+    if _pool_replica is None:
+        if not CONEXAO_REPLICA:
+            raise RuntimeError("Réplica de leitura não configurada (CONEXAO_REPLICA)")
+        with _pool_lock:
+            if _pool_replica is None:
+                _pool_replica = ConnectionPool(
+                    ao_conectar=_preparar_conexao,
+                    **POOL_CONFIG,
+                    **_parametros_replica(),
+                )
+    return _pool_replica
+
+
+def close_pool() -> None:
+    global _pool, _pool_replica
+    with _pool_lock:
+        for pool in (_pool, _pool_replica):
+            if pool is not None:
+                pool.closeall()
+        _pool = _pool_replica = None
+    _reiniciar_estado_replica()
+
+
+def _descartar_pool_herdado() -> None:
+    """No filho após um fork: esquece os pools do pai sem fechar os sockets dele"""
+    global _pool, _pool_replica, _pool_lock, _checagem_lock, _estado_lock
+    # mantém a referência: se o objeto fosse coletado, o psycopg2 mandaria
+    # o término de sessão pelo socket que ainda é do pai
+    _pools_herdados.extend(p for p in (_pool, _pool_replica) if p is not None)
+    _pool = _pool_replica = None
+    _pool_lock = threading.Lock()
+    # o pai pode estar no meio de uma checagem: locks novos no filho
+    _checagem_lock = threading.Lock()
+    _estado_lock = threading.Lock()
+    _reiniciar_estado_replica()
+
+
+# cada worker (prefork) abre as próprias conexões; fechar as herdadas
+# encerraria também as sessões que o processo pai ainda usa
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_pool_herdado)
+
+
+# ============================================================
+# Réplica de leitura
+# ============================================================
+
+def _medir_atraso_replica() -> Optional[float]:
+    """Atraso da réplica em segundos; None se ela não respondeu"""
+    try:
+        pool = get_pool_replica()
+        conn = pool.getconn()
+    except Exception as e:
+        registrar_evento("replica_indisponivel", erro=str(e).strip())
+        return None
+    descartar = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute(QUERY_ATRASO_REPLICA)
+            atraso = float(cur.fetchone()[0])
+        conn.rollback()
+        if atraso > ATRASO_MAXIMO_REPLICA:
+            registrar_evento("replica_atrasada", atraso_s=round(atraso, 1), limite_s=ATRASO_MAXIMO_REPLICA)
+        return atraso
+    except Exception as e:
+        descartar = True
+        registrar_evento("replica_indisponivel", erro=str(e).strip())
+        return None
+    finally:
+        pool.putconn(conn, descartar=descartar)
+
+
+def _reiniciar_estado_replica() -> None:
+    """Esquece o atraso medido; a próxima leitura checa a réplica de novo"""
+    global _atraso_replica, _proxima_checagem, _falhas_replica
+    with _estado_lock:
+        _atraso_replica = None
+        _proxima_checagem = 0.0
+        _falhas_replica = 0
+
+
+def _registrar_checagem(atraso: Optional[float], erro: str = "") -> None:
+    """Guarda o resultado de uma checagem e loga as mudanças primário <-> réplica"""
+    global _atraso_replica, _proxima_checagem, _falhas_replica
+    with _estado_lock:
+        disponivel_antes = _atraso_replica is not None and _atraso_replica <= ATRASO_MAXIMO_REPLICA
+        _atraso_replica = atraso
+        if atraso is None:
+            _falhas_replica += 1
+            espera = min(RETENTATIVA_REPLICA * 2 ** (_falhas_replica - 1), RETENTATIVA_MAXIMA_REPLICA)
+        else:
+            _falhas_replica = 0
+            espera = INTERVALO_CHECAGEM_REPLICA
+        _proxima_checagem = time.monotonic() + espera
+        falhas = _falhas_replica
+    disponivel = atraso is not None and atraso <= ATRASO_MAXIMO_REPLICA
+    if disponivel_antes and not disponivel:
+        registrar_evento(
+            "replica_fallback_primario",
+            motivo=erro or ("sem resposta" if atraso is None else f"atraso {atraso:.1f}s"),
+            nova_checagem_s=round(espera, 1),
+        )
+    elif not disponivel and atraso is None and falhas > 1:
+        registrar_evento("replica_ainda_indisponivel", falhas=falhas, nova_checagem_s=round(espera, 1))
+    elif disponivel and not disponivel_antes:
+        registrar_evento("replica_restabelecida", atraso_s=round(atraso, 1))
+
+
+def atraso_replica() -> Optional[float]:
+    """Último atraso medido da réplica (s), no máximo INTERVALO_CHECAGEM_REPLICA velho
+
+    Após uma falha a checagem é refeita em RETENTATIVA_REPLICA segundos, com
+    espera dobrando a cada falha seguida. Enquanto uma thread mede, as outras
+    usam o último valor conhecido em vez de esperar.
+    """
+    if not CONEXAO_REPLICA:
+        return None
+    if time.monotonic() < _proxima_checagem or not _checagem_lock.acquire(blocking=False):
+        return _atraso_replica
+    try:
+        # outra thread pode ter acabado de medir
+        if time.monotonic() >= _proxima_checagem:
+            _registrar_checagem(_medir_atraso_replica())
+        return _atraso_replica
+    finally:
+        _checagem_lock.release()
+
+
+def replica_disponivel() -> bool:
+    atraso = atraso_replica()
+    return atraso is not None and atraso <= ATRASO_MAXIMO_REPLICA
+
+
+def _marcar_replica_indisponivel(erro: Exception) -> None:
+    """Leituras voltam ao primário até a próxima tentativa (RETENTATIVA_REPLICA, com backoff)"""
+    registrar_evento("replica_indisponivel", erro=str(erro).strip())
+    _registrar_checagem(None, erro=str(erro).strip())
+
+
+def _retirar_conexoes() -> list:
+    """[(pool, conexão)] emprestadas à requisição atual, retiradas de g"""
+    conexoes = []
+    conn = g.pop("_db_conn", None)
+    if conn is not None:
+        conexoes.append((get_pool(), conn))
+    conn = g.pop("_db_conn_replica", None)
+    if conn is not None:
+        conexoes.append((get_pool_replica(), conn))
+    return conexoes
+
+
+def liberar_conexao(exc: Optional[BaseException] = None) -> None:
+    """Devolve aos pools as conexões emprestadas pela requisição atual"""
+    for pool, conn in _retirar_conexoes():
+        pool.putconn(conn)
+
+
+def reter_conexoes_no_stream(resposta):
+    """Segura as conexões da requisição até o servidor fechar `resposta`.
+
+    O teardown roda assim que a view retorna, antes de o corpo em stream ser
+    gerado: sem isso a conexão voltaria ao pool (ROLLBACK, cursor de
+    iter_select fechado) enquanto o gerador ainda lê dela. O fechamento da
+    resposta acontece também se o cliente desconectar no meio.
+    """
+    conexoes = _retirar_conexoes()
+    if conexoes:
+        def devolver():
+            while conexoes:
+                pool, conn = conexoes.pop()
+                pool.putconn(conn)
+        resposta.call_on_close(devolver)
+    return resposta
+
+
+def init_app(app) -> None:
+    app.teardown_appcontext(liberar_conexao)
+    # X-DB-Queries / Server-Timing em cada resposta (streams: no log, ao fim do envio)
+    init_instrumentacao(app)
 
 
 class DatabaseManager:
     """Classe de Gerenciamento do database"""
 
-    def __init__(self) -> None:
-        self.conn = psycopg2.connect(
-            dbname="carcompany",
-            user="postgres",
-            host="127.0.0.1",
-            password="123",
-            port=5432,
-            client_encoding='utf8'
-        )
+    def __init__(self, leitura: bool = False) -> None:
+        # Dentro de uma requisição Flask todas as instâncias dividem a mesma
+        # conexão, devolvida ao pool no teardown. Fora dela quem cria chama close().
+        # leitura=True: só SELECTs, que podem ir para a réplica (CONEXAO_REPLICA);
+        # se ela estiver atrasada ou fora do ar, usa o primário.
+        self._propria = not has_app_context()
+        self.replica = False
+        if leitura and replica_disponivel():
+            try:
+                self.conn = self._emprestar(get_pool_replica(), "_db_conn_replica")
+                self.replica = True
+            except Exception as e:
+                _marcar_replica_indisponivel(e)
+        if not self.replica:
+            self.conn = self._emprestar(get_pool(), "_db_conn")
         self.cursor = self.conn.cursor(cursor_factory=DictCursor)
-        self.cursor.execute("SET search_path TO aluguel;")
-        self.conn.commit()
+        self._nivel_transacao = 0
+
+    def _emprestar(self, pool: ConnectionPool, chave: str):
+        if self._propria:
+            return pool.getconn()
+        if chave not in g:
+            setattr(g, chave, pool.getconn())
+        return g.get(chave)
+
+    def close(self) -> None:
+        if not self.cursor.closed:
+            self.cursor.close()
+        if self._propria and self.conn is not None:
+            (get_pool_replica() if self.replica else get_pool()).putconn(self.conn)
+            self.conn = None
+
+    @contextmanager
+    def transaction(self):
+        """Agrupa os comandos do bloco em um único COMMIT (ROLLBACK se houver erro).
+
+        Blocos aninhados viram SAVEPOINTs: um erro interno desfaz só o bloco
+        interno, e a transação externa continua podendo ser confirmada.
+        """
+        if self._nivel_transacao:
+            savepoint = f"sp_{self._nivel_transacao}"
+            self.cursor.execute(f"SAVEPOINT {savepoint}")
+            self._nivel_transacao += 1
+            try:
+                yield self
+            except BaseException:
+                self.cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                raise
+            else:
+                self.cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            finally:
+                self._nivel_transacao -= 1
+            return
+
+        self._nivel_transacao = 1
+        try:
+            yield self
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+        finally:
+            self._nivel_transacao = 0
+
+    @property
+    def em_transacao(self) -> bool:
+        return self._nivel_transacao > 0
+
+    def _commit(self) -> None:
+        # fora de transaction() cada comando continua confirmando sozinho
+        if not self.em_transacao:
+            self.conn.commit()
 
     def _exec(self, query: str, params: Optional[tuple] = None):
+        inicio = time.perf_counter()
         try:
             self.cursor.execute(query, params)
             return True
         except Exception as e:
-            print("Erro ao executar:", e)
+            registrar_erro(query, e)
+            if self.em_transacao:
+                # dentro de transaction() o erro sobe e o bloco inteiro é desfeito
+                raise
             self.conn.rollback()
             return False
+        finally:
+            registrar_consulta(query, inicio)
 
     def execute_statement(self, query: str, params: Optional[tuple] = None) -> bool:
         if not self._exec(query, params):
             return False
-        self.conn.commit()
+        self._commit()
         return True
 
+    def execute_many(self, query: str, rows: list, template: Optional[str] = None,
+                     page_size: int = 500, fetch: bool = False):
+        """INSERT/UPDATE em lote: `query` tem um único `VALUES %s` expandido em multi-row"""
+        if not rows:
+            return [] if fetch else True
+        inicio = time.perf_counter()
+        try:
+            result = execute_values(
+                self.cursor, query, rows, template=template, page_size=page_size, fetch=fetch
+            )
+        except Exception as e:
+            registrar_erro(query, e)
+            if self.em_transacao:
+                raise
+            self.conn.rollback()
+            return [] if fetch else False
+        finally:
+            # execute_values manda uma ida ao banco por página de `page_size` linhas
+            registrar_consulta(query, inicio, math.ceil(len(rows) / page_size))
+        self._commit()
+        return [dict(row) for row in result] if fetch else True
+
     def execute_select_all(self, query: str, params: Optional[tuple] = None):
         self._exec(query, params)
         return [dict(row) for row in self.cursor.fetchall()]
 
+    def iter_select(self, query: str, params: Optional[tuple] = None, batch_size: int = 1000):
+        """Gera as linhas do SELECT em memória constante (cursor nomeado no servidor).
+
+        A consulta e o primeiro lote rodam já na chamada: um erro aqui sobe para
+        a rota, que ainda pode responder 500, em vez de cortar a resposta em
+        stream depois do 200. O banco devolve `batch_size` linhas por ida; o
+        gerador deve ser consumido antes do COMMIT/ROLLBACK da transação
+        corrente, que fecha o cursor.
+        """
+        cursor = self.conn.cursor(name=f"iter_{uuid.uuid4().hex}", cursor_factory=DictCursor)
+        inicio = time.perf_counter()
+        try:
+            cursor.execute(query, params)
+            lote = cursor.fetchmany(batch_size)
+        except Exception as e:
+            self._falha_iter(cursor, query, e)
+            raise
+        finally:
+            # mede a abertura do cursor e o primeiro lote; os outros chegam conforme o consumo
+            registrar_consulta(query, inicio)
+        return self._lotes(cursor, lote, query, batch_size)
+
+    def _lotes(self, cursor, lote, query: str, batch_size: int):
+        try:
+            while lote:
+                for row in lote:
+                    yield dict(row)
+                lote = cursor.fetchmany(batch_size)
+        except Exception as e:
+            # cabeçalhos já enviados: registra e deixa o servidor abortar a resposta
+            self._falha_iter(cursor, query, e)
+            raise
+        finally:
+            if not cursor.closed:
+                cursor.close()
+
+    def _falha_iter(self, cursor, query: str, erro: Exception) -> None:
+        registrar_erro(query, erro)
+        if not cursor.closed:
+            cursor.close()
+        if not self.em_transacao:
+            self.conn.rollback()
+
     def execute_select_one(self, query: str, params: Optional[tuple] = None):
         self._exec(query, params)
         row = self.cursor.fetchone()
@@ -46,5 +504,5 @@ class DatabaseManager:
     def execute_insert_returning(self, query: str, params: Optional[tuple] = None):
         self._exec(query, params)
         row = self.cursor.fetchone()
-        self.conn.commit()
+        self._commit()
         return dict(row) if row else None
@@ -0,0 +1,216 @@
+import uuid
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from psycopg import conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from quart import g, has_app_context
+
+from database.conector import CONEXAO, POOL_CONFIG, sql_sessao
+from database.instrumentacao import registrar_erro
+
+# ============================================================
+# Versão assíncrona do DatabaseManager (psycopg 3 + asyncio)
+# ============================================================
+# Mesma API do DatabaseManager, com os métodos em `await`. Usa os mesmos
+# CONEXAO/POOL_CONFIG/SESSAO; o pool é aberto no startup do servidor ASGI (depois
+# do fork de cada worker) e fechado no shutdown.
+
+_pool: Optional[AsyncConnectionPool] = None
+
+
+async def _preparar_conexao(conn) -> None:
+    """Executado uma vez por conexão física, ao ser aberta pelo pool"""
+    await conn.execute(*sql_sessao())
+    await conn.commit()
+
+
+async def abrir_pool() -> AsyncConnectionPool:
+    global _pool
+    if _pool is None:
+        _pool = AsyncConnectionPool(
+            conninfo.make_conninfo(
+                CONEXAO.get("dsn", ""), **{k: v for k, v in CONEXAO.items() if k != "dsn"}
+            ),
+            min_size=POOL_CONFIG["minconn"],
+            max_size=POOL_CONFIG["maxconn"],
+            timeout=POOL_CONFIG["timeout"],
+            kwargs={"row_factory": dict_row},
+            configure=_preparar_conexao,
+            open=False,
+        )
+        await _pool.open()
+    return _pool
+
+
+async def fechar_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool() -> AsyncConnectionPool:
+    if _pool is None:
+        raise RuntimeError("Pool assíncrono não aberto (use init_app ou abrir_pool)")
+    return _pool
+
+
+async def liberar_conexao(exc: Optional[BaseException] = None) -> None:
+    """Devolve ao pool a conexão emprestada pela requisição atual"""
+    conn = g.pop("_db_conn_async", None)
+    if conn is not None:
+        await get_pool().putconn(conn)
+
+
+def init_app(app) -> None:
+    app.before_serving(abrir_pool)
+    app.after_serving(fechar_pool)
+    app.teardown_appcontext(liberar_conexao)
+
+
+def _expandir_values(query: str, rows: list, template: Optional[str]):
+    """Troca o `VALUES %s` por uma lista multi-row (como execute_values do psycopg2)"""
+    if template is None:
+        template = "(" + ", ".join(["%s"] * len(rows[0])) + ")"
+    valores = ", ".join([template] * len(rows))
+    params = [valor for row in rows for valor in row]
+    return query.replace("%s", valores, 1), params
+
+
+class DatabaseManagerAsync:
+    """Classe de Gerenciamento do database (asyncio)"""
+
+    def __init__(self) -> None:
+        # Como no DatabaseManager: dentro de uma requisição a conexão é a da
+        # requisição (devolvida no teardown); fora dela quem cria chama close().
+        self._propria = not has_app_context()
+        self.conn = None
+        self._nivel_transacao = 0
+
+    async def _conexao(self):
+        if self.conn is None:
+            if self._propria:
+                self.conn = await get_pool().getconn()
+            else:
+                if "_db_conn_async" not in g:
+                    g._db_conn_async = await get_pool().getconn()
+                self.conn = g._db_conn_async
+        return self.conn
+
+    async def close(self) -> None:
+        if self._propria and self.conn is not None:
+            await get_pool().putconn(self.conn)
+            self.conn = None
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Agrupa os comandos do bloco em um único COMMIT (ROLLBACK se houver erro).
+
+        Blocos aninhados viram SAVEPOINTs, como em DatabaseManager.transaction().
+        """
+        conn = await self._conexao()
+        if self._nivel_transacao:
+            savepoint = f"sp_{self._nivel_transacao}"
+            await conn.execute(f"SAVEPOINT {savepoint}")
+            self._nivel_transacao += 1
+            try:
+                yield self
+            except BaseException:
+                await conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                raise
+            else:
+                await conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            finally:
+                self._nivel_transacao -= 1
+            return
+
+        self._nivel_transacao = 1
+        try:
+            yield self
+        except BaseException:
+            await conn.rollback()
+            raise
+        else:
+            await conn.commit()
+        finally:
+            self._nivel_transacao = 0
+
+    @property
+    def em_transacao(self) -> bool:
+        return self._nivel_transacao > 0
+
+    async def _commit(self) -> None:
+        if not self.em_transacao:
+            await self.conn.commit()
+
+    async def _exec(self, query: str, params=None):
+        """Cursor já executado, ou None se houve erro fora de transação"""
+        conn = await self._conexao()
+        cur = conn.cursor()
+        try:
+            await cur.execute(query, params)
+            return cur
+        except Exception as e:
+            registrar_erro(query, e)
+            if self.em_transacao:
+                raise
+            await conn.rollback()
+            return None
+
+    async def execute_statement(self, query: str, params=None) -> bool:
+        cur = await self._exec(query, params)
+        if cur is None:
+            return False
+        await self._commit()
+        return True
+
+    async def execute_many(self, query: str, rows: list, template: Optional[str] = None,
+                           page_size: int = 500, fetch: bool = False):
+        """INSERT/UPDATE em lote: `query` tem um único `VALUES %s` expandido em multi-row"""
+        if not rows:
+            return [] if fetch else True
+        resultado = []
+        conn = await self._conexao()
+        try:
+            async with conn.cursor() as cur:
+                for inicio in range(0, len(rows), page_size):
+                    sql, params = _expandir_values(query, rows[inicio:inicio + page_size], template)
+                    await cur.execute(sql, params)
+                    if fetch:
+                        resultado.extend(await cur.fetchall())
+        except Exception as e:
+            registrar_erro(query, e)
+            if self.em_transacao:
+                raise
+            await conn.rollback()
+            return [] if fetch else False
+        await self._commit()
+        return resultado if fetch else True
+
+    async def execute_select_all(self, query: str, params=None):
+        cur = await self._exec(query, params)
+        return await cur.fetchall() if cur is not None else []
+
+    async def iter_select(self, query: str, params=None, batch_size: int = 1000):
+        """Gera as linhas do SELECT em memória constante (cursor nomeado no servidor)"""
+        conn = await self._conexao()
+        async with conn.cursor(name=f"iter_{uuid.uuid4().hex}") as cur:
+            await cur.execute(query, params)
+            while True:
+                linhas = await cur.fetchmany(batch_size)
+                if not linhas:
+                    break
+                for row in linhas:
+                    yield row
+
+    async def execute_select_one(self, query: str, params=None):
+        cur = await self._exec(query, params)
+        return await cur.fetchone() if cur is not None else None
+
+    async def execute_insert_returning(self, query: str, params=None):
+        cur = await self._exec(query, params)
+        row = await cur.fetchone() if cur is not None else None
+        await self._commit()
+        return row
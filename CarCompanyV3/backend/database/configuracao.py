@@ -0,0 +1,76 @@
+import configparser
+import os
+from typing import Mapping, Optional
+
+# ============================================================
+# Configuração do acesso ao banco (ambiente ou arquivo)
+# ============================================================
+# Cada chave vem da variável DB_<CHAVE> ou da seção [banco] de um arquivo
+# INI indicado em DB_CONFIG; o ambiente tem precedência sobre o arquivo.
+#   DB_CONFIG=/etc/carcompany/banco.ini
+#
+#   [banco]
+#   dsn = postgresql://carcompany@pgbouncer:6432/carcompany
+#   pool_max = 20
+#   statement_timeout = 15s
+#
+# Chaves:
+#   dsn                   string libpq ou URL; substitui host/port/dbname/user/password padrão
+#   host, port, dbname, user, password  campos avulsos (valem sobre o dsn)
+#   application_name      nome da sessão em pg_stat_activity; padrão carcompany-api
+#   keepalives_idle, keepalives_interval, keepalives_count  TCP keepalive da conexão
+#   statement_timeout     limite de cada comando (unidades do Postgres: 500ms, 25s); padrão 25s
+#   idle_in_transaction_session_timeout  encerra sessão parada no meio de transação; padrão 60s
+#   pool_min, pool_max, pool_timeout, pool_validar_apos  ver POOL_CONFIG
+#   replica_dsn           réplica de leitura (ver CONEXAO_REPLICA)
+#   replica_atraso_maximo segundos (ver ATRASO_MAXIMO_REPLICA)
+SECAO = "banco"
+
+CHAVES_CONEXAO = (
+    "dsn", "host", "port", "dbname", "user", "password", "application_name",
+    "keepalives_idle", "keepalives_interval", "keepalives_count",
+)
+CHAVES_SESSAO = ("statement_timeout", "idle_in_transaction_session_timeout")
+CHAVES_POOL = {
+    "pool_min": ("minconn", int),
+    "pool_max": ("maxconn", int),
+    "pool_timeout": ("timeout", float),
+    "pool_validar_apos": ("validar_apos", float),
+}
+CHAVES_REPLICA = ("replica_dsn", "replica_atraso_maximo")
+CHAVES = set(CHAVES_CONEXAO) | set(CHAVES_SESSAO) | set(CHAVES_POOL) | set(CHAVES_REPLICA)
+
+
+def ler_configuracao(ambiente: Optional[Mapping[str, str]] = None) -> dict:
+    """Chaves definidas no arquivo de DB_CONFIG e no ambiente (valores em texto)"""
+    ambiente = os.environ if ambiente is None else ambiente
+    valores = {}
+
+    arquivo = ambiente.get("DB_CONFIG")
+    if arquivo:
+        parser = configparser.ConfigParser(interpolation=None)
+        if not parser.read(arquivo, encoding="utf-8"):
+            raise FileNotFoundError(f"DB_CONFIG: arquivo não encontrado: {arquivo}")
+        if parser.has_section(SECAO):
+            valores.update(parser.items(SECAO))
+        desconhecidas = set(valores) - CHAVES
+        if desconhecidas:
+            raise ValueError(f"{arquivo}: chaves desconhecidas em [{SECAO}]: {', '.join(sorted(desconhecidas))}")
+
+    for chave in CHAVES:
+        valor = ambiente.get(f"DB_{chave.upper()}")
+        if valor is not None and valor != "":
+            valores[chave] = valor
+    return valores
+
+
+def opcoes_pool(valores: dict) -> dict:
+    """Chaves pool_* convertidas para os nomes/tipos de POOL_CONFIG"""
+    opcoes = {}
+    for chave, (nome, tipo) in CHAVES_POOL.items():
+        if chave in valores:
+            try:
+                opcoes[nome] = tipo(valores[chave])
+            except ValueError:
+                raise ValueError(f"Valor inválido para {chave}: {valores[chave]!r}") from None
+    return opcoes
@@ -0,0 +1,125 @@
+import json
+import logging
+import re
+import time
+
+from flask import g, has_app_context, has_request_context, request
+
+# ============================================================
+# Instrumentação das consultas (por requisição + log de lentas)
+# ============================================================
+# Cada comando mandado pelo DatabaseManager entra nas estatísticas da
+# requisição atual, devolvidas nos cabeçalhos:
+#   X-DB-Queries: 7
+#   Server-Timing: db;dur=12.4;desc="7 consultas", db-lenta;dur=6.1
+# Comandos acima de LIMITE_CONSULTA_LENTA_MS (e erros) vão para o logger
+# "carcompany.db" como uma linha JSON.
+#
+# Respostas em stream (NDJSON, CSV do /aluguel/exportar) mandam os cabeçalhos
+# antes de o corpo ser gerado, quando as consultas ainda não rodaram: elas
+# saem sem X-DB-Queries/Server-Timing, e o total da requisição (com o comando
+# mais lento) vai para o log, evento "resposta_stream", ao fim do envio.
+LIMITE_CONSULTA_LENTA_MS = 200.0
+TAMANHO_MAXIMO_SQL = 1000
+
+logger = logging.getLogger("carcompany.db")
+
+
+class EstatisticasConsultas:
+    __slots__ = ("consultas", "total_ms", "mais_lenta_ms", "mais_lenta_sql")
+
+    def __init__(self) -> None:
+        self.consultas = 0
+        self.total_ms = 0.0
+        self.mais_lenta_ms = 0.0
+        self.mais_lenta_sql = None
+
+    def registrar(self, sql: str, ms: float, comandos: int) -> None:
+        self.consultas += comandos
+        self.total_ms += ms
+        if ms > self.mais_lenta_ms:
+            self.mais_lenta_ms = ms
+            self.mais_lenta_sql = sql
+
+
+def _sql_compacto(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()[:TAMANHO_MAXIMO_SQL]
+
+
+def _registro(evento: str, sql: str, **campos) -> str:
+    registro = {"evento": evento, **campos}
+    if has_request_context():
+        registro["rota"] = f"{request.method} {request.path}"
+    # só o texto do comando: parâmetros podem ter CPF, telefone etc.
+    registro["sql"] = _sql_compacto(sql)
+    return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+def estatisticas_da_requisicao() -> EstatisticasConsultas:
+    if "_db_stats" not in g:
+        g._db_stats = EstatisticasConsultas()
+    return g._db_stats
+
+
+def consultas_da_requisicao() -> int:
+    """Quantos comandos a requisição atual já mandou ao banco"""
+    return estatisticas_da_requisicao().consultas if has_app_context() else 0
+
+
+def registrar_consulta(sql: str, inicio: float, comandos: int = 1) -> None:
+    """Contabiliza um comando iniciado em `inicio` (time.perf_counter())"""
+    ms = (time.perf_counter() - inicio) * 1000
+    if has_app_context():
+        estatisticas_da_requisicao().registrar(sql, ms, comandos)
+    if ms >= LIMITE_CONSULTA_LENTA_MS:
+        logger.warning(_registro("consulta_lenta", sql, ms=round(ms, 1), comandos=comandos))
+
+
+def registrar_erro(sql: str, erro: Exception) -> None:
+    logger.error(_registro("erro_consulta", sql, erro=str(erro).strip(), tipo=type(erro).__name__))
+
+
+def registrar_evento(evento: str, **campos) -> None:
+    """Eventos do acesso ao banco que não são de um comando (ex.: réplica atrasada)"""
+    registro = {"evento": evento, **campos}
+    if has_request_context():
+        registro["rota"] = f"{request.method} {request.path}"
+    logger.warning(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def _registrar_stream(stats: EstatisticasConsultas, rota: str, inicio: float) -> None:
+    registro = {
+        "evento": "resposta_stream",
+        "rota": rota,
+        "envio_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "consultas": stats.consultas,
+        "db_ms": round(stats.total_ms, 1),
+        "mais_lenta_ms": round(stats.mais_lenta_ms, 1),
+        "sql": _sql_compacto(stats.mais_lenta_sql) if stats.mais_lenta_sql else None,
+    }
+    logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def _cabecalhos(resposta):
+    if resposta.is_streamed:
+        # o gerador do corpo usa o mesmo g: as consultas dele caem neste objeto
+        stats = estatisticas_da_requisicao()
+        rota = f"{request.method} {request.path}"
+        inicio = time.perf_counter()
+        resposta.call_on_close(lambda: _registrar_stream(stats, rota, inicio))
+        return resposta
+    stats = g.get("_db_stats")
+    if stats is None:
+        resposta.headers["X-DB-Queries"] = "0"
+        return resposta
+    resposta.headers["X-DB-Queries"] = str(stats.consultas)
+    metricas = f'db;dur={stats.total_ms:.1f};desc="{stats.consultas} consultas"'
+    metricas += f", db-lenta;dur={stats.mais_lenta_ms:.1f}"
+    if "Server-Timing" in resposta.headers:
+        metricas = resposta.headers["Server-Timing"] + ", " + metricas
+    resposta.headers["Server-Timing"] = metricas
+    return resposta
+
+
+def init_app(app) -> None:
+    app.after_request(_cabecalhos)
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera do pool"""
+
+
+class ConnectionPool:
+    """Pool de conexões thread-safe com limite de tamanho, espera e validação"""
+
+    def __init__(
+        self,
+        minconn: int,
+        maxconn: int,
+        timeout: float = 5.0,
+        validar_apos: float = 30.0,
+        ao_conectar: Optional[Callable] = None,
+        **connect_kwargs,
+    ) -> None:
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamanhos de pool inválidos")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        # conexões ociosas há mais tempo que isso são testadas antes do empréstimo
+        self.validar_apos = validar_apos
+        self._ao_conectar = ao_conectar
+        self._connect_kwargs = connect_kwargs
+
+        self._livres = deque()  # (conexao, instante em que voltou ao pool)
+        self._abertas = 0
+        self._fechado = False
+        self._cond = threading.Condition()
+
+        for _ in range(minconn):
+            self._livres.append((self._nova_conexao(), time.monotonic()))
+            self._abertas += 1
+
+    def _nova_conexao(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        if self._ao_conectar:
+            # configuração feita uma única vez por conexão física
+            self._ao_conectar(conn)
+        return conn
+
+    def _conexao_valida(self, conn, ociosa_desde: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - ociosa_desde < self.validar_apos:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def getconn(self):
+        """Empresta uma conexão, esperando até `timeout` segundos por uma livre"""
+        limite = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._fechado:
+                        raise PoolEsgotado("Pool de conexões fechado")
+                    if self._livres:
+                        conn, ociosa_desde = self._livres.pop()
+                        break
+                    if self._abertas < self.maxconn:
+                        self._abertas += 1
+                        break
+
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise PoolEsgotado(
+                            f"Nenhuma conexão livre após {self.timeout}s (máximo {self.maxconn})"
+                        )
+                    self._cond.wait(restante)
+
+            if conn is None:
+                # conecta fora do lock para não travar as outras threads no handshake
+                try:
+                    return self._nova_conexao()
+                except Exception:
+                    with self._cond:
+                        self._abertas -= 1
+                        self._cond.notify()
+                    raise
+
+            # valida fora do lock: um socket lento ou morto não trava quem
+            # está pegando ou devolvendo outras conexões
+            if self._conexao_valida(conn, ociosa_desde):
+                return conn
+            self._descartar(conn)
+            with self._cond:
+                self._abertas -= 1
+                self._cond.notify()
+
+    def putconn(self, conn, descartar: bool = False) -> None:
+        """Devolve a conexão ao pool, desfazendo qualquer transação pendente"""
+        if not descartar and not conn.closed:
+            try:
+                status = conn.get_transaction_status()
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    descartar = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                descartar = True
+
+        with self._cond:
+            if descartar or conn.closed or self._fechado:
+                self._descartar(conn)
+                self._abertas -= 1
+            else:
+                self._livres.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self) -> None:
+        with self._cond:
+            self._fechado = True
+            while self._livres:
+                conn, _ = self._livres.pop()
+                self._descartar(conn)
+                self._abertas -= 1
+            self._cond.notify_all()
@@ -4,6 +4,8 @@ import re
 from datetime import datetime, date
 from psycopg2 import IntegrityError
 
+from paginacao import ler_paginacao, proxima_chave, quer_ndjson, resposta_ndjson
+
 funcionarios_blueprint = Blueprint("funcionarios", __name__)
 
 # ----------------------
@@ -47,9 +49,28 @@ def validar_data(data_str):
 # ----------------------
 @funcionarios_blueprint.route("/funcionarios", methods=["GET"])
 def listar_funcionarios():
+    try:
+        after, limit = ler_paginacao(int, str, int)
+    except ValueError as e:
+        return bad_request(str(e))
+
     db = DatabaseManager()
     try:
-        query = """
+        params = []
+        filtro = ""
+        if after:
+            # continua depois da última linha da página anterior (ordem qnt_vendas DESC, nome, num_funcionario);
+            # o "qnt_vendas <= %s" é o limite que idx_funcionario_vendas_nome usa para começar o scan ali
+            filtro = """
+            WHERE qnt_vendas <= %s
+              AND (qnt_vendas < %s OR (nome, num_funcionario) > (%s, %s))"""
+            params.extend([after[0], after[0], after[1], after[2]])
+        limite = ""
+        if limit:
+            limite = "LIMIT %s"
+            params.append(limit)
+
+        query = f"""
             SELECT 
                 num_funcionario, 
                 cpf, 
@@ -65,9 +86,16 @@ def listar_funcionarios():
                     ELSE 'NOVATO'
                 END as experiencia
             FROM Funcionario
-            ORDER BY qnt_vendas DESC, nome;
+            {filtro}
+            ORDER BY qnt_vendas DESC, nome, num_funcionario
+            {limite};
         """
-        dados = db.execute_select_all(query)
+        if quer_ndjson():
+            return resposta_ndjson(db.iter_select(query, params))
+
+        dados = db.execute_select_all(query, params)
+        if limit:
+            return jsonify({"funcionarios": dados, "proximo": proxima_chave(dados, limit, "qnt_vendas", "nome", "num_funcionario")}), 200
         return jsonify({"funcionarios": dados}), 200
     except Exception as e:
         return internal_error(str(e))
@@ -112,42 +140,24 @@ def criar_funcionario():
             VALUES (%s, %s, %s, %s, %s, %s)
             RETURNING num_funcionario;
         """
-        res = db.execute_insert_returning(query, (
-            cpf_formatado,
-            data["nome"].strip(),
-            data_inicio,
-            data.get("endereco", "").strip(),
-            data.get("telefone", "").strip(),
-            data.get("qnt_vendas", 0)
-        ))
-        
-        if not res:
-            return internal_error("Falha ao criar funcionário")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            res = db.execute_insert_returning(query, (
+                cpf_formatado,
+                data["nome"].strip(),
+                data_inicio,
+                data.get("endereco", "").strip(),
+                data.get("telefone", "").strip(),
+                data.get("qnt_vendas", 0)
+            ))
 
         return jsonify({
             "mensagem": "Funcionário cadastrado com sucesso!", 
             "num_funcionario": res["num_funcionario"]
         }), 201
 
-    except IntegrityError as ie:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
+    except IntegrityError:
         return bad_request("Erro de integridade: possível CPF duplicado ou dado inválido.")
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ----------------------
@@ -167,12 +177,13 @@ def obter_funcionario(num_funcionario):
                 telefone, 
                 qnt_vendas,
                 (CURRENT_DATE - data_inicio) as dias_empresa,
-                (SELECT COUNT(*) FROM Aluguel WHERE num_funcionario = %s) as total_alugueis,
-                (SELECT COALESCE(SUM(valor_previsto), 0) FROM Aluguel WHERE num_funcionario = %s) as valor_total_vendas
+                COALESCE(r.total_alugueis, 0) as total_alugueis,
+                COALESCE(r.valor_total_vendas, 0) as valor_total_vendas
             FROM Funcionario
+            LEFT JOIN FuncionarioResumo r USING (num_funcionario)
             WHERE num_funcionario = %s;
         """
-        funcionario = db.execute_select_one(query, (num_funcionario, num_funcionario, num_funcionario))
+        funcionario = db.execute_select_one(query, (num_funcionario,))
         if not funcionario:
             return jsonify({"erro": "Funcionário não encontrado"}), 404
         return jsonify(funcionario), 200
@@ -224,43 +235,25 @@ def atualizar_funcionario(num_funcionario):
                 qnt_vendas = COALESCE(%s, qnt_vendas)
             WHERE num_funcionario = %s;
         """
-        success = db.execute_statement(
-            query,
-            (
-                data.get("cpf"),
-                data.get("nome"),
-                data.get("data_inicio"),
-                data.get("endereco"),
-                data.get("telefone"),
-                data.get("qnt_vendas"),
-                num_funcionario,
-            ),
-        )
-
-        if not success:
-            return internal_error("Falha ao atualizar funcionário")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(
+                query,
+                (
+                    data.get("cpf"),
+                    data.get("nome"),
+                    data.get("data_inicio"),
+                    data.get("endereco"),
+                    data.get("telefone"),
+                    data.get("qnt_vendas"),
+                    num_funcionario,
+                ),
+            )
 
         return jsonify({"mensagem": "Funcionário atualizado com sucesso!"}), 200
 
     except IntegrityError:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return bad_request("Erro de integridade ao atualizar (ex: CPF duplicado).")
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ----------------------
@@ -280,7 +273,7 @@ def deletar_funcionario(num_funcionario):
 
         # Verificar se funcionário tem aluguéis associados
         alugueis_associados = db.execute_select_one(
-            "SELECT COUNT(*) as total FROM Aluguel WHERE num_funcionario = %s",
+            "SELECT total_alugueis as total FROM FuncionarioResumo WHERE num_funcionario = %s",
             (num_funcionario,)
         )
 
@@ -291,32 +284,14 @@ def deletar_funcionario(num_funcionario):
             }), 400
 
         query = "DELETE FROM Funcionario WHERE num_funcionario = %s;"
-        success = db.execute_statement(query, (num_funcionario,))
-        
-        if not success:
-            return internal_error("Falha ao remover funcionário")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(query, (num_funcionario,))
 
         return jsonify({"mensagem": "Funcionário removido com sucesso!"}), 200
 
     except IntegrityError:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return bad_request("Não foi possível remover: existe referência a este funcionário (FK).")
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ----------------------
@@ -324,24 +299,26 @@ def deletar_funcionario(num_funcionario):
 # ----------------------
 @funcionarios_blueprint.route("/funcionarios/ranking", methods=["GET"])
 def ranking_vendas():
-    db = DatabaseManager()
+    db = DatabaseManager(leitura=True)
     try:
+        # totais por funcionário mantidos por trigger em FuncionarioResumo
         query = """
             SELECT 
-                num_funcionario, 
-                cpf, 
-                nome, 
-                qnt_vendas,
-                (SELECT COUNT(*) FROM Aluguel WHERE num_funcionario = Funcionario.num_funcionario) as total_alugueis,
-                (SELECT COALESCE(SUM(valor_previsto), 0) FROM Aluguel WHERE num_funcionario = Funcionario.num_funcionario) as valor_total_vendas,
-                (CURRENT_DATE - data_inicio) as dias_empresa,
+                f.num_funcionario, 
+                f.cpf, 
+                f.nome, 
+                f.qnt_vendas,
+                COALESCE(r.total_alugueis, 0) as total_alugueis,
+                COALESCE(r.valor_total_vendas, 0) as valor_total_vendas,
+                (CURRENT_DATE - f.data_inicio) as dias_empresa,
                 CASE 
-                    WHEN qnt_vendas > 0 THEN 
-                        ROUND((qnt_vendas::decimal / (SELECT COUNT(*) FROM Aluguel WHERE num_funcionario = Funcionario.num_funcionario)) * 100, 2)
+                    WHEN f.qnt_vendas > 0 THEN 
+                        ROUND((f.qnt_vendas::decimal / NULLIF(r.total_alugueis, 0)) * 100, 2)
                     ELSE 0
                 END as taxa_conversao
-            FROM Funcionario
-            ORDER BY qnt_vendas DESC, valor_total_vendas DESC;
+            FROM Funcionario f
+            LEFT JOIN FuncionarioResumo r ON r.num_funcionario = f.num_funcionario
+            ORDER BY f.qnt_vendas DESC, valor_total_vendas DESC;
         """
         dados = db.execute_select_all(query)
         return jsonify({"ranking": dados}), 200
@@ -353,7 +330,7 @@ def ranking_vendas():
 # ----------------------
 @funcionarios_blueprint.route("/funcionarios/estatisticas", methods=["GET"])
 def estatisticas_funcionarios():
-    db = DatabaseManager()
+    db = DatabaseManager(leitura=True)
     try:
         query = """
             SELECT 
@@ -368,15 +345,17 @@ def estatisticas_funcionarios():
         """
         estatisticas = db.execute_select_one(query)
         
-        # Vendas por mês (últimos 6 meses)
+        # Vendas por mês (últimos 6 meses), do resumo mensal mantido por trigger;
+        # o mês mais antigo entra inteiro (o resumo não guarda o dia)
         query_vendas_mensais = """
             SELECT 
-                TO_CHAR(data_retirada, 'YYYY-MM') as mes,
-                COUNT(*) as total_alugueis,
-                SUM(valor_previsto) as valor_total
-            FROM Aluguel 
-            WHERE data_retirada >= CURRENT_DATE - INTERVAL '6 months'
-            GROUP BY TO_CHAR(data_retirada, 'YYYY-MM')
+                TO_CHAR(mes, 'YYYY-MM') as mes,
+                SUM(total_alugueis) as total_alugueis,
+                SUM(valor_total) as valor_total
+            FROM VendasMensais 
+            WHERE mes >= date_trunc('month', CURRENT_DATE - INTERVAL '6 months')::date
+            GROUP BY mes
+            HAVING SUM(total_alugueis) > 0
             ORDER BY mes DESC;
         """
         vendas_mensais = db.execute_select_all(query_vendas_mensais)
@@ -444,24 +423,12 @@ def atualizar_vendas_funcionario(num_funcionario):
             return jsonify({"erro": "Funcionário não encontrado"}), 404
 
         query = "UPDATE Funcionario SET qnt_vendas = %s WHERE num_funcionario = %s;"
-        success = db.execute_statement(query, (qnt_vendas, num_funcionario))
-
-        if not success:
-            return internal_error("Falha ao atualizar vendas")
-
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+        with db.transaction():
+            db.execute_statement(query, (qnt_vendas, num_funcionario))
 
         return jsonify({"mensagem": "Vendas atualizadas com sucesso!"}), 200
 
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ----------------------
@@ -471,38 +438,86 @@ def atualizar_vendas_funcionario(num_funcionario):
 def incrementar_vendas_funcionario(num_funcionario):
     db = DatabaseManager()
     try:
-        # Verificar se funcionário existe
-        funcionario_existente = db.execute_select_one(
-            "SELECT num_funcionario, qnt_vendas FROM Funcionario WHERE num_funcionario = %s", 
-            (num_funcionario,)
-        )
-        if not funcionario_existente:
+        # um único comando: o total devolvido é o gravado, mesmo com vendas simultâneas
+        query = """
+            UPDATE Funcionario SET qnt_vendas = qnt_vendas + 1
+            WHERE num_funcionario = %s
+            RETURNING qnt_vendas;
+        """
+        with db.transaction():
+            res = db.execute_insert_returning(query, (num_funcionario,))
+        if not res:
             return jsonify({"erro": "Funcionário não encontrado"}), 404
 
-        query = "UPDATE Funcionario SET qnt_vendas = qnt_vendas + 1 WHERE num_funcionario = %s;"
-        success = db.execute_statement(query, (num_funcionario,))
+        return jsonify({
+            "mensagem": "Vendas incrementadas com sucesso!",
+            "novo_total": res["qnt_vendas"]
+        }), 200
 
-        if not success:
-            return internal_error("Falha ao incrementar vendas")
+    except Exception as e:
+        return internal_error(str(e))
 
-        # Commit da transação
-        if hasattr(db, "conn") and db.conn:
-            db.conn.commit()
+# ----------------------
+# 10b — Incrementar vendas de vários funcionários (fechamento do turno)
+# ----------------------
+# Body: {"vendas": [{"num_funcionario": 3, "quantidade": 5}, ...]}
+# Os funcionários são travados em ordem de chave antes do UPDATE, para que
+# dois lotes simultâneos com os mesmos funcionários não entrem em deadlock.
+QUERY_INCREMENTAR_LOTE = """
+    WITH v (num_funcionario, quantidade) AS (VALUES %s),
+    travados AS (
+        SELECT f.num_funcionario
+        FROM Funcionario f
+        JOIN v ON v.num_funcionario = f.num_funcionario
+        ORDER BY f.num_funcionario
+        FOR UPDATE OF f
+    )
+    UPDATE Funcionario f
+    SET qnt_vendas = f.qnt_vendas + v.quantidade
+    FROM v
+    JOIN travados t ON t.num_funcionario = v.num_funcionario
+    WHERE f.num_funcionario = v.num_funcionario
+    RETURNING f.num_funcionario, f.qnt_vendas;
+"""
+
+@funcionarios_blueprint.route("/funcionarios/incrementar-vendas", methods=["POST"])
+def incrementar_vendas_lote():
+    data = request.json or {}
+    vendas = data.get("vendas")
+    if not isinstance(vendas, list) or not vendas:
+        return bad_request("Campo 'vendas' deve ser uma lista não vazia")
 
-        novas_vendas = funcionario_existente["qnt_vendas"] + 1
+    # soma repetições do mesmo funcionário: o UPDATE aplica uma linha de VALUES por funcionário
+    totais = {}
+    try:
+        for item in vendas:
+            num = int(item["num_funcionario"])
+            quantidade = int(item.get("quantidade", 1))
+            if quantidade < 1:
+                return bad_request("Quantidade de vendas deve ser positiva")
+            totais[num] = totais.get(num, 0) + quantidade
+    except (KeyError, ValueError, TypeError, AttributeError):
+        return bad_request("Cada item precisa de 'num_funcionario' e 'quantidade' inteiros")
 
+    db = DatabaseManager()
+    try:
+        with db.transaction():
+            atualizados = db.execute_many(
+                QUERY_INCREMENTAR_LOTE,
+                sorted(totais.items()),
+                template="(%s::int, %s::int)",
+                page_size=len(totais),
+                fetch=True,
+            )
+
+        encontrados = {linha["num_funcionario"] for linha in atualizados}
         return jsonify({
             "mensagem": "Vendas incrementadas com sucesso!",
-            "novo_total": novas_vendas
+            "atualizados": sorted(atualizados, key=lambda linha: linha["num_funcionario"]),
+            "nao_encontrados": [num for num in sorted(totais) if num not in encontrados]
         }), 200
 
     except Exception as e:
-        # Rollback em caso de erro
-        try:
-            if hasattr(db, "conn") and db.conn:
-                db.conn.rollback()
-        except:
-            pass
         return internal_error(str(e))
 
 # ----------------------
@@ -573,17 +588,17 @@ def historico_alugueis_funcionario(num_funcionario):
 def top_funcionarios_mes():
     db = DatabaseManager()
     try:
+        # mês corrente: uma faixa da chave primária de VendasMensais
         query = """
             SELECT 
                 f.num_funcionario,
                 f.nome,
-                COUNT(a.num_locacao) as alugueis_mes,
-                SUM(a.valor_previsto) as valor_mes
-            FROM Funcionario f
-            JOIN Aluguel a ON a.num_funcionario = f.num_funcionario
-            WHERE EXTRACT(MONTH FROM a.data_retirada) = EXTRACT(MONTH FROM CURRENT_DATE)
-            AND EXTRACT(YEAR FROM a.data_retirada) = EXTRACT(YEAR FROM CURRENT_DATE)
-            GROUP BY f.num_funcionario, f.nome
+                v.total_alugueis as alugueis_mes,
+                v.valor_total as valor_mes
+            FROM VendasMensais v
+            JOIN Funcionario f ON f.num_funcionario = v.num_funcionario
+            WHERE v.mes = date_trunc('month', CURRENT_DATE)::date
+            AND v.total_alugueis > 0
             ORDER BY valor_mes DESC
             LIMIT 5;
         """
@@ -0,0 +1,74 @@
+# ============================================================
+# Configuração do servidor de produção (gunicorn)
+# ============================================================
+# Uso (a partir de backend/):
+#   gunicorn wsgi:app
+#   WEB_MODO=async gunicorn asgi:app
+#
+# Tudo pode ser ajustado por variável de ambiente:
+#   WEB_MODO        prefork (um processo por requisição), threaded (threads por processo)
+#                   ou async (uvicorn; rotas do balcão em asyncio, ver asgi.py)
+#   WEB_WORKERS     processos; padrão 2 x CPUs + 1
+#   WEB_THREADS     threads por processo no modo threaded; padrão 4
+#                   (no modo async: threads para as rotas Flask; padrão 10)
+#   WEB_BIND        endereço; padrão 0.0.0.0:8000
+#   WEB_TIMEOUT     segundos até um worker travado ser reiniciado; padrão 30
+#   WEB_GRACEFUL_TIMEOUT  segundos para terminar requisições no restart; padrão 30
+#   WEB_KEEPALIVE   segundos que uma conexão ociosa fica aberta; padrão 5
+#                   (modos threaded e async; workers sync fecham a cada resposta)
+#   WEB_MAX_REQUESTS  reinicia o worker após N requisições (0 = nunca); padrão 0
+#
+# Conexão com o banco, tamanho do pool e timeouts de sessão: variáveis DB_*
+# ou arquivo em DB_CONFIG (ver database/configuracao.py)
+import multiprocessing
+import os
+
+from database.conector import POOL_CONFIG, close_pool, configurar_pool, get_pool
+
+
+def _int(nome, padrao):
+    return int(os.environ.get(nome, padrao))
+
+
+modo = os.environ.get("WEB_MODO", "prefork")
+if modo not in ("prefork", "threaded", "async"):
+    raise ValueError(f"WEB_MODO inválido: {modo} (use prefork, threaded ou async)")
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:8000")
+workers = _int("WEB_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+if modo == "threaded":
+    worker_class = "gthread"
+    threads = _int("WEB_THREADS", 4)
+elif modo == "async":
+    worker_class = "uvicorn.workers.UvicornWorker"
+    threads = _int("WEB_THREADS", 10)
+else:
+    worker_class = "sync"
+    threads = 1
+
+timeout = _int("WEB_TIMEOUT", 30)
+graceful_timeout = _int("WEB_GRACEFUL_TIMEOUT", 30)
+keepalive = _int("WEB_KEEPALIVE", 5)
+max_requests = _int("WEB_MAX_REQUESTS", 0)
+max_requests_jitter = max_requests // 10
+
+# o app é importado no master e herdado pelos workers; nenhuma conexão é
+# aberta nesse momento (o pool é criado sob demanda)
+preload_app = True
+accesslog = "-"
+
+
+def post_fork(server, worker):
+    # cada thread pode segurar uma conexão durante a requisição
+    if POOL_CONFIG["maxconn"] < threads:
+        configurar_pool(maxconn=threads)
+    # abre o pool já no worker, antes da primeira requisição; se o banco
+    # estiver fora, o worker sobe assim mesmo e tenta de novo sob demanda
+    try:
+        get_pool()
+    except Exception as e:
+        server.log.warning(f"Pool não aberto no worker {worker.pid}: {e}")
+
+
+def worker_exit(server, worker):
+    close_pool()
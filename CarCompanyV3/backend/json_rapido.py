@@ -0,0 +1,54 @@
+from datetime import date
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # sem orjson: mesmo formato, pelo json da biblioteca padrão
+    orjson = None
+
+# ============================================================
+# Serialização JSON rápida (orjson), mesmo formato do jsonify
+# ============================================================
+# Decimal continua saindo como string e datas no formato HTTP (como no
+# provedor padrão do Flask), para não mudar o contrato com o frontend.
+# Chaves ordenadas, como sort_keys=True do provedor padrão.
+
+
+def _padrao(obj):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, date):
+        return http_date(obj)
+    if hasattr(obj, "__html__"):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ProvedorJSONRapido(DefaultJSONProvider):
+    """Provedor JSON do Flask que usa orjson quando disponível"""
+
+    if orjson is not None:
+        OPCOES = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+        def _bytes(self, obj, indentar=False):
+            opcoes = self.OPCOES | (orjson.OPT_INDENT_2 if indentar else 0)
+            return orjson.dumps(obj, default=_padrao, option=opcoes)
+
+        def dumps(self, obj, **kwargs):
+            return self._bytes(obj, indentar="indent" in kwargs).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            # monta o corpo direto em bytes (sem passar por str)
+            obj = self._prepare_response_obj(args, kwargs)
+            indentar = (self.compact is None and self._app.debug) or self.compact is False
+            return self._app.response_class(self._bytes(obj, indentar) + b"\n", mimetype=self.mimetype)
+
+
+def init_app(app) -> None:
+    app.json = ProvedorJSONRapido(app)
@@ -0,0 +1,81 @@
+import base64
+import json
+
+from flask import Response, current_app, request, stream_with_context
+
+from database.conector import reter_conexoes_no_stream
+
+# ============================================================
+# Paginação por chave (?after=<cursor>&limit=N)
+# ============================================================
+# O cursor (`proximo` da página anterior) leva a chave de ordenação inteira
+# da última linha, não só o id: a página seguinte continua certa mesmo que
+# essa linha tenha sido apagada ou mudado de posição (ex. qnt_vendas).
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+
+def _decodificar_cursor(cursor, tipos):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        valores = None
+    if (
+        not isinstance(valores, list)
+        or len(valores) != len(tipos)
+        or not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(valores, tipos))
+    ):
+        raise ValueError("Parâmetro 'after' inválido")
+    return valores
+
+
+def ler_paginacao(*tipos):
+    """Retorna (after, limit) da query string; ValueError se algum for inválido.
+
+    `tipos` são os tipos da chave de ordenação da listagem; `after` volta
+    como a lista com esses valores. Sem `after` nem `limit` devolve
+    (None, None): a listagem completa continua disponível para quem ainda
+    não pagina.
+    """
+    after = request.args.get("after") or None
+    if after:
+        after = _decodificar_cursor(after, tipos)
+    limit = request.args.get("limit")
+    if limit is None:
+        return after, (LIMITE_PADRAO if after else None)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError("Parâmetro 'limit' inválido") from None
+    if limit < 1:
+        raise ValueError("Parâmetro 'limit' inválido")
+    return after, min(limit, LIMITE_MAXIMO)
+
+
+def proxima_chave(linhas, limit, *campos):
+    """Cursor para o próximo `after` (chave `campos` da última linha), ou None na última página"""
+    if not limit or len(linhas) < limit:
+        return None
+    chave = json.dumps([linhas[-1][campo] for campo in campos], separators=(",", ":"))
+    return base64.urlsafe_b64encode(chave.encode()).decode().rstrip("=")
+
+# ============================================================
+# Streaming NDJSON (?formato=ndjson)
+# ============================================================
+
+def quer_ndjson():
+    return (
+        request.args.get("formato") == "ndjson"
+        or "application/x-ndjson" in request.headers.get("Accept", "")
+    )
+
+
+def resposta_ndjson(linhas):
+    """Uma linha JSON por registro, enviada conforme chega do banco"""
+    dumps = current_app.json.dumps
+
+    def gerar():
+        for linha in linhas:
+            yield dumps(linha) + "\n"
+
+    return reter_conexoes_no_stream(Response(stream_with_context(gerar()), mimetype="application/x-ndjson"))
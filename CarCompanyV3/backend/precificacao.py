@@ -0,0 +1,293 @@
+from datetime import date, datetime
+
+from referencia import total_acessorios, total_categorias
+
+# =========================================================
+# Contexto da devolução (uma única ida ao banco)
+# =========================================================
+
+QUERY_CONTEXTO_DEVOLUCAO = """
+    WITH alvo AS (
+        SELECT a.*, c.tipo_categoria, cat.preco_diaria
+        FROM Aluguel a
+        JOIN Carro c ON a.placa = c.placa
+        JOIN Categoria cat ON c.tipo_categoria = cat.tipo
+        WHERE a.num_locacao = %s
+        AND NOT EXISTS (
+            SELECT 1 FROM Devolucao d WHERE d.num_locacao = a.num_locacao
+        )
+    ),
+    ultimas AS (
+        SELECT h.num_locacao
+        FROM Aluguel h
+        JOIN alvo ON h.cpf_cliente = alvo.cpf_cliente
+        WHERE h.num_locacao != %s
+        ORDER BY h.data_retirada DESC
+        LIMIT 5
+    )
+    SELECT
+        alvo.*,
+        -- totais do cliente mantidos por trigger em ClienteResumo (cliente
+        -- sem linha no resumo ainda é precificado, com os totais zerados)
+        COALESCE(r.total_alugueis, 0) AS total_alugueis_cliente,
+        COALESCE(r.categorias_utilizadas, 0) AS categorias_utilizadas,
+        COALESCE(r.acessorios_utilizados, 0) AS acessorios_utilizados,
+        (SELECT COUNT(*) FROM ultimas) AS ultimas_locacoes,
+        EXISTS (
+            SELECT 1 FROM ultimas u
+            JOIN Devolucao d ON d.num_locacao = u.num_locacao
+            JOIN Multa m ON m.num_pagamento = d.num_pagamento
+        ) AS ultimas_com_multa
+    FROM alvo
+    LEFT JOIN ClienteResumo r ON r.cpf = alvo.cpf_cliente;
+"""
+
+
+def carregar_contexto_devolucao(db, num_locacao):
+    """Aluguel em aberto + histórico do cliente necessário para multas e descontos"""
+    contexto = db.execute_select_one(QUERY_CONTEXTO_DEVOLUCAO, (num_locacao, num_locacao))
+    if not contexto:
+        return None
+    return completar_contexto(contexto)
+
+
+def completar_contexto(contexto):
+    """Acrescenta ao resultado de QUERY_CONTEXTO_DEVOLUCAO o que não vem da consulta"""
+    # totais de referência vêm do cache (Categoria/Acessorio quase nunca mudam)
+    contexto["total_categorias"] = total_categorias()
+    contexto["total_acessorios"] = total_acessorios()
+    # colunas TIMESTAMP são comparadas com a data de devolução (date)
+    contexto["data_retirada"] = _como_data(contexto["data_retirada"])
+    contexto["data_prevista_devolucao"] = _como_data(contexto["data_prevista_devolucao"])
+    return contexto
+
+
+def _como_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
+
+# =========================================================
+# Funções de Cálculo de Multas
+# =========================================================
+
+def calcular_multa_atraso(contexto, data_devolucao):
+    """Calcula multa por atraso na devolução"""
+    try:
+        data_prevista = contexto['data_prevista_devolucao']
+        preco_diaria = float(contexto['preco_diaria'])
+
+        if data_devolucao <= data_prevista:
+            return 0, 0
+
+        dias_atraso = (data_devolucao - data_prevista).days
+        valor_multa = dias_atraso * preco_diaria * 0.5  # 50% da diária por dia
+
+        return valor_multa, dias_atraso
+
+    except Exception as e:
+        print(f"Erro ao calcular multa por atraso: {e}")
+        return 0, 0
+
+def calcular_multa_tanque(combustivel_completo):
+    """Calcula multa por tanque não cheio"""
+    if not combustivel_completo:
+        return 100.00  # Valor fixo de R$ 100,00
+    return 0.00
+
+def calcular_multa_danos(valor_danos):
+    """Calcula multa por danos no veículo"""
+    try:
+        return float(valor_danos or 0)
+    except (ValueError, TypeError):
+        return 0.00
+
+def calcular_multa_km(contexto, km_registro):
+    """Calcula multa por excesso de quilometragem
+
+    km_registro: km rodados na locação; Aluguel.km_previsto: franquia
+    contratada na reserva (NULL ou 0 = quilometragem livre).
+    """
+    try:
+        if not contexto.get('km_previsto'):
+            return 0, 0
+
+        km_previsto = contexto['km_previsto']
+        km_excedente = max(km_registro - km_previsto, 0)
+        valor_por_km = 0.50  # R$ 0,50 por km excedente
+        valor_multa = km_excedente * valor_por_km
+
+        return valor_multa, km_excedente
+
+    except Exception as e:
+        print(f"Erro ao calcular multa por km: {e}")
+        return 0, 0
+
+def calcular_multa_atraso_progressivo(contexto, data_devolucao):
+    """Calcula multa progressiva por atraso"""
+    try:
+        data_prevista = contexto['data_prevista_devolucao']
+        preco_diaria = float(contexto['preco_diaria'])
+
+        if data_devolucao <= data_prevista:
+            return 0, 0
+
+        dias_atraso = (data_devolucao - data_prevista).days
+
+        # Faixas progressivas
+        if dias_atraso <= 3:
+            multiplicador = 0.5  # 50% da diária
+        elif dias_atraso <= 7:
+            multiplicador = 1.0  # 100% da diária
+        else:
+            multiplicador = 1.5  # 150% da diária
+
+        valor_multa = dias_atraso * preco_diaria * multiplicador
+        return valor_multa, dias_atraso
+
+    except Exception as e:
+        print(f"Erro ao calcular multa progressiva: {e}")
+        return 0, 0
+
+# =========================================================
+# Funções de Cálculo de Descontos
+# =========================================================
+
+def calcular_desconto_cliente_fiel(contexto):
+    """Desconto para clientes com 5 ou mais locações"""
+    if contexto['total_alugueis_cliente'] >= 5:
+        return 50.00  # R$ 50,00 fixo
+    return 0.00
+
+def calcular_desconto_reserva_antecipada(contexto):
+    """Desconto por reserva antecipada (mais de 7 dias)"""
+    try:
+        # Se a data de retirada for mais de 7 dias após a data atual de criação
+        # (Aqui estamos usando a data atual como proxy para data da reserva)
+        dias_antecedencia = (contexto['data_retirada'] - date.today()).days
+
+        if dias_antecedencia >= 7:
+            return 30.00  # R$ 30,00 fixo
+        return 0.00
+
+    except Exception as e:
+        print(f"Erro ao calcular desconto reserva antecipada: {e}")
+        return 0.00
+
+def calcular_desconto_sem_multas(contexto):
+    """Desconto por não ter multas nas últimas 5 locações"""
+    if contexto['ultimas_locacoes'] < 5 or contexto['ultimas_com_multa']:
+        return 0.00
+    return 40.00  # R$ 40,00 fixo
+
+def calcular_desconto_todas_categorias(contexto):
+    """Desconto por ter alugado todas as categorias"""
+    if contexto['categorias_utilizadas'] == contexto['total_categorias']:
+        return 60.00  # R$ 60,00 fixo
+    return 0.00
+
+def calcular_desconto_todos_acessorios(contexto):
+    """Desconto por ter usado todos os acessórios"""
+    if contexto['acessorios_utilizados'] == contexto['total_acessorios']:
+        return 45.00  # R$ 45,00 fixo
+    return 0.00
+
+# =========================================================
+# Motor de precificação da devolução
+# =========================================================
+
+def calcular_devolucao(contexto, data, data_devolucao):
+    """Valor base, multas e descontos de uma devolução, sem acessar o banco"""
+    # Valor base do aluguel
+    dias_locacao = max((data_devolucao - contexto["data_retirada"]).days, 1)
+    valor_base = float(contexto["preco_diaria"]) * dias_locacao
+
+    # MULTAS
+    multas = []
+    valor_total_multas = 0.0
+
+    # Multa por Atraso
+    multa_atraso, dias_atraso = calcular_multa_atraso(contexto, data_devolucao)
+    if multa_atraso > 0:
+        multas.append({
+            "tipo": "ATRASO",
+            "valor": multa_atraso,
+            "referencia": f"{dias_atraso} dias",
+            "codigo_motivo": "ATRASO"
+        })
+        valor_total_multas += multa_atraso
+
+    # Multa por Tanque não cheio
+    multa_tanque = calcular_multa_tanque(data["combustivel_completo"])
+    if multa_tanque > 0:
+        multas.append({
+            "tipo": "TANQUE_NAO_CHEIO",
+            "valor": multa_tanque,
+            "referencia": None,
+            "codigo_motivo": "TANQUE"
+        })
+        valor_total_multas += multa_tanque
+
+    # Multa por Danos
+    valor_danos = data.get("valor_danos", 0)
+    multa_danos = calcular_multa_danos(valor_danos)
+    if multa_danos > 0:
+        multas.append({
+            "tipo": "DANOS_VEICULO",
+            "valor": multa_danos,
+            "referencia": f"Valor danos: R$ {multa_danos}",
+            "codigo_motivo": "DANO"
+        })
+        valor_total_multas += multa_danos
+
+    # Multa por Quilometragem (se km_registro fornecido)
+    km_registro = data.get("km_registro")
+    if km_registro:
+        multa_km, km_excedente = calcular_multa_km(contexto, km_registro)
+        if multa_km > 0:
+            multas.append({
+                "tipo": "EXCESSO_QUILOMETRAGEM",
+                "valor": multa_km,
+                "referencia": f"{km_excedente} km excedentes",
+                "codigo_motivo": "KM_EXC"
+            })
+            valor_total_multas += multa_km
+
+    # DESCONTOS
+    descontos = []
+    valor_total_descontos = 0.0
+
+    regras_desconto = (
+        (calcular_desconto_cliente_fiel, "CLIENTE_FIEL", "LOYALTY_50"),
+        (calcular_desconto_reserva_antecipada, "RESERVA_ANTECIPADA", "EARLY_BOOKING"),
+        (calcular_desconto_sem_multas, "SEM_MULTAS", "NOFINE"),
+        (calcular_desconto_todas_categorias, "TODAS_CATEGORIAS", "ALLCATS"),
+        (calcular_desconto_todos_acessorios, "TODOS_ACESSORIOS", "ALLACC"),
+    )
+    for regra, tipo, codigo in regras_desconto:
+        valor = regra(contexto)
+        if valor > 0:
+            descontos.append({
+                "tipo": tipo,
+                "valor": valor,
+                "codigo_desconto": codigo
+            })
+            valor_total_descontos += valor
+
+    # Valor final
+    valor_final = valor_base + valor_total_multas - valor_total_descontos
+    valor_final = max(valor_final, 0)  # Não permitir valor negativo
+
+    return {
+        "dias_locacao": dias_locacao,
+        "dias_atraso": dias_atraso,
+        "valor_base": valor_base,
+        "valor_danos": valor_danos,
+        "multa_danos": multa_danos,
+        "km_registro": km_registro,
+        "multas": multas,
+        "descontos": descontos,
+        "valor_total_multas": valor_total_multas,
+        "valor_total_descontos": valor_total_descontos,
+        "valor_final": valor_final,
+    }
@@ -0,0 +1,72 @@
+from cache import CacheTTL
+from database.conector import DatabaseManager
+
+# ============================================================
+# Dados de referência (Categoria, Acessorio)
+# ============================================================
+# Mudam poucas vezes por ano: ficam em memória por TTL_REFERENCIA segundos.
+# Não há rota que as altere: a carga vem do banco.sql/migrações. Quando a
+# versão de Categoria muda (condicional.py), invalidar_referencias() descarta
+# o cache; Acessorio espera o TTL expirar.
+TTL_REFERENCIA = 300.0
+
+_cache = CacheTTL(TTL_REFERENCIA)
+
+
+def _consultar(query):
+    db = DatabaseManager()
+    try:
+        return db.execute_select_all(query)
+    finally:
+        db.close()
+
+
+def _carregar_categorias():
+    linhas = _consultar("SELECT tipo, preco_diaria, descricao FROM Categoria ORDER BY tipo;")
+    return {linha["tipo"]: linha for linha in linhas}
+
+
+def _carregar_acessorios():
+    linhas = _consultar("SELECT tipo, preco_adicional FROM Acessorio ORDER BY tipo;")
+    return {linha["tipo"]: linha for linha in linhas}
+
+
+def categorias():
+    """{tipo: {tipo, preco_diaria, descricao}} em ordem de tipo"""
+    return _cache.obter("categorias", _carregar_categorias)
+
+
+def acessorios():
+    """{tipo: {tipo, preco_adicional}} em ordem de tipo"""
+    return _cache.obter("acessorios", _carregar_acessorios)
+
+
+def categoria(tipo):
+    """Categoria pelo tipo; recarrega uma vez se o tipo ainda não estiver em cache"""
+    cat = categorias().get(tipo)
+    if cat is None:
+        _cache.invalidar("categorias")
+        cat = categorias().get(tipo)
+    return cat
+
+
+def total_categorias():
+    return len(categorias())
+
+
+def total_acessorios():
+    return len(acessorios())
+
+
+def invalidar_referencias():
+    _cache.invalidar()
+
+
+def anexar_categoria(linha, preco="preco", descricao=None):
+    """Completa uma linha de Carro com o preço/descrição da sua categoria (no lugar do JOIN)"""
+    cat = categoria(linha["tipo_categoria"]) or {}
+    if preco:
+        linha[preco] = cat.get("preco_diaria")
+    if descricao:
+        linha[descricao] = cat.get("descricao")
+    return linha
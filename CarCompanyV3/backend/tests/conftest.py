@@ -0,0 +1,97 @@
+"""Fixtures dos testes de integração (a partir de backend/: python -m pytest tests).
+
+Os testes rodam contra um Postgres de verdade, em um schema descartável
+(`aluguel_teste`) montado com o banco.sql e uma massa sintética pequena.
+A conexão é a do conector (DB_DSN, DB_HOST etc., ver database/configuracao.py);
+sem Postgres, sem as extensões exigidas pelo banco.sql ou sem os drivers
+instalados, os testes são pulados.
+"""
+import itertools
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA_TESTE = "aluguel_teste"
+ESCALA_TESTE = {"funcionarios": 5, "clientes": 50, "carros": 40, "alugueis": 200}
+
+_sequencia = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def base():
+    """Conexão direta com o schema de teste (search_path já apontado para ele)"""
+    psycopg2 = pytest.importorskip("psycopg2")
+    pytest.importorskip("flask")
+    from benchmarks.dados_sinteticos import criar_base
+    from database import conector
+
+    try:
+        conn = psycopg2.connect(**conector.CONEXAO)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres indisponível: {e}")
+
+    try:
+        criar_base(conn, schema=SCHEMA_TESTE, verbose=False, **ESCALA_TESTE)
+    except psycopg2.NotSupportedError as e:
+        # ex.: servidor sem a extensão pg_trgm exigida pelo banco.sql
+        conn.close()
+        pytest.skip(f"Postgres sem os recursos do banco.sql: {e}")
+    conn.autocommit = True
+    conector.close_pool()
+    conector.SEARCH_PATH = f"{SCHEMA_TESTE}, public"
+    yield conn
+
+    conector.close_pool()
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA {SCHEMA_TESTE} CASCADE;")
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def app(base):
+    from app import create_app
+
+    app = create_app()
+    app.testing = True
+    return app
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def nova_locacao(base, cliente):
+    """Abre pela API uma locação de um carro e um cliente novos; retorna (num_locacao, placa, cpf)"""
+
+    def abrir(dias_atraso=0, dias=3, tipo_categoria="Economico", **extras):
+        n = next(_sequencia)
+        placa = f"TST{n % 10}A{n // 10 % 100:02d}"
+        cpf = f"{99900000000 + n:011d}"
+        with base.cursor() as cur:
+            cur.execute("""
+                INSERT INTO Carro (placa, nome, chassi, ano, quilometragem, tipo_categoria, status_carro)
+                VALUES (%s, 'Carro Teste', %s, 2022, 10000, %s, 'DISPONIVEL');
+            """, (placa, f"TESTE{n:08d}", tipo_categoria))
+            cur.execute("INSERT INTO Cliente (cpf, nome) VALUES (%s, %s);", (cpf, f"Cliente Teste {n}"))
+            cur.execute("SELECT MIN(num_funcionario) FROM Funcionario;")
+            num_funcionario = cur.fetchone()[0]
+
+        prevista = date.today() - timedelta(days=dias_atraso)
+        resposta = cliente.post("/aluguel", json={
+            "placa": placa,
+            "cpf_cliente": cpf,
+            "num_funcionario": num_funcionario,
+            "data_retirada": (prevista - timedelta(days=dias)).isoformat(),
+            "data_prevista_devolucao": prevista.isoformat(),
+            **extras,
+        })
+        assert resposta.status_code == 201, resposta.get_json()
+        return resposta.get_json()["num_locacao"], placa, cpf
+
+    return abrir
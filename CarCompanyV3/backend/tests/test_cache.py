@@ -0,0 +1,59 @@
+import threading
+import time
+
+from cache import CacheTTL
+
+
+def test_carga_lenta_nao_trava_outras_chaves():
+    cache = CacheTTL(60)
+    liberar = threading.Event()
+
+    def carga_lenta():
+        liberar.wait(5)
+        return "lento"
+
+    t = threading.Thread(target=cache.obter, args=("a", carga_lenta))
+    t.start()
+    try:
+        inicio = time.monotonic()
+        assert cache.obter("b", lambda: "rapido") == "rapido"
+        assert time.monotonic() - inicio < 1
+    finally:
+        liberar.set()
+        t.join()
+    assert cache.obter("a", lambda: "outro") == "lento"
+
+
+def test_mesma_chave_carrega_uma_vez():
+    cache = CacheTTL(60)
+    chamadas = []
+    barreira = threading.Barrier(8)
+
+    def carregar():
+        chamadas.append(1)
+        time.sleep(0.1)
+        return 42
+
+    def ler(resultados):
+        barreira.wait()
+        resultados.append(cache.obter("x", carregar))
+
+    resultados = []
+    threads = [threading.Thread(target=ler, args=(resultados,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert resultados == [42] * 8
+    assert len(chamadas) == 1
+
+
+def test_invalidar_durante_carga_nao_guarda_valor_antigo():
+    cache = CacheTTL(60)
+
+    def carregar():
+        cache.invalidar("x")
+        return "antigo"
+
+    assert cache.obter("x", carregar) == "antigo"
+    assert cache.obter("x", lambda: "novo") == "novo"
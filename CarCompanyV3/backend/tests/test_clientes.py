@@ -0,0 +1,79 @@
+import threading
+
+
+def test_upsert_cria_e_atualiza(base, cliente):
+    cpf = "98800000001"
+    criado = cliente.post("/clientes/upsert", json={"cpf": cpf, "nome": "Ana", "telefone": "11999990000"})
+    assert criado.status_code == 200
+    assert criado.get_json()["acao"] == "criado"
+
+    atualizado = cliente.post("/clientes/upsert", json={"cpf": cpf, "nome": "Ana Souza", "telefone": ""})
+    assert atualizado.status_code == 200
+    assert atualizado.get_json()["acao"] == "atualizado"
+
+    with base.cursor() as cur:
+        cur.execute("SELECT nome, telefone FROM Cliente WHERE cpf = %s;", (cpf,))
+        # telefone vazio na atualização mantém o atual
+        assert cur.fetchone() == ("Ana Souza", "11999990000")
+
+
+def test_upsert_simultaneo_mesmo_cpf(app):
+    cpf = "98800000002"
+    concorrentes = 8
+    largada = threading.Barrier(concorrentes)
+    resultados = []
+
+    def upsert(i):
+        cliente = app.test_client()
+        largada.wait()
+        resposta = cliente.post("/clientes/upsert", json={"cpf": cpf, "nome": f"Cliente {i}"})
+        resultados.append((resposta.status_code, resposta.get_json()["acao"]))
+
+    threads = [threading.Thread(target=upsert, args=(i,)) for i in range(concorrentes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [status for status, _ in resultados] == [200] * concorrentes
+    assert sorted(acao for _, acao in resultados) == ["atualizado"] * (concorrentes - 1) + ["criado"]
+
+
+def test_paginacao_continua_apos_linha_apagada(base, cliente):
+    cpfs = ["98700000001", "98700000002", "98700000003"]
+    with base.cursor() as cur:
+        for i, cpf in enumerate(cpfs, 1):
+            # "AAAA" ordena antes de todos os outros nomes da base de teste
+            cur.execute("INSERT INTO Cliente (cpf, nome) VALUES (%s, %s);", (cpf, f"AAAA Paginacao {i}"))
+
+    primeira = cliente.get("/clientes?limit=2").get_json()
+    assert [c["cpf"] for c in primeira["clientes"]] == cpfs[:2]
+    assert primeira["proximo"]
+
+    # a última linha da página some antes de o cliente pedir a próxima
+    with base.cursor() as cur:
+        cur.execute("DELETE FROM Cliente WHERE cpf = %s;", (cpfs[1],))
+
+    segunda = cliente.get(f"/clientes?limit=2&after={primeira['proximo']}")
+    assert segunda.status_code == 200
+    assert segunda.get_json()["clientes"][0]["cpf"] == cpfs[2]
+
+
+def test_paginacao_cursor_invalido(cliente):
+    for cursor in ("xyz", "12345678901", "WyJhIl0"):  # o último é ["a"]: chave incompleta
+        resposta = cliente.get(f"/clientes?after={cursor}")
+        assert resposta.status_code == 400, cursor
+        assert resposta.get_json()["erro"] == "Parâmetro 'after' inválido"
+
+
+def test_historico_cliente_sem_alugueis(base, cliente):
+    cpf = "98800000003"
+    with base.cursor() as cur:
+        cur.execute("INSERT INTO Cliente (cpf, nome) VALUES (%s, %s);", (cpf, "Sem Aluguel"))
+
+    resposta = cliente.get(f"/clientes/{cpf}/historico")
+    assert resposta.status_code == 200
+    dados = resposta.get_json()
+    assert dados["historico"] == []
+    assert dados["estatisticas"] == {"total_alugueis": 0, "alugueis_ativos": 0, "total_gasto": 0}
+    assert isinstance(dados["estatisticas"]["total_gasto"], int)
@@ -0,0 +1,165 @@
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+import condicional  # noqa: E402
+
+
+def _versao_categoria(base):
+    with base.cursor() as cur:
+        cur.execute("""
+            SELECT SUM(versao), date_trunc('second', MAX(modificado_em))
+            FROM VersaoTabela WHERE tabela = 'categoria';
+        """)
+        return cur.fetchone()
+
+
+def _sessao():
+    """Conexão nova no schema de teste e a fatia de VersaoTabela que ela usa"""
+    import psycopg2
+    from database.conector import CONEXAO, SEARCH_PATH
+
+    conn = psycopg2.connect(**CONEXAO)
+    with conn.cursor() as cur:
+        cur.execute(f"SET search_path TO {SEARCH_PATH};")
+        cur.execute("SELECT pg_backend_pid() % 16;")
+        fatia = cur.fetchone()[0]
+    conn.commit()
+    return conn, fatia
+
+
+def _placa(base):
+    with base.cursor() as cur:
+        cur.execute("SELECT placa FROM Carro ORDER BY placa LIMIT 1;")
+        return cur.fetchone()[0]
+
+
+def test_etag_e_304(cliente):
+    primeira = cliente.get("/categorias")
+    assert primeira.status_code == 200
+    etag = primeira.headers["ETag"]
+
+    repetida = cliente.get("/categorias", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.headers["ETag"] == etag
+
+
+def test_disponiveis_por_periodo_sem_get_condicional(cliente):
+    # locações em aberto vencem com o tempo: o período não pode ser revalidado só pela versão
+    agora = cliente.get("/carros/disponiveis")
+    assert agora.headers.get("ETag")
+
+    url = "/carros/disponiveis?de=2030-01-01&ate=2030-01-05"
+    periodo = cliente.get(url)
+    assert periodo.status_code == 200
+    assert "ETag" not in periodo.headers
+    assert cliente.get(url, headers={"If-None-Match": agora.headers["ETag"]}).status_code == 200
+
+
+def test_escrita_nao_confirmada_nao_muda_versao(base, cliente):
+    psycopg2 = pytest.importorskip("psycopg2")
+    from database.conector import CONEXAO, SEARCH_PATH
+
+    condicional.invalidar_versoes()
+    etag = cliente.get("/categorias").headers["ETag"]
+
+    escritor = psycopg2.connect(**CONEXAO)
+    try:
+        with escritor.cursor() as cur:
+            cur.execute(f"SET search_path TO {SEARCH_PATH};")
+            cur.execute("UPDATE Categoria SET descricao = descricao || '.' WHERE tipo = 'SUV';")
+
+        # antes do COMMIT: a versão não anda, o 304 continua valendo para o corpo antigo
+        condicional.invalidar_versoes()
+        assert cliente.get("/categorias", headers={"If-None-Match": etag}).status_code == 304
+
+        escritor.commit()
+    finally:
+        escritor.close()
+
+    condicional.invalidar_versoes()
+    depois = cliente.get("/categorias", headers={"If-None-Match": etag})
+    assert depois.status_code == 200
+    assert depois.headers["ETag"] != etag
+    assert any(c["descricao"].endswith(".") for c in depois.get_json()["categorias"] if c["tipo"] == "SUV")
+
+    # Last-Modified vem do banco, não do relógio do processo
+    _, modificado_em = _versao_categoria(base)
+    assert depois.last_modified == modificado_em
+
+
+def test_escritores_em_fatias_diferentes_nao_se_esperam(base):
+    placa = _placa(base)
+    trava, fatia_travada = _sessao()
+    sessoes = []
+    try:
+        # outra sessão segura a fatia de versão de carro até o fim do teste
+        with trava.cursor() as cur:
+            cur.execute("""
+                INSERT INTO VersaoTabela (tabela, fatia) VALUES ('carro', %s)
+                ON CONFLICT DO NOTHING;
+            """, (fatia_travada,))
+            trava.commit()
+            cur.execute("SELECT 1 FROM VersaoTabela WHERE tabela = 'carro' AND fatia = %s FOR UPDATE;",
+                        (fatia_travada,))
+
+        while True:
+            escritor, fatia = _sessao()
+            sessoes.append(escritor)
+            if fatia != fatia_travada:
+                break
+        with escritor.cursor() as cur:
+            cur.execute("SET lock_timeout = '2s';")
+            cur.execute("UPDATE Carro SET quilometragem = quilometragem WHERE placa = %s;", (placa,))
+        escritor.commit()  # com uma linha só por tabela, esperaria a trava acima
+    finally:
+        trava.close()
+        for conn in sessoes:
+            conn.close()
+
+
+def test_versoes_gravadas_em_ordem_de_tabela(base):
+    from psycopg2.errors import LockNotAvailable
+
+    placa = _placa(base)
+    escritor, fatia = _sessao()
+    trava = _sessao()[0]
+    commit = threading.Thread(target=escritor.commit)
+    try:
+        with trava.cursor() as cur:
+            cur.execute("""
+                INSERT INTO VersaoTabela (tabela, fatia) VALUES ('agendacarro', %s), ('carro', %s)
+                ON CONFLICT DO NOTHING;
+            """, (fatia, fatia))
+            trava.commit()
+            cur.execute("SELECT 1 FROM VersaoTabela WHERE tabela = 'carro' AND fatia = %s FOR UPDATE;", (fatia,))
+
+        # carro é alterado antes de agendacarro, mas a gravação segue a ordem do nome
+        with escritor.cursor() as cur:
+            cur.execute("UPDATE Carro SET quilometragem = quilometragem WHERE placa = %s;", (placa,))
+            cur.execute("UPDATE AgendaCarro SET placa = placa WHERE false;")
+        commit.start()
+
+        # espera o COMMIT parar na linha de carro
+        with trava.cursor() as cur:
+            for _ in range(50):
+                cur.execute("SELECT count(*) FROM pg_locks WHERE locktype = 'transactionid' AND NOT granted;")
+                if cur.fetchone()[0]:
+                    break
+                threading.Event().wait(0.1)
+            else:
+                pytest.fail("o COMMIT não esperou a linha de carro")
+
+            # ... já com agendacarro travada
+            cur.execute("SAVEPOINT sem_espera;")
+            with pytest.raises(LockNotAvailable):
+                cur.execute("""
+                    SELECT 1 FROM VersaoTabela WHERE tabela = 'agendacarro' AND fatia = %s FOR UPDATE NOWAIT;
+                """, (fatia,))
+            cur.execute("ROLLBACK TO SAVEPOINT sem_espera;")
+    finally:
+        trava.rollback()
+        commit.join(5)
+        trava.close()
+        escritor.close()
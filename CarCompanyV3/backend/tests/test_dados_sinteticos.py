@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("flask")
+from benchmarks.dados_sinteticos import CARGA, ESCALA_PADRAO, _ddl_e_referencias  # noqa: E402
+
+
+def test_referencias_incluem_categoria_e_acessorio():
+    _, referencias = _ddl_e_referencias("aluguel_teste")
+    assert [stmt.split("(")[0].strip() for stmt in referencias] == [
+        "INSERT INTO Categoria", "INSERT INTO Acessorio",
+    ]
+
+
+@pytest.mark.parametrize("etapa, sql", CARGA)
+def test_carga_aceita_parametros_nomeados(etapa, sql):
+    # mesma interpolação que o psycopg2 faz com um dict: '%' solto quebra
+    sql % {nome: 1 for nome in ESCALA_PADRAO}
@@ -0,0 +1,163 @@
+from decimal import Decimal
+
+import pytest
+
+
+def _linhas(base, query, params):
+    with base.cursor() as cur:
+        cur.execute(query, params)
+        return cur.fetchall()
+
+
+def test_devolucao_completa(base, cliente, nova_locacao):
+    num_locacao, placa, _ = nova_locacao(dias_atraso=2)
+
+    resposta = cliente.post("/aluguel/devolver", json={
+        "num_locacao": num_locacao,
+        "estado_carro": "AMASSADO",
+        "combustivel_completo": False,
+        "valor_danos": 800,
+        "km_registro": 1200,
+        "forma_pagamento": "Pix",
+    })
+    assert resposta.status_code == 200, resposta.get_json()
+    corpo = resposta.get_json()
+
+    multas = {m["tipo"]: m for m in corpo["multas_aplicadas"]}
+    assert set(multas) == {"ATRASO", "TANQUE_NAO_CHEIO", "DANOS_VEICULO"}
+    assert corpo["detalhes"]["dias_atraso"] == 2
+    assert corpo["detalhes"]["status_carro"] == "MANUTENCAO"
+    assert corpo["num_manutencao"]
+
+    # tudo gravado na mesma transação
+    [(num_pagamento, km_registro, valor_danos)] = _linhas(
+        base, "SELECT num_pagamento, km_registro, valor_danos FROM Devolucao WHERE num_locacao = %s;",
+        (num_locacao,))
+    assert num_pagamento == corpo["num_pagamento"]
+    assert km_registro == 1200
+    assert valor_danos == Decimal("800.00")
+
+    [(valor_total, forma)] = _linhas(
+        base, "SELECT valor_total, forma_pagamento FROM Pagamento WHERE num_pagamento = %s;", (num_pagamento,))
+    assert float(valor_total) == pytest.approx(corpo["resumo_financeiro"]["valor_final"], abs=0.01)
+    assert forma == "Pix"
+
+    gravadas = _linhas(
+        base, "SELECT tipo_multa, codigo_motivo, referencia FROM Multa WHERE num_pagamento = %s ORDER BY tipo_multa;",
+        (num_pagamento,))
+    assert gravadas == [
+        ("ATRASO", "ATRASO", "2 dias"),
+        ("DANOS_VEICULO", "DANO", multas["DANOS_VEICULO"]["referencia"]),
+        ("TANQUE_NAO_CHEIO", "TANQUE", None),
+    ]
+
+    assert _linhas(base, "SELECT status_carro FROM Carro WHERE placa = %s;", (placa,)) == [("MANUTENCAO",)]
+    assert _linhas(base, "SELECT placa_carro FROM Manutencao WHERE num_manutencao = %s;",
+                   (corpo["num_manutencao"],)) == [(placa,)]
+
+    # a mesma locação não pode ser devolvida duas vezes
+    repetida = cliente.post("/aluguel/devolver", json={
+        "num_locacao": num_locacao, "estado_carro": "OK", "combustivel_completo": True,
+    })
+    assert repetida.status_code == 404
+
+
+def test_devolucao_sem_multas_libera_carro(base, cliente, nova_locacao):
+    num_locacao, placa, _ = nova_locacao()
+
+    resposta = cliente.post("/aluguel/devolver", json={
+        "num_locacao": num_locacao, "estado_carro": "OK", "combustivel_completo": True,
+    })
+    assert resposta.status_code == 200, resposta.get_json()
+    assert resposta.get_json()["multas_aplicadas"] == []
+
+    [(status,)] = _linhas(base, "SELECT status_carro FROM Carro WHERE placa = %s;", (placa,))
+    assert status == "DISPONIVEL"
+    [(valor_danos,)] = _linhas(base, "SELECT valor_danos FROM Devolucao WHERE num_locacao = %s;", (num_locacao,))
+    assert valor_danos == 0
+
+
+def test_devolucao_km_invalido(cliente, nova_locacao):
+    num_locacao, _, _ = nova_locacao()
+    resposta = cliente.post("/aluguel/devolver", json={
+        "num_locacao": num_locacao, "estado_carro": "OK", "combustivel_completo": True, "km_registro": "-5",
+    })
+    assert resposta.status_code == 400
+
+
+@pytest.mark.parametrize("valor_danos", [-100, "abc", "NaN", "Infinity", 1e12, True])
+def test_devolucao_valor_danos_invalido(base, cliente, nova_locacao, valor_danos):
+    num_locacao, _, _ = nova_locacao()
+    resposta = cliente.post("/aluguel/devolver", json={
+        "num_locacao": num_locacao, "estado_carro": "AMASSADO", "combustivel_completo": True,
+        "valor_danos": valor_danos,
+    })
+    assert resposta.status_code == 400, resposta.get_json()
+    assert "valor_danos" in resposta.get_json()["erro"]
+    assert _linhas(base, "SELECT 1 FROM Devolucao WHERE num_locacao = %s;", (num_locacao,)) == []
+
+
+def test_devolucao_multa_km(base, cliente, nova_locacao):
+    num_locacao, _, _ = nova_locacao(km_previsto=500)
+
+    resposta = cliente.post("/aluguel/devolver", json={
+        "num_locacao": num_locacao, "estado_carro": "OK", "combustivel_completo": True, "km_registro": 800,
+    })
+    assert resposta.status_code == 200, resposta.get_json()
+    [multa] = resposta.get_json()["multas_aplicadas"]
+    assert multa["tipo"] == "EXCESSO_QUILOMETRAGEM"
+    assert multa["valor"] == pytest.approx(150.0)
+    assert multa["referencia"] == "300 km excedentes"
+
+
+def test_devolucao_cliente_sem_resumo(base, cliente, nova_locacao):
+    num_locacao, _, cpf = nova_locacao()
+    with base.cursor() as cur:
+        cur.execute("DELETE FROM ClienteResumo WHERE cpf = %s;", (cpf,))
+
+    resposta = cliente.post("/aluguel/devolver", json={
+        "num_locacao": num_locacao, "estado_carro": "OK", "combustivel_completo": True,
+    })
+    assert resposta.status_code == 200, resposta.get_json()
+    assert resposta.get_json()["descontos_aplicados"] == []
+
+
+@pytest.mark.parametrize("estado, danos, codigos_esperados, status_esperado", [
+    ("OK", None, ["ATRASO", "TANQUE"], "DISPONIVEL"),
+    ("AMASSADO", 800, ["ATRASO", "DANO", "TANQUE"], "MANUTENCAO"),
+])
+def test_devolucao_completa_asgi(base, nova_locacao, estado, danos, codigos_esperados, status_esperado):
+    pytest.importorskip("quart")
+    pytest.importorskip("psycopg_pool")
+    import asyncio
+    from app_async import create_app_async
+
+    num_locacao, placa, _ = nova_locacao(dias_atraso=1)
+    corpo_devolucao = {
+        "num_locacao": num_locacao,
+        "estado_carro": estado,
+        "combustivel_completo": False,
+        "km_registro": 800,
+    }
+    if danos is not None:
+        corpo_devolucao["valor_danos"] = danos
+
+    async def devolver():
+        app = create_app_async()
+        async with app.test_app() as app_teste:
+            resposta = await app_teste.test_client().post("/aluguel/devolver", json=corpo_devolucao)
+            return resposta.status_code, await resposta.get_json()
+
+    status, corpo = asyncio.run(devolver())
+    assert status == 200, corpo
+
+    [(km_registro, codigos)] = _linhas(base, """
+        SELECT d.km_registro, array_agg(m.codigo_motivo ORDER BY m.codigo_motivo)
+        FROM Devolucao d JOIN Multa m ON m.num_pagamento = d.num_pagamento
+        WHERE d.num_locacao = %s
+        GROUP BY d.km_registro;
+    """, (num_locacao,))
+    assert km_registro == 800
+    assert codigos == codigos_esperados
+    [(status_carro,)] = _linhas(base, "SELECT status_carro FROM Carro WHERE placa = %s;", (placa,))
+    assert status_carro == status_esperado
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.fixture
+def aluguel_travado(base, monkeypatch):
+    """Aluguel travado por outra sessão; as conexões do pool desistem em 100ms"""
+    import psycopg2
+    from database import conector
+
+    conector.close_pool()
+    monkeypatch.setitem(conector.SESSAO, "lock_timeout", "100ms")
+    trava = psycopg2.connect(**conector.CONEXAO)
+    with trava.cursor() as cur:
+        cur.execute(f"SET search_path TO {conector.SEARCH_PATH};")
+        cur.execute("LOCK TABLE Aluguel IN ACCESS EXCLUSIVE MODE;")
+    yield
+    trava.rollback()
+    trava.close()
+    conector.close_pool()
+
+
+@pytest.mark.parametrize("formato", ["csv", "ndjson"])
+def test_exportar_le_depois_do_teardown(cliente, formato):
+    # o corpo é gerado depois do teardown: a conexão segue emprestada até o close
+    from database import conector
+
+    resposta = cliente.get(f"/aluguel/exportar?formato={formato}")
+    assert resposta.status_code == 200
+    linhas = resposta.get_data(as_text=True).splitlines()
+    assert len(linhas) > 1
+    if formato == "csv":
+        assert linhas[0].startswith("num_locacao,")
+    livres = len(conector.get_pool()._livres)
+    resposta.close()
+    assert len(conector.get_pool()._livres) == livres + 1
+
+
+@pytest.mark.parametrize("formato", ["csv", "ndjson"])
+def test_exportar_erro_do_banco_responde_500(cliente, aluguel_travado, formato):
+    # o erro da consulta aparece antes do 200, não como um arquivo cortado
+    resposta = cliente.get(f"/aluguel/exportar?formato={formato}")
+    assert resposta.status_code == 500
+    assert "lock" in resposta.get_json()["erro"]
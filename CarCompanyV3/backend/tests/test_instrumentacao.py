@@ -0,0 +1,54 @@
+import json
+import logging
+import time
+
+import pytest
+
+flask = pytest.importorskip("flask")
+from database import instrumentacao  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = flask.Flask(__name__)
+    instrumentacao.init_app(app)
+
+    @app.route("/normal")
+    def normal():
+        instrumentacao.registrar_consulta("SELECT 1", time.perf_counter())
+        return "ok"
+
+    @app.route("/stream")
+    def stream():
+        def gerar():
+            for i in range(3):
+                sql = "SELECT * FROM Aluguel" if i == 1 else "SELECT 1"
+                inicio = time.perf_counter() - (0.05 if i == 1 else 0)
+                instrumentacao.registrar_consulta(sql, inicio)
+                yield f"{i}\n"
+        return flask.Response(flask.stream_with_context(gerar()))
+
+    return app
+
+
+def test_cabecalhos_em_resposta_normal(app):
+    resposta = app.test_client().get("/normal")
+    assert resposta.headers["X-DB-Queries"] == "1"
+    assert resposta.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_stream_registra_consultas_ao_fechar(app, caplog):
+    with caplog.at_level(logging.INFO, logger="carcompany.db"):
+        resposta = app.test_client().get("/stream")
+        assert resposta.data == b"0\n1\n2\n"
+        assert "X-DB-Queries" not in resposta.headers
+        resposta.close()
+
+    registros = [json.loads(r.getMessage()) for r in caplog.records]
+    registros = [r for r in registros if r["evento"] == "resposta_stream"]
+    assert len(registros) == 1
+    registro = registros[0]
+    assert registro["rota"] == "GET /stream"
+    assert registro["consultas"] == 3
+    assert registro["mais_lenta_ms"] >= 50
+    assert registro["sql"] == "SELECT * FROM Aluguel"
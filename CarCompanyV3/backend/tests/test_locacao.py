@@ -0,0 +1,82 @@
+import itertools
+from datetime import date, timedelta
+
+import pytest
+
+_sequencia = itertools.count(1)
+
+
+@pytest.fixture
+def reserva(base):
+    """Corpo de POST /aluguel válido para um carro livre e um cliente novos"""
+    n = next(_sequencia)
+    placa = f"LOC{n % 10}B{n // 10 % 100:02d}"
+    cpf = f"{99800000000 + n:011d}"
+    with base.cursor() as cur:
+        cur.execute("""
+            INSERT INTO Carro (placa, nome, chassi, ano, quilometragem, tipo_categoria, status_carro)
+            VALUES (%s, 'Carro Teste', %s, 2022, 10000, 'Economico', 'DISPONIVEL');
+        """, (placa, f"LOCACAO{n:08d}"))
+        cur.execute("INSERT INTO Cliente (cpf, nome) VALUES (%s, %s);", (cpf, f"Cliente Locação {n}"))
+        cur.execute("SELECT MIN(num_funcionario) FROM Funcionario;")
+        num_funcionario = cur.fetchone()[0]
+
+    return {
+        "placa": placa,
+        "cpf_cliente": cpf,
+        "num_funcionario": num_funcionario,
+        "data_retirada": date.today().isoformat(),
+        "data_prevista_devolucao": (date.today() + timedelta(days=3)).isoformat(),
+    }
+
+
+def _status_carro(base, placa):
+    with base.cursor() as cur:
+        cur.execute("SELECT status_carro FROM Carro WHERE placa = %s;", (placa,))
+        return cur.fetchone()[0]
+
+
+@pytest.mark.parametrize("campo, valor, erro", [
+    ("cpf_cliente", "00000000000", "Cliente inexistente"),
+    ("num_funcionario", 999999, "Funcionário inexistente"),
+    ("acessorios", ["NAO_EXISTE"], "Acessório inexistente"),
+])
+def test_chave_estrangeira_indica_o_campo(base, cliente, reserva, campo, valor, erro):
+    resposta = cliente.post("/aluguel", json={**reserva, campo: valor})
+    assert resposta.status_code == 400
+    assert resposta.get_json() == {"erro": erro, "campo": campo}
+    # nada foi gravado: o carro continua livre
+    assert _status_carro(base, reserva["placa"]) == "DISPONIVEL"
+
+
+def test_check_nao_vira_chave_estrangeira(base, cliente, reserva):
+    with base.cursor() as cur:
+        cur.execute("ALTER TABLE Aluguel ADD CONSTRAINT aluguel_km_teto_teste CHECK (km_previsto <= 100000);")
+    try:
+        resposta = cliente.post("/aluguel", json={**reserva, "km_previsto": 500000})
+    finally:
+        with base.cursor() as cur:
+            cur.execute("ALTER TABLE Aluguel DROP CONSTRAINT aluguel_km_teto_teste;")
+
+    assert resposta.status_code == 400
+    corpo = resposta.get_json()
+    assert corpo["restricao"] == "aluguel_km_teto_teste"
+    assert "inexistente" not in corpo["erro"]
+
+
+def test_chave_estrangeira_asgi(base, reserva):
+    pytest.importorskip("quart")
+    pytest.importorskip("psycopg_pool")
+    import asyncio
+    from app_async import create_app_async
+
+    async def reservar():
+        app = create_app_async()
+        async with app.test_app() as app_teste:
+            resposta = await app_teste.test_client().post(
+                "/aluguel", json={**reserva, "num_funcionario": 999999})
+            return resposta.status_code, await resposta.get_json()
+
+    status, corpo = asyncio.run(reservar())
+    assert status == 400
+    assert corpo == {"erro": "Funcionário inexistente", "campo": "num_funcionario"}
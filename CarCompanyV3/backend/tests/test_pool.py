@@ -0,0 +1,77 @@
+"""ConnectionPool com conexões falsas: não precisa de Postgres."""
+import threading
+import time
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+from psycopg2 import extensions  # noqa: E402
+
+from database import pool as modulo_pool  # noqa: E402
+
+
+class CursorFalso:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        # validação de uma conexão com socket lento
+        time.sleep(self.conn.atraso_validacao)
+
+
+class ConexaoFalsa:
+    def __init__(self):
+        self.closed = 0
+        self.atraso_validacao = 0.0
+
+    def cursor(self):
+        return CursorFalso(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(modulo_pool.psycopg2, "connect", lambda **kwargs: ConexaoFalsa())
+    # validar_apos=0: toda conexão livre é testada antes do empréstimo
+    return modulo_pool.ConnectionPool(minconn=0, maxconn=2, timeout=1.0, validar_apos=0.0)
+
+
+def test_validacao_lenta_nao_trava_o_pool(pool):
+    lenta = pool.getconn()
+    outra = pool.getconn()
+    lenta.atraso_validacao = 0.5
+    pool.putconn(lenta)
+
+    validando = threading.Thread(target=pool.getconn)
+    validando.start()
+    time.sleep(0.05)  # a thread está dentro do SELECT 1 da conexão lenta
+
+    inicio = time.monotonic()
+    pool.putconn(outra)
+    assert pool.getconn() is outra
+    assert time.monotonic() - inicio < 0.2
+    validando.join()
+
+
+def test_conexao_invalida_e_trocada(pool):
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.closed = 1
+
+    nova = pool.getconn()
+    assert nova is not conn
+    assert pool._abertas == 1
@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("flask")
+from database import conector  # noqa: E402
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Réplica configurada, com a medição do atraso substituída por `medir`"""
+    medicoes = []
+    resultado = {"atraso": 0.0, "espera": None}
+
+    def medir():
+        medicoes.append(time.monotonic())
+        if resultado["espera"] is not None:
+            resultado["espera"].wait(5)
+        return resultado["atraso"]
+
+    monkeypatch.setattr(conector, "CONEXAO_REPLICA", {"host": "replica-teste"})
+    monkeypatch.setattr(conector, "_medir_atraso_replica", medir)
+    monkeypatch.setattr(conector, "RETENTATIVA_REPLICA", 0.05)
+    conector._reiniciar_estado_replica()
+    yield medicoes, resultado
+    conector._reiniciar_estado_replica()
+
+
+def test_falha_tenta_de_novo_logo_e_loga_fallback(replica, caplog):
+    medicoes, _ = replica
+    assert conector.replica_disponivel()
+
+    with caplog.at_level(logging.WARNING):
+        conector._marcar_replica_indisponivel(RuntimeError("conexão recusada"))
+    assert "replica_fallback_primario" in caplog.text
+    assert not conector.replica_disponivel()
+    assert len(medicoes) == 1  # dentro da espera: sem nova medição
+
+    time.sleep(0.06)
+    with caplog.at_level(logging.WARNING):
+        assert conector.replica_disponivel()
+    assert len(medicoes) == 2
+    assert "replica_restabelecida" in caplog.text
+
+
+def test_espera_dobra_a_cada_falha(replica):
+    _, resultado = replica
+    resultado["atraso"] = None
+    esperas = []
+    for _ in range(4):
+        conector._proxima_checagem = 0.0
+        inicio = time.monotonic()
+        conector.atraso_replica()
+        esperas.append(round(conector._proxima_checagem - inicio, 2))
+    assert esperas == [0.05, 0.1, 0.2, 0.4]
+
+
+def test_checagem_lenta_nao_trava_outras_threads(replica):
+    medicoes, resultado = replica
+    resultado["espera"] = threading.Event()
+    t = threading.Thread(target=conector.atraso_replica)
+    t.start()
+    try:
+        while not medicoes:
+            time.sleep(0.01)
+        inicio = time.monotonic()
+        assert conector.atraso_replica() is None  # usa o último valor conhecido
+        assert time.monotonic() - inicio < 1
+    finally:
+        resultado["espera"].set()
+        t.join()
+    assert len(medicoes) == 1
@@ -0,0 +1,5 @@
+# Ponto de entrada de produção:
+#   gunicorn wsgi:app            (lê gunicorn.conf.py do diretório atual)
+from app import create_app
+
+app = create_app()
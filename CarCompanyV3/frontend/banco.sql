@@ -108,6 +108,7 @@ CREATE TABLE Aluguel (
     cpf_cliente CHAR(11) NOT NULL,
     seguro_contratado BOOLEAN DEFAULT FALSE,
     num_pagamento INTEGER,
+    km_previsto INTEGER,
     
     FOREIGN KEY (num_pagamento) REFERENCES Pagamento(num_pagamento),
     FOREIGN KEY (num_funcionario) REFERENCES Funcionario(num_funcionario),
@@ -115,6 +116,7 @@ CREATE TABLE Aluguel (
     FOREIGN KEY (cpf_cliente) REFERENCES Cliente(cpf),
     
     CHECK (valor_previsto IS NULL OR valor_previsto >= 0),
+    CHECK (km_previsto IS NULL OR km_previsto >= 0),
     CHECK (data_prevista_devolucao > data_retirada)
 );
 
@@ -137,6 +139,8 @@ CREATE TABLE Multa (
     num_pagamento INTEGER NOT NULL,
     tipo_multa VARCHAR(100) NOT NULL,
     valor NUMERIC(10,2) NOT NULL,
+    codigo_motivo VARCHAR(20),
+    referencia VARCHAR(200),
     
     FOREIGN KEY (num_pagamento) REFERENCES Pagamento(num_pagamento),
     CHECK (valor >= 0)
@@ -150,6 +154,7 @@ CREATE TABLE Desconto (
     num_pagamento INTEGER NOT NULL,
     tipo_desconto VARCHAR(100) NOT NULL,
     valor NUMERIC(10,2) NOT NULL,
+    codigo_desconto VARCHAR(20),
     flag_ativo BOOLEAN NOT NULL DEFAULT TRUE,
     
     FOREIGN KEY (num_pagamento) REFERENCES Pagamento(num_pagamento),
@@ -165,9 +170,13 @@ CREATE TABLE Devolucao (
     data_real_devolucao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     combustivel_completo BOOLEAN NOT NULL,
     estado_carro VARCHAR(200),
+    km_registro INTEGER,
+    valor_danos NUMERIC(10,2) NOT NULL DEFAULT 0,
     
     FOREIGN KEY (num_locacao) REFERENCES Aluguel(num_locacao),
-    FOREIGN KEY (num_pagamento) REFERENCES Pagamento(num_pagamento)
+    FOREIGN KEY (num_pagamento) REFERENCES Pagamento(num_pagamento),
+    CHECK (km_registro IS NULL OR km_registro >= 0),
+    CHECK (valor_danos >= 0)
 );
 
 -- ============================================
@@ -184,8 +193,664 @@ CREATE TABLE HistoricoAluguel (
     CHECK (cpf ~ '^[0-9]{11}$')
 );
 
+-- ============================================
+-- 14. ÍNDICES SECUNDÁRIOS
+-- (bancos já existentes: migrations/001_indices.sql)
+-- ============================================
+SET search_path TO aluguel, public;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+
+CREATE INDEX idx_aluguel_cliente_retirada ON Aluguel (cpf_cliente, data_retirada DESC);
+CREATE INDEX idx_aluguel_placa ON Aluguel (placa);
+CREATE INDEX idx_aluguel_funcionario_retirada ON Aluguel (num_funcionario, data_retirada);
+CREATE INDEX idx_aluguel_retirada ON Aluguel (data_retirada);
+
+CREATE INDEX idx_carro_status ON Carro (status_carro);
+CREATE INDEX idx_carro_categoria_nome ON Carro (tipo_categoria, nome);
+CREATE INDEX idx_carro_nome_placa ON Carro (nome, placa);
+CREATE INDEX idx_carro_disponivel_nome_placa ON Carro (nome, placa) WHERE status_carro = 'DISPONIVEL';
+CREATE INDEX idx_carro_nome_trgm ON Carro USING gin (nome gin_trgm_ops);
+CREATE INDEX idx_carro_disponivel_modelo ON Carro (lower(nome), placa) WHERE status_carro = 'DISPONIVEL';
+CREATE INDEX idx_carro_disponivel_categoria ON Carro (tipo_categoria, placa) WHERE status_carro = 'DISPONIVEL';
+
+CREATE INDEX idx_manutencao_placa ON Manutencao (placa_carro);
+CREATE INDEX idx_manutencao_aberta ON Manutencao (data_inicio DESC) WHERE data_retorno IS NULL;
+
+CREATE INDEX idx_devolucao_pagamento ON Devolucao (num_pagamento);
+CREATE INDEX idx_multa_pagamento ON Multa (num_pagamento);
+CREATE INDEX idx_desconto_pagamento ON Desconto (num_pagamento);
+
+CREATE INDEX idx_cliente_nome_cpf ON Cliente (nome, cpf);
+CREATE INDEX idx_cliente_nome_trgm ON Cliente USING gin (nome gin_trgm_ops);
+CREATE INDEX idx_funcionario_nome_trgm ON Funcionario USING gin (nome gin_trgm_ops);
+CREATE INDEX idx_funcionario_vendas_nome ON Funcionario (qnt_vendas DESC, nome, num_funcionario);
+
 SET search_path TO aluguel;
 
+-- ============================================
+-- 15. RESUMO POR CLIENTE
+-- Mantido pelos triggers abaixo; leituras de totais
+-- do cliente viram uma busca pela chave primária.
+-- ============================================
+CREATE TABLE ClienteResumo (
+    cpf CHAR(11) PRIMARY KEY,
+    total_alugueis INTEGER NOT NULL DEFAULT 0,
+    alugueis_ativos INTEGER NOT NULL DEFAULT 0,
+    ultimo_aluguel TIMESTAMP,
+    categorias_utilizadas INTEGER NOT NULL DEFAULT 0,
+    acessorios_utilizados INTEGER NOT NULL DEFAULT 0,
+    total_gasto NUMERIC(12,2) NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (cpf) REFERENCES Cliente(cpf) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_cliente_resumo_gasto ON ClienteResumo (total_gasto DESC);
+
+-- Recalcula a linha de um cliente a partir das suas locações
+CREATE FUNCTION atualizar_cliente_resumo(p_cpf CHAR(11)) RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM Cliente WHERE cpf = p_cpf) THEN
+        RETURN;
+    END IF;
+
+    -- serializa recálculos concorrentes do mesmo cliente: quem espera
+    -- pelo lock recalcula já enxergando a transação que terminou
+    PERFORM 1 FROM ClienteResumo WHERE cpf = p_cpf FOR UPDATE;
+
+    INSERT INTO ClienteResumo AS r (cpf, total_alugueis, alugueis_ativos, ultimo_aluguel,
+                                    categorias_utilizadas, acessorios_utilizados, total_gasto, atualizado_em)
+    SELECT
+        p_cpf,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE d.num_locacao IS NULL),
+        MAX(a.data_retirada),
+        COUNT(DISTINCT c.tipo_categoria),
+        (SELECT COUNT(DISTINCT aa.tipo_acessorio)
+           FROM Aluguel a2
+           JOIN Aluguel_Acessorio aa ON aa.num_locacao = a2.num_locacao
+          WHERE a2.cpf_cliente = p_cpf),
+        COALESCE(SUM(COALESCE(p.valor_total, a.valor_previsto)), 0),
+        CURRENT_TIMESTAMP
+    FROM Aluguel a
+    JOIN Carro c ON c.placa = a.placa
+    LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+    LEFT JOIN Pagamento p ON p.num_pagamento = d.num_pagamento
+    WHERE a.cpf_cliente = p_cpf
+    ON CONFLICT (cpf) DO UPDATE SET
+        total_alugueis = EXCLUDED.total_alugueis,
+        alugueis_ativos = EXCLUDED.alugueis_ativos,
+        ultimo_aluguel = EXCLUDED.ultimo_aluguel,
+        categorias_utilizadas = EXCLUDED.categorias_utilizadas,
+        acessorios_utilizados = EXCLUDED.acessorios_utilizados,
+        total_gasto = EXCLUDED.total_gasto,
+        atualizado_em = EXCLUDED.atualizado_em;
+END;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_cliente_resumo() RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO ClienteResumo AS r (cpf, total_alugueis, alugueis_ativos, ultimo_aluguel,
+                                    categorias_utilizadas, acessorios_utilizados, total_gasto, atualizado_em)
+    SELECT
+        cli.cpf,
+        COALESCE(al.total_alugueis, 0),
+        COALESCE(al.alugueis_ativos, 0),
+        al.ultimo_aluguel,
+        COALESCE(al.categorias_utilizadas, 0),
+        COALESCE(ac.acessorios_utilizados, 0),
+        COALESCE(al.total_gasto, 0),
+        CURRENT_TIMESTAMP
+    FROM Cliente cli
+    LEFT JOIN (
+        SELECT
+            a.cpf_cliente,
+            COUNT(*) AS total_alugueis,
+            COUNT(*) FILTER (WHERE d.num_locacao IS NULL) AS alugueis_ativos,
+            MAX(a.data_retirada) AS ultimo_aluguel,
+            COUNT(DISTINCT c.tipo_categoria) AS categorias_utilizadas,
+            SUM(COALESCE(p.valor_total, a.valor_previsto)) AS total_gasto
+        FROM Aluguel a
+        JOIN Carro c ON c.placa = a.placa
+        LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+        LEFT JOIN Pagamento p ON p.num_pagamento = d.num_pagamento
+        GROUP BY a.cpf_cliente
+    ) al ON al.cpf_cliente = cli.cpf
+    LEFT JOIN (
+        SELECT a.cpf_cliente, COUNT(DISTINCT aa.tipo_acessorio) AS acessorios_utilizados
+        FROM Aluguel a
+        JOIN Aluguel_Acessorio aa ON aa.num_locacao = a.num_locacao
+        GROUP BY a.cpf_cliente
+    ) ac ON ac.cpf_cliente = cli.cpf
+    ON CONFLICT (cpf) DO UPDATE SET
+        total_alugueis = EXCLUDED.total_alugueis,
+        alugueis_ativos = EXCLUDED.alugueis_ativos,
+        ultimo_aluguel = EXCLUDED.ultimo_aluguel,
+        categorias_utilizadas = EXCLUDED.categorias_utilizadas,
+        acessorios_utilizados = EXCLUDED.acessorios_utilizados,
+        total_gasto = EXCLUDED.total_gasto,
+        atualizado_em = EXCLUDED.atualizado_em;
+$$;
+
+CREATE FUNCTION trg_resumo_cliente() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO ClienteResumo (cpf) VALUES (NEW.cpf) ON CONFLICT (cpf) DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION trg_resumo_aluguel() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM atualizar_cliente_resumo(NEW.cpf_cliente);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM atualizar_cliente_resumo(OLD.cpf_cliente);
+    ELSE
+        PERFORM atualizar_cliente_resumo(NEW.cpf_cliente);
+        IF OLD.cpf_cliente <> NEW.cpf_cliente THEN
+            PERFORM atualizar_cliente_resumo(OLD.cpf_cliente);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Aluguel_Acessorio e Devolucao: cliente obtido pela locação
+CREATE FUNCTION trg_resumo_locacao() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_locacao INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        v_locacao := OLD.num_locacao;
+    ELSE
+        v_locacao := NEW.num_locacao;
+    END IF;
+    PERFORM atualizar_cliente_resumo(a.cpf_cliente)
+    FROM Aluguel a
+    WHERE a.num_locacao = v_locacao;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION trg_resumo_pagamento() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM atualizar_cliente_resumo(a.cpf_cliente)
+    FROM Devolucao d
+    JOIN Aluguel a ON a.num_locacao = d.num_locacao
+    WHERE d.num_pagamento = NEW.num_pagamento;
+    RETURN NULL;
+END;
+$$;
+
+-- Troca de categoria de um carro muda as categorias de quem já o alugou
+CREATE FUNCTION trg_resumo_carro() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM atualizar_cliente_resumo(x.cpf_cliente)
+    FROM (SELECT DISTINCT cpf_cliente FROM Aluguel WHERE placa = NEW.placa) x;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER resumo_cliente AFTER INSERT ON Cliente
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_cliente();
+CREATE TRIGGER resumo_aluguel AFTER INSERT OR DELETE OR UPDATE OF cpf_cliente, placa, data_retirada, valor_previsto ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_aluguel();
+CREATE TRIGGER resumo_aluguel_acessorio AFTER INSERT OR DELETE ON Aluguel_Acessorio
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_locacao();
+CREATE TRIGGER resumo_devolucao AFTER INSERT OR DELETE OR UPDATE OF num_pagamento ON Devolucao
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_locacao();
+CREATE TRIGGER resumo_pagamento AFTER UPDATE OF valor_total ON Pagamento
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_pagamento();
+CREATE TRIGGER resumo_carro AFTER UPDATE OF tipo_categoria ON Carro
+    FOR EACH ROW WHEN (OLD.tipo_categoria IS DISTINCT FROM NEW.tipo_categoria)
+    EXECUTE FUNCTION trg_resumo_carro();
+
+-- ============================================
+-- 16. CONTADORES DA FROTA
+-- Quantidade e quilometragem por categoria/status/ano,
+-- ajustadas por trigger a cada mudança em Carro.
+-- Cada grupo é dividido em 8 fatias (pela placa) para
+-- que locações simultâneas não disputem a mesma linha.
+-- ============================================
+CREATE TABLE FrotaResumo (
+    tipo_categoria VARCHAR(50) NOT NULL,
+    status_carro VARCHAR(20) NOT NULL,
+    ano INTEGER NOT NULL,
+    fatia SMALLINT NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    soma_km BIGINT NOT NULL DEFAULT 0,
+    qtd_com_km INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (tipo_categoria, status_carro, ano, fatia)
+);
+
+CREATE FUNCTION ajustar_frota_resumo(p_placa VARCHAR, p_categoria VARCHAR, p_status VARCHAR,
+                                     p_ano INTEGER, p_km INTEGER, p_delta INTEGER) RETURNS VOID
+LANGUAGE sql AS $$
+    -- status nulo fica em '' (conta no total, em nenhum status)
+    INSERT INTO FrotaResumo AS f (tipo_categoria, status_carro, ano, fatia, quantidade, soma_km, qtd_com_km)
+    VALUES (
+        p_categoria,
+        COALESCE(p_status, ''),
+        p_ano,
+        (hashtext(p_placa) & 7)::smallint,
+        p_delta,
+        p_delta * COALESCE(p_km, 0),
+        CASE WHEN p_km IS NULL THEN 0 ELSE p_delta END
+    )
+    ON CONFLICT (tipo_categoria, status_carro, ano, fatia) DO UPDATE SET
+        quantidade = f.quantidade + EXCLUDED.quantidade,
+        soma_km = f.soma_km + EXCLUDED.soma_km,
+        qtd_com_km = f.qtd_com_km + EXCLUDED.qtd_com_km;
+$$;
+
+CREATE FUNCTION recalcular_frota_resumo() RETURNS VOID
+LANGUAGE sql AS $$
+    LOCK TABLE Carro IN SHARE MODE;
+    DELETE FROM FrotaResumo;
+    INSERT INTO FrotaResumo (tipo_categoria, status_carro, ano, fatia, quantidade, soma_km, qtd_com_km)
+    SELECT
+        tipo_categoria,
+        COALESCE(status_carro, ''),
+        ano,
+        (hashtext(placa) & 7)::smallint,
+        COUNT(*),
+        COALESCE(SUM(quilometragem), 0),
+        COUNT(quilometragem)
+    FROM Carro
+    GROUP BY 1, 2, 3, 4;
+$$;
+
+CREATE FUNCTION trg_frota_resumo() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM ajustar_frota_resumo(NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem, 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM ajustar_frota_resumo(OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem, -1);
+    -- duas linhas do resumo: sempre na mesma ordem de chave, para que
+    -- transações que movem carros em sentidos opostos não entrem em deadlock
+    ELSIF (OLD.tipo_categoria, COALESCE(OLD.status_carro, ''), OLD.ano, hashtext(OLD.placa) & 7)
+        < (NEW.tipo_categoria, COALESCE(NEW.status_carro, ''), NEW.ano, hashtext(NEW.placa) & 7) THEN
+        PERFORM ajustar_frota_resumo(OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem, -1);
+        PERFORM ajustar_frota_resumo(NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem, 1);
+    ELSE
+        PERFORM ajustar_frota_resumo(NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem, 1);
+        PERFORM ajustar_frota_resumo(OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER frota_resumo AFTER INSERT OR DELETE ON Carro
+    FOR EACH ROW EXECUTE FUNCTION trg_frota_resumo();
+CREATE TRIGGER frota_resumo_update AFTER UPDATE OF placa, tipo_categoria, status_carro, ano, quilometragem ON Carro
+    FOR EACH ROW
+    WHEN ((OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem)
+          IS DISTINCT FROM (NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem))
+    EXECUTE FUNCTION trg_frota_resumo();
+
+-- ============================================
+-- 17. AGENDA DOS CARROS
+-- Períodos ocupados por locação ou manutenção, mantidos
+-- por trigger, para consultas de disponibilidade por data.
+-- Locação devolvida: [retirada, devolução real)
+-- Locação em aberto: [retirada, devolução prevista)
+-- Manutenção: [início, retorno), sem fim enquanto aberta
+-- ============================================
+CREATE TABLE AgendaCarro (
+    origem VARCHAR(10) NOT NULL,
+    referencia INTEGER NOT NULL,
+    placa VARCHAR(10) NOT NULL,
+    periodo TSRANGE NOT NULL,
+    em_aberto BOOLEAN NOT NULL DEFAULT FALSE,
+
+    PRIMARY KEY (origem, referencia),
+    CHECK (origem IN ('ALUGUEL','MANUTENCAO'))
+);
+
+CREATE INDEX idx_agenda_periodo ON AgendaCarro USING gist (periodo);
+CREATE INDEX idx_agenda_aberta_fim ON AgendaCarro (upper(periodo)) WHERE em_aberto;
+
+CREATE FUNCTION sincronizar_agenda_aluguel(p_locacao INTEGER) RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO AgendaCarro AS ag (origem, referencia, placa, periodo, em_aberto)
+    SELECT
+        'ALUGUEL',
+        a.num_locacao,
+        a.placa,
+        tsrange(a.data_retirada,
+                GREATEST(a.data_retirada, COALESCE(d.data_real_devolucao, a.data_prevista_devolucao))),
+        d.num_locacao IS NULL
+    FROM Aluguel a
+    LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+    WHERE a.num_locacao = p_locacao
+    ON CONFLICT (origem, referencia) DO UPDATE SET
+        placa = EXCLUDED.placa,
+        periodo = EXCLUDED.periodo,
+        em_aberto = EXCLUDED.em_aberto;
+
+    IF NOT FOUND THEN
+        DELETE FROM AgendaCarro WHERE origem = 'ALUGUEL' AND referencia = p_locacao;
+    END IF;
+END;
+$$;
+
+CREATE FUNCTION sincronizar_agenda_manutencao(p_manutencao INTEGER) RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO AgendaCarro AS ag (origem, referencia, placa, periodo, em_aberto)
+    SELECT
+        'MANUTENCAO',
+        m.num_manutencao,
+        m.placa_carro,
+        tsrange(COALESCE(m.data_inicio, CURRENT_DATE)::timestamp,
+                CASE WHEN m.data_retorno IS NOT NULL
+                     THEN GREATEST(COALESCE(m.data_inicio, CURRENT_DATE), m.data_retorno)::timestamp
+                END),
+        FALSE
+    FROM Manutencao m
+    WHERE m.num_manutencao = p_manutencao
+    ON CONFLICT (origem, referencia) DO UPDATE SET
+        placa = EXCLUDED.placa,
+        periodo = EXCLUDED.periodo;
+
+    IF NOT FOUND THEN
+        DELETE FROM AgendaCarro WHERE origem = 'MANUTENCAO' AND referencia = p_manutencao;
+    END IF;
+END;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_agenda_carro() RETURNS VOID
+LANGUAGE sql AS $$
+    DELETE FROM AgendaCarro;
+    INSERT INTO AgendaCarro (origem, referencia, placa, periodo, em_aberto)
+    SELECT
+        'ALUGUEL',
+        a.num_locacao,
+        a.placa,
+        tsrange(a.data_retirada,
+                GREATEST(a.data_retirada, COALESCE(d.data_real_devolucao, a.data_prevista_devolucao))),
+        d.num_locacao IS NULL
+    FROM Aluguel a
+    LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+    UNION ALL
+    SELECT
+        'MANUTENCAO',
+        m.num_manutencao,
+        m.placa_carro,
+        tsrange(COALESCE(m.data_inicio, CURRENT_DATE)::timestamp,
+                CASE WHEN m.data_retorno IS NOT NULL
+                     THEN GREATEST(COALESCE(m.data_inicio, CURRENT_DATE), m.data_retorno)::timestamp
+                END),
+        FALSE
+    FROM Manutencao m;
+$$;
+
+-- Aluguel e Devolucao: sincroniza pela locação
+CREATE FUNCTION trg_agenda_aluguel() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM sincronizar_agenda_aluguel(OLD.num_locacao);
+    ELSE
+        PERFORM sincronizar_agenda_aluguel(NEW.num_locacao);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION trg_agenda_manutencao() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM sincronizar_agenda_manutencao(OLD.num_manutencao);
+    ELSE
+        PERFORM sincronizar_agenda_manutencao(NEW.num_manutencao);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER agenda_aluguel AFTER INSERT OR DELETE OR UPDATE OF placa, data_retirada, data_prevista_devolucao ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_agenda_aluguel();
+CREATE TRIGGER agenda_devolucao AFTER INSERT OR DELETE OR UPDATE OF data_real_devolucao ON Devolucao
+    FOR EACH ROW EXECUTE FUNCTION trg_agenda_aluguel();
+CREATE TRIGGER agenda_manutencao AFTER INSERT OR DELETE OR UPDATE OF placa_carro, data_inicio, data_retorno ON Manutencao
+    FOR EACH ROW EXECUTE FUNCTION trg_agenda_manutencao();
+
+-- ============================================
+-- 18. VERSÃO DAS TABELAS (ETag dos catálogos)
+-- A versão de uma tabela é a soma das suas fatias em
+-- VersaoTabela. Cada transação que altera a tabela soma 1 na
+-- fatia da sua sessão (pg_backend_pid() % 16) no COMMIT, por
+-- um trigger de constraint adiado: a nova versão fica visível
+-- junto com os dados, nunca antes, e a soma muda a cada COMMIT.
+-- Sessões diferentes quase sempre caem em fatias diferentes e
+-- não esperam umas pelas outras; na mesma fatia a espera dura
+-- só o fim do COMMIT. Um trigger por comando anota as tabelas
+-- alteradas e o primeiro trigger adiado grava todas num só
+-- INSERT em ORDER BY tabela: transações que mexem em carro e
+-- agendacarro (reserva, devolução) travam as linhas sempre na
+-- mesma ordem, sem deadlock.
+-- ============================================
+CREATE TABLE VersaoTabela (
+    tabela VARCHAR(50) NOT NULL,
+    fatia SMALLINT NOT NULL DEFAULT 0,
+    versao BIGINT NOT NULL DEFAULT 0,
+    modificado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (tabela, fatia)
+);
+
+-- por comando, na hora: só anota a tabela na transação (sem trava)
+CREATE FUNCTION trg_versao_pendente() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    alteradas TEXT := NULLIF(current_setting('carcompany.versao_alteradas', true), '');
+BEGIN
+    IF alteradas IS NULL OR NOT lower(TG_TABLE_NAME) = ANY (string_to_array(alteradas, ',')) THEN
+        PERFORM set_config('carcompany.versao_alteradas', concat_ws(',', alteradas, lower(TG_TABLE_NAME)), true);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- no COMMIT (por linha) ou no TRUNCATE: grava de uma vez as tabelas ainda não gravadas
+CREATE FUNCTION trg_versao_tabela() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    alteradas TEXT := NULLIF(current_setting('carcompany.versao_alteradas', true), '');
+    gravadas TEXT := NULLIF(current_setting('carcompany.versao_gravadas', true), '');
+    novas TEXT[];
+BEGIN
+    -- demais linhas da transação: tudo já gravado
+    IF alteradas IS NOT DISTINCT FROM gravadas AND lower(TG_TABLE_NAME) = ANY (string_to_array(gravadas, ',')) THEN
+        RETURN NULL;
+    END IF;
+    novas := ARRAY(
+        SELECT DISTINCT t
+        FROM unnest(string_to_array(alteradas, ',') || lower(TG_TABLE_NAME)::text) AS t
+        WHERE t <> ALL (COALESCE(string_to_array(gravadas, ','), '{}'))
+        ORDER BY t
+    );
+    IF cardinality(novas) = 0 THEN
+        RETURN NULL;
+    END IF;
+    gravadas := concat_ws(',', gravadas, array_to_string(novas, ','));
+    PERFORM set_config('carcompany.versao_alteradas', gravadas, true);
+    PERFORM set_config('carcompany.versao_gravadas', gravadas, true);
+
+    INSERT INTO VersaoTabela AS v (tabela, fatia, versao, modificado_em)
+    SELECT t, pg_backend_pid() % 16, 1, clock_timestamp()
+    FROM unnest(novas) AS t
+    ORDER BY t
+    ON CONFLICT (tabela, fatia) DO UPDATE SET
+        versao = v.versao + 1,
+        modificado_em = EXCLUDED.modificado_em;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER versao_carro_pendente AFTER INSERT OR UPDATE OR DELETE ON Carro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_pendente();
+CREATE TRIGGER versao_categoria_pendente AFTER INSERT OR UPDATE OR DELETE ON Categoria
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_pendente();
+CREATE TRIGGER versao_agendacarro_pendente AFTER INSERT OR UPDATE OR DELETE ON AgendaCarro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_pendente();
+CREATE CONSTRAINT TRIGGER versao_carro AFTER INSERT OR UPDATE OR DELETE ON Carro
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+CREATE CONSTRAINT TRIGGER versao_categoria AFTER INSERT OR UPDATE OR DELETE ON Categoria
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+CREATE CONSTRAINT TRIGGER versao_agendacarro AFTER INSERT OR UPDATE OR DELETE ON AgendaCarro
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+-- TRUNCATE não tem trigger por linha; é raro, avança na hora
+CREATE TRIGGER versao_carro_truncate AFTER TRUNCATE ON Carro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_categoria_truncate AFTER TRUNCATE ON Categoria
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_agendacarro_truncate AFTER TRUNCATE ON AgendaCarro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+
+-- ============================================
+-- 19. RESUMO POR FUNCIONÁRIO
+-- Locações e valor vendido por funcionário, ajustados por
+-- trigger a cada mudança em Aluguel (ranking e perfil).
+-- ============================================
+CREATE TABLE FuncionarioResumo (
+    num_funcionario INTEGER PRIMARY KEY,
+    total_alugueis INTEGER NOT NULL DEFAULT 0,
+    valor_total_vendas NUMERIC(14,2) NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (num_funcionario) REFERENCES Funcionario(num_funcionario) ON DELETE CASCADE
+);
+
+CREATE FUNCTION ajustar_funcionario_resumo(p_funcionario INTEGER, p_alugueis INTEGER, p_valor NUMERIC) RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO FuncionarioResumo AS f (num_funcionario, total_alugueis, valor_total_vendas)
+    VALUES (p_funcionario, p_alugueis, COALESCE(p_valor, 0))
+    ON CONFLICT (num_funcionario) DO UPDATE SET
+        total_alugueis = f.total_alugueis + EXCLUDED.total_alugueis,
+        valor_total_vendas = f.valor_total_vendas + EXCLUDED.valor_total_vendas;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_funcionario_resumo() RETURNS VOID
+LANGUAGE sql AS $$
+    LOCK TABLE Aluguel IN SHARE MODE;
+    DELETE FROM FuncionarioResumo;
+    INSERT INTO FuncionarioResumo (num_funcionario, total_alugueis, valor_total_vendas)
+    SELECT num_funcionario, COUNT(*), COALESCE(SUM(valor_previsto), 0)
+    FROM Aluguel
+    GROUP BY num_funcionario;
+$$;
+
+CREATE FUNCTION trg_funcionario_resumo() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM ajustar_funcionario_resumo(OLD.num_funcionario, -1, -OLD.valor_previsto);
+    ELSIF OLD.num_funcionario = NEW.num_funcionario THEN
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 0,
+                                           COALESCE(NEW.valor_previsto, 0) - COALESCE(OLD.valor_previsto, 0));
+    -- locação trocada de funcionário: duas linhas, sempre em ordem de chave
+    -- (mesmo cuidado contra deadlock do trg_frota_resumo)
+    ELSIF OLD.num_funcionario < NEW.num_funcionario THEN
+        PERFORM ajustar_funcionario_resumo(OLD.num_funcionario, -1, -OLD.valor_previsto);
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSE
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 1, NEW.valor_previsto);
+        PERFORM ajustar_funcionario_resumo(OLD.num_funcionario, -1, -OLD.valor_previsto);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER funcionario_resumo AFTER INSERT OR DELETE ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_funcionario_resumo();
+CREATE TRIGGER funcionario_resumo_update AFTER UPDATE OF num_funcionario, valor_previsto ON Aluguel
+    FOR EACH ROW
+    WHEN ((OLD.num_funcionario, OLD.valor_previsto) IS DISTINCT FROM (NEW.num_funcionario, NEW.valor_previsto))
+    EXECUTE FUNCTION trg_funcionario_resumo();
+
+-- ============================================
+-- 20. VENDAS MENSAIS POR FUNCIONÁRIO
+-- Locações e valor por (mês de retirada, funcionário),
+-- ajustados por trigger em Aluguel. Painéis mensais leem
+-- poucas linhas por mês em vez de varrer o histórico.
+-- ============================================
+CREATE TABLE VendasMensais (
+    mes DATE NOT NULL,
+    num_funcionario INTEGER NOT NULL,
+    total_alugueis INTEGER NOT NULL DEFAULT 0,
+    valor_total NUMERIC(14,2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (mes, num_funcionario),
+    FOREIGN KEY (num_funcionario) REFERENCES Funcionario(num_funcionario) ON DELETE CASCADE,
+    CHECK (mes = date_trunc('month', mes)::date)
+);
+
+CREATE FUNCTION ajustar_vendas_mensais(p_retirada TIMESTAMP, p_funcionario INTEGER,
+                                       p_alugueis INTEGER, p_valor NUMERIC) RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO VendasMensais AS v (mes, num_funcionario, total_alugueis, valor_total)
+    VALUES (date_trunc('month', p_retirada)::date, p_funcionario, p_alugueis, COALESCE(p_valor, 0))
+    ON CONFLICT (mes, num_funcionario) DO UPDATE SET
+        total_alugueis = v.total_alugueis + EXCLUDED.total_alugueis,
+        valor_total = v.valor_total + EXCLUDED.valor_total;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_vendas_mensais() RETURNS VOID
+LANGUAGE sql AS $$
+    LOCK TABLE Aluguel IN SHARE MODE;
+    DELETE FROM VendasMensais;
+    INSERT INTO VendasMensais (mes, num_funcionario, total_alugueis, valor_total)
+    SELECT date_trunc('month', data_retirada)::date, num_funcionario, COUNT(*), COALESCE(SUM(valor_previsto), 0)
+    FROM Aluguel
+    GROUP BY 1, 2;
+$$;
+
+CREATE FUNCTION trg_vendas_mensais() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM ajustar_vendas_mensais(NEW.data_retirada, NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM ajustar_vendas_mensais(OLD.data_retirada, OLD.num_funcionario, -1, -OLD.valor_previsto);
+    -- duas linhas (ou a mesma duas vezes): sempre em ordem de chave,
+    -- como em trg_frota_resumo
+    ELSIF (date_trunc('month', OLD.data_retirada), OLD.num_funcionario)
+        < (date_trunc('month', NEW.data_retirada), NEW.num_funcionario) THEN
+        PERFORM ajustar_vendas_mensais(OLD.data_retirada, OLD.num_funcionario, -1, -OLD.valor_previsto);
+        PERFORM ajustar_vendas_mensais(NEW.data_retirada, NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSE
+        PERFORM ajustar_vendas_mensais(NEW.data_retirada, NEW.num_funcionario, 1, NEW.valor_previsto);
+        PERFORM ajustar_vendas_mensais(OLD.data_retirada, OLD.num_funcionario, -1, -OLD.valor_previsto);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER vendas_mensais AFTER INSERT OR DELETE ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_vendas_mensais();
+CREATE TRIGGER vendas_mensais_update AFTER UPDATE OF data_retirada, num_funcionario, valor_previsto ON Aluguel
+    FOR EACH ROW
+    WHEN ((OLD.data_retirada, OLD.num_funcionario, OLD.valor_previsto)
+          IS DISTINCT FROM (NEW.data_retirada, NEW.num_funcionario, NEW.valor_previsto))
+    EXECUTE FUNCTION trg_vendas_mensais();
+
 -- ============================================
 -- 1. CATEGORIA (Tipos fixos)
 -- ============================================
@@ -0,0 +1,59 @@
+-- ============================================
+-- MIGRAÇÃO 001: índices secundários
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- CREATE INDEX CONCURRENTLY não roda dentro de transação:
+-- execute com psql sem BEGIN/COMMIT (psql -f migrations/001_indices.sql).
+-- ============================================
+SET search_path TO aluguel, public;
+
+-- ILIKE '%termo%' em buscar_por_nome / buscar_funcionarios_por_nome / placas por modelo
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+
+-- ALUGUEL: histórico por cliente (ORDER BY data_retirada DESC), carro e funcionário
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluguel_cliente_retirada
+    ON Aluguel (cpf_cliente, data_retirada DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluguel_placa
+    ON Aluguel (placa);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluguel_funcionario_retirada
+    ON Aluguel (num_funcionario, data_retirada);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluguel_retirada
+    ON Aluguel (data_retirada);
+
+-- CARRO: filtros por status/categoria, listagens ordenadas por nome
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_status
+    ON Carro (status_carro);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_categoria_nome
+    ON Carro (tipo_categoria, nome);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_disponivel_nome
+    ON Carro (nome) WHERE status_carro = 'DISPONIVEL';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_nome_trgm
+    ON Carro USING gin (nome gin_trgm_ops);
+
+-- MANUTENCAO: por carro e manutenções em aberto
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_manutencao_placa
+    ON Manutencao (placa_carro);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_manutencao_aberta
+    ON Manutencao (data_inicio DESC) WHERE data_retorno IS NULL;
+
+-- PAGAMENTO -> DEVOLUCAO / MULTA / DESCONTO
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_devolucao_pagamento
+    ON Devolucao (num_pagamento);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_multa_pagamento
+    ON Multa (num_pagamento);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_desconto_pagamento
+    ON Desconto (num_pagamento);
+
+-- Busca por parte do nome
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cliente_nome_trgm
+    ON Cliente USING gin (nome gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_funcionario_nome_trgm
+    ON Funcionario USING gin (nome gin_trgm_ops);
+
+ANALYZE Aluguel;
+ANALYZE Carro;
+ANALYZE Manutencao;
+ANALYZE Devolucao;
+ANALYZE Multa;
+ANALYZE Desconto;
+ANALYZE Cliente;
+ANALYZE Funcionario;
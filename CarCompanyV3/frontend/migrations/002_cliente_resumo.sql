@@ -0,0 +1,195 @@
+-- ============================================
+-- MIGRAÇÃO 002: resumo por cliente (ClienteResumo)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Cria tabela, funções e triggers e preenche o resumo
+-- a partir do histórico existente, tudo em uma transação.
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+CREATE TABLE ClienteResumo (
+    cpf CHAR(11) PRIMARY KEY,
+    total_alugueis INTEGER NOT NULL DEFAULT 0,
+    alugueis_ativos INTEGER NOT NULL DEFAULT 0,
+    ultimo_aluguel TIMESTAMP,
+    categorias_utilizadas INTEGER NOT NULL DEFAULT 0,
+    acessorios_utilizados INTEGER NOT NULL DEFAULT 0,
+    total_gasto NUMERIC(12,2) NOT NULL DEFAULT 0,
+    atualizado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (cpf) REFERENCES Cliente(cpf) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_cliente_resumo_gasto ON ClienteResumo (total_gasto DESC);
+
+-- Recalcula a linha de um cliente a partir das suas locações
+CREATE FUNCTION atualizar_cliente_resumo(p_cpf CHAR(11)) RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM Cliente WHERE cpf = p_cpf) THEN
+        RETURN;
+    END IF;
+
+    -- serializa recálculos concorrentes do mesmo cliente: quem espera
+    -- pelo lock recalcula já enxergando a transação que terminou
+    PERFORM 1 FROM ClienteResumo WHERE cpf = p_cpf FOR UPDATE;
+
+    INSERT INTO ClienteResumo AS r (cpf, total_alugueis, alugueis_ativos, ultimo_aluguel,
+                                    categorias_utilizadas, acessorios_utilizados, total_gasto, atualizado_em)
+    SELECT
+        p_cpf,
+        COUNT(*),
+        COUNT(*) FILTER (WHERE d.num_locacao IS NULL),
+        MAX(a.data_retirada),
+        COUNT(DISTINCT c.tipo_categoria),
+        (SELECT COUNT(DISTINCT aa.tipo_acessorio)
+           FROM Aluguel a2
+           JOIN Aluguel_Acessorio aa ON aa.num_locacao = a2.num_locacao
+          WHERE a2.cpf_cliente = p_cpf),
+        COALESCE(SUM(COALESCE(p.valor_total, a.valor_previsto)), 0),
+        CURRENT_TIMESTAMP
+    FROM Aluguel a
+    JOIN Carro c ON c.placa = a.placa
+    LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+    LEFT JOIN Pagamento p ON p.num_pagamento = d.num_pagamento
+    WHERE a.cpf_cliente = p_cpf
+    ON CONFLICT (cpf) DO UPDATE SET
+        total_alugueis = EXCLUDED.total_alugueis,
+        alugueis_ativos = EXCLUDED.alugueis_ativos,
+        ultimo_aluguel = EXCLUDED.ultimo_aluguel,
+        categorias_utilizadas = EXCLUDED.categorias_utilizadas,
+        acessorios_utilizados = EXCLUDED.acessorios_utilizados,
+        total_gasto = EXCLUDED.total_gasto,
+        atualizado_em = EXCLUDED.atualizado_em;
+END;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_cliente_resumo() RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO ClienteResumo AS r (cpf, total_alugueis, alugueis_ativos, ultimo_aluguel,
+                                    categorias_utilizadas, acessorios_utilizados, total_gasto, atualizado_em)
+    SELECT
+        cli.cpf,
+        COALESCE(al.total_alugueis, 0),
+        COALESCE(al.alugueis_ativos, 0),
+        al.ultimo_aluguel,
+        COALESCE(al.categorias_utilizadas, 0),
+        COALESCE(ac.acessorios_utilizados, 0),
+        COALESCE(al.total_gasto, 0),
+        CURRENT_TIMESTAMP
+    FROM Cliente cli
+    LEFT JOIN (
+        SELECT
+            a.cpf_cliente,
+            COUNT(*) AS total_alugueis,
+            COUNT(*) FILTER (WHERE d.num_locacao IS NULL) AS alugueis_ativos,
+            MAX(a.data_retirada) AS ultimo_aluguel,
+            COUNT(DISTINCT c.tipo_categoria) AS categorias_utilizadas,
+            SUM(COALESCE(p.valor_total, a.valor_previsto)) AS total_gasto
+        FROM Aluguel a
+        JOIN Carro c ON c.placa = a.placa
+        LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+        LEFT JOIN Pagamento p ON p.num_pagamento = d.num_pagamento
+        GROUP BY a.cpf_cliente
+    ) al ON al.cpf_cliente = cli.cpf
+    LEFT JOIN (
+        SELECT a.cpf_cliente, COUNT(DISTINCT aa.tipo_acessorio) AS acessorios_utilizados
+        FROM Aluguel a
+        JOIN Aluguel_Acessorio aa ON aa.num_locacao = a.num_locacao
+        GROUP BY a.cpf_cliente
+    ) ac ON ac.cpf_cliente = cli.cpf
+    ON CONFLICT (cpf) DO UPDATE SET
+        total_alugueis = EXCLUDED.total_alugueis,
+        alugueis_ativos = EXCLUDED.alugueis_ativos,
+        ultimo_aluguel = EXCLUDED.ultimo_aluguel,
+        categorias_utilizadas = EXCLUDED.categorias_utilizadas,
+        acessorios_utilizados = EXCLUDED.acessorios_utilizados,
+        total_gasto = EXCLUDED.total_gasto,
+        atualizado_em = EXCLUDED.atualizado_em;
+$$;
+
+CREATE FUNCTION trg_resumo_cliente() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO ClienteResumo (cpf) VALUES (NEW.cpf) ON CONFLICT (cpf) DO NOTHING;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION trg_resumo_aluguel() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM atualizar_cliente_resumo(NEW.cpf_cliente);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM atualizar_cliente_resumo(OLD.cpf_cliente);
+    ELSE
+        PERFORM atualizar_cliente_resumo(NEW.cpf_cliente);
+        IF OLD.cpf_cliente <> NEW.cpf_cliente THEN
+            PERFORM atualizar_cliente_resumo(OLD.cpf_cliente);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Aluguel_Acessorio e Devolucao: cliente obtido pela locação
+CREATE FUNCTION trg_resumo_locacao() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_locacao INTEGER;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        v_locacao := OLD.num_locacao;
+    ELSE
+        v_locacao := NEW.num_locacao;
+    END IF;
+    PERFORM atualizar_cliente_resumo(a.cpf_cliente)
+    FROM Aluguel a
+    WHERE a.num_locacao = v_locacao;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION trg_resumo_pagamento() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM atualizar_cliente_resumo(a.cpf_cliente)
+    FROM Devolucao d
+    JOIN Aluguel a ON a.num_locacao = d.num_locacao
+    WHERE d.num_pagamento = NEW.num_pagamento;
+    RETURN NULL;
+END;
+$$;
+
+-- Troca de categoria de um carro muda as categorias de quem já o alugou
+CREATE FUNCTION trg_resumo_carro() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM atualizar_cliente_resumo(x.cpf_cliente)
+    FROM (SELECT DISTINCT cpf_cliente FROM Aluguel WHERE placa = NEW.placa) x;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER resumo_cliente AFTER INSERT ON Cliente
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_cliente();
+CREATE TRIGGER resumo_aluguel AFTER INSERT OR DELETE OR UPDATE OF cpf_cliente, placa, data_retirada, valor_previsto ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_aluguel();
+CREATE TRIGGER resumo_aluguel_acessorio AFTER INSERT OR DELETE ON Aluguel_Acessorio
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_locacao();
+CREATE TRIGGER resumo_devolucao AFTER INSERT OR DELETE OR UPDATE OF num_pagamento ON Devolucao
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_locacao();
+CREATE TRIGGER resumo_pagamento AFTER UPDATE OF valor_total ON Pagamento
+    FOR EACH ROW EXECUTE FUNCTION trg_resumo_pagamento();
+CREATE TRIGGER resumo_carro AFTER UPDATE OF tipo_categoria ON Carro
+    FOR EACH ROW WHEN (OLD.tipo_categoria IS DISTINCT FROM NEW.tipo_categoria)
+    EXECUTE FUNCTION trg_resumo_carro();
+
+SELECT recalcular_cliente_resumo();
+
+COMMIT;
+
+ANALYZE ClienteResumo;
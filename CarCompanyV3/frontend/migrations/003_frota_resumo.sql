@@ -0,0 +1,93 @@
+-- ============================================
+-- MIGRAÇÃO 003: contadores da frota (FrotaResumo)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Cria tabela, funções e triggers e preenche os contadores
+-- a partir de Carro, tudo em uma transação.
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+CREATE TABLE FrotaResumo (
+    tipo_categoria VARCHAR(50) NOT NULL,
+    status_carro VARCHAR(20) NOT NULL,
+    ano INTEGER NOT NULL,
+    fatia SMALLINT NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    soma_km BIGINT NOT NULL DEFAULT 0,
+    qtd_com_km INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (tipo_categoria, status_carro, ano, fatia)
+);
+
+CREATE FUNCTION ajustar_frota_resumo(p_placa VARCHAR, p_categoria VARCHAR, p_status VARCHAR,
+                                     p_ano INTEGER, p_km INTEGER, p_delta INTEGER) RETURNS VOID
+LANGUAGE sql AS $$
+    -- status nulo fica em '' (conta no total, em nenhum status)
+    INSERT INTO FrotaResumo AS f (tipo_categoria, status_carro, ano, fatia, quantidade, soma_km, qtd_com_km)
+    VALUES (
+        p_categoria,
+        COALESCE(p_status, ''),
+        p_ano,
+        (hashtext(p_placa) & 7)::smallint,
+        p_delta,
+        p_delta * COALESCE(p_km, 0),
+        CASE WHEN p_km IS NULL THEN 0 ELSE p_delta END
+    )
+    ON CONFLICT (tipo_categoria, status_carro, ano, fatia) DO UPDATE SET
+        quantidade = f.quantidade + EXCLUDED.quantidade,
+        soma_km = f.soma_km + EXCLUDED.soma_km,
+        qtd_com_km = f.qtd_com_km + EXCLUDED.qtd_com_km;
+$$;
+
+CREATE FUNCTION recalcular_frota_resumo() RETURNS VOID
+LANGUAGE sql AS $$
+    LOCK TABLE Carro IN SHARE MODE;
+    DELETE FROM FrotaResumo;
+    INSERT INTO FrotaResumo (tipo_categoria, status_carro, ano, fatia, quantidade, soma_km, qtd_com_km)
+    SELECT
+        tipo_categoria,
+        COALESCE(status_carro, ''),
+        ano,
+        (hashtext(placa) & 7)::smallint,
+        COUNT(*),
+        COALESCE(SUM(quilometragem), 0),
+        COUNT(quilometragem)
+    FROM Carro
+    GROUP BY 1, 2, 3, 4;
+$$;
+
+CREATE FUNCTION trg_frota_resumo() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM ajustar_frota_resumo(NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem, 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM ajustar_frota_resumo(OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem, -1);
+    -- duas linhas do resumo: sempre na mesma ordem de chave, para que
+    -- transações que movem carros em sentidos opostos não entrem em deadlock
+    ELSIF (OLD.tipo_categoria, COALESCE(OLD.status_carro, ''), OLD.ano, hashtext(OLD.placa) & 7)
+        < (NEW.tipo_categoria, COALESCE(NEW.status_carro, ''), NEW.ano, hashtext(NEW.placa) & 7) THEN
+        PERFORM ajustar_frota_resumo(OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem, -1);
+        PERFORM ajustar_frota_resumo(NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem, 1);
+    ELSE
+        PERFORM ajustar_frota_resumo(NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem, 1);
+        PERFORM ajustar_frota_resumo(OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem, -1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER frota_resumo AFTER INSERT OR DELETE ON Carro
+    FOR EACH ROW EXECUTE FUNCTION trg_frota_resumo();
+CREATE TRIGGER frota_resumo_update AFTER UPDATE OF placa, tipo_categoria, status_carro, ano, quilometragem ON Carro
+    FOR EACH ROW
+    WHEN ((OLD.placa, OLD.tipo_categoria, OLD.status_carro, OLD.ano, OLD.quilometragem)
+          IS DISTINCT FROM (NEW.placa, NEW.tipo_categoria, NEW.status_carro, NEW.ano, NEW.quilometragem))
+    EXECUTE FUNCTION trg_frota_resumo();
+
+SELECT recalcular_frota_resumo();
+
+COMMIT;
+
+ANALYZE FrotaResumo;
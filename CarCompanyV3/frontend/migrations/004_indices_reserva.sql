@@ -0,0 +1,17 @@
+-- ============================================
+-- MIGRAÇÃO 004: índices da reserva automática (POST /aluguel/auto)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- CREATE INDEX CONCURRENTLY não roda dentro de transação:
+-- execute com psql sem BEGIN/COMMIT (psql -f migrations/004_indices_reserva.sql).
+-- ============================================
+SET search_path TO aluguel;
+
+-- próximo carro livre de um modelo (lower(nome) = lower(modelo)) em ordem de placa
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_disponivel_modelo
+    ON Carro (lower(nome), placa) WHERE status_carro = 'DISPONIVEL';
+
+-- próximo carro livre de uma categoria em ordem de placa
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_disponivel_categoria
+    ON Carro (tipo_categoria, placa) WHERE status_carro = 'DISPONIVEL';
+
+ANALYZE Carro;
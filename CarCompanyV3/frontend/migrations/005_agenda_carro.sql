@@ -0,0 +1,138 @@
+-- ============================================
+-- MIGRAÇÃO 005: agenda dos carros (AgendaCarro)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Cria tabela, funções e triggers e preenche a agenda a
+-- partir de Aluguel/Devolucao/Manutencao, tudo em uma transação.
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+CREATE TABLE AgendaCarro (
+    origem VARCHAR(10) NOT NULL,
+    referencia INTEGER NOT NULL,
+    placa VARCHAR(10) NOT NULL,
+    periodo TSRANGE NOT NULL,
+    em_aberto BOOLEAN NOT NULL DEFAULT FALSE,
+
+    PRIMARY KEY (origem, referencia),
+    CHECK (origem IN ('ALUGUEL','MANUTENCAO'))
+);
+
+CREATE INDEX idx_agenda_periodo ON AgendaCarro USING gist (periodo);
+CREATE INDEX idx_agenda_aberta_fim ON AgendaCarro (upper(periodo)) WHERE em_aberto;
+
+CREATE FUNCTION sincronizar_agenda_aluguel(p_locacao INTEGER) RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO AgendaCarro AS ag (origem, referencia, placa, periodo, em_aberto)
+    SELECT
+        'ALUGUEL',
+        a.num_locacao,
+        a.placa,
+        tsrange(a.data_retirada,
+                GREATEST(a.data_retirada, COALESCE(d.data_real_devolucao, a.data_prevista_devolucao))),
+        d.num_locacao IS NULL
+    FROM Aluguel a
+    LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+    WHERE a.num_locacao = p_locacao
+    ON CONFLICT (origem, referencia) DO UPDATE SET
+        placa = EXCLUDED.placa,
+        periodo = EXCLUDED.periodo,
+        em_aberto = EXCLUDED.em_aberto;
+
+    IF NOT FOUND THEN
+        DELETE FROM AgendaCarro WHERE origem = 'ALUGUEL' AND referencia = p_locacao;
+    END IF;
+END;
+$$;
+
+CREATE FUNCTION sincronizar_agenda_manutencao(p_manutencao INTEGER) RETURNS VOID
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO AgendaCarro AS ag (origem, referencia, placa, periodo, em_aberto)
+    SELECT
+        'MANUTENCAO',
+        m.num_manutencao,
+        m.placa_carro,
+        tsrange(COALESCE(m.data_inicio, CURRENT_DATE)::timestamp,
+                CASE WHEN m.data_retorno IS NOT NULL
+                     THEN GREATEST(COALESCE(m.data_inicio, CURRENT_DATE), m.data_retorno)::timestamp
+                END),
+        FALSE
+    FROM Manutencao m
+    WHERE m.num_manutencao = p_manutencao
+    ON CONFLICT (origem, referencia) DO UPDATE SET
+        placa = EXCLUDED.placa,
+        periodo = EXCLUDED.periodo;
+
+    IF NOT FOUND THEN
+        DELETE FROM AgendaCarro WHERE origem = 'MANUTENCAO' AND referencia = p_manutencao;
+    END IF;
+END;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_agenda_carro() RETURNS VOID
+LANGUAGE sql AS $$
+    DELETE FROM AgendaCarro;
+    INSERT INTO AgendaCarro (origem, referencia, placa, periodo, em_aberto)
+    SELECT
+        'ALUGUEL',
+        a.num_locacao,
+        a.placa,
+        tsrange(a.data_retirada,
+                GREATEST(a.data_retirada, COALESCE(d.data_real_devolucao, a.data_prevista_devolucao))),
+        d.num_locacao IS NULL
+    FROM Aluguel a
+    LEFT JOIN Devolucao d ON d.num_locacao = a.num_locacao
+    UNION ALL
+    SELECT
+        'MANUTENCAO',
+        m.num_manutencao,
+        m.placa_carro,
+        tsrange(COALESCE(m.data_inicio, CURRENT_DATE)::timestamp,
+                CASE WHEN m.data_retorno IS NOT NULL
+                     THEN GREATEST(COALESCE(m.data_inicio, CURRENT_DATE), m.data_retorno)::timestamp
+                END),
+        FALSE
+    FROM Manutencao m;
+$$;
+
+-- Aluguel e Devolucao: sincroniza pela locação
+CREATE FUNCTION trg_agenda_aluguel() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM sincronizar_agenda_aluguel(OLD.num_locacao);
+    ELSE
+        PERFORM sincronizar_agenda_aluguel(NEW.num_locacao);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE FUNCTION trg_agenda_manutencao() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM sincronizar_agenda_manutencao(OLD.num_manutencao);
+    ELSE
+        PERFORM sincronizar_agenda_manutencao(NEW.num_manutencao);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER agenda_aluguel AFTER INSERT OR DELETE OR UPDATE OF placa, data_retirada, data_prevista_devolucao ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_agenda_aluguel();
+CREATE TRIGGER agenda_devolucao AFTER INSERT OR DELETE OR UPDATE OF data_real_devolucao ON Devolucao
+    FOR EACH ROW EXECUTE FUNCTION trg_agenda_aluguel();
+CREATE TRIGGER agenda_manutencao AFTER INSERT OR DELETE OR UPDATE OF placa_carro, data_inicio, data_retorno ON Manutencao
+    FOR EACH ROW EXECUTE FUNCTION trg_agenda_manutencao();
+
+SELECT recalcular_agenda_carro();
+
+COMMIT;
+
+ANALYZE AgendaCarro;
@@ -0,0 +1,29 @@
+-- ============================================
+-- MIGRAÇÃO 006: versão das tabelas do catálogo (ETag)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Requer a migração 005 (AgendaCarro).
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+CREATE SEQUENCE versao_carro;
+CREATE SEQUENCE versao_categoria;
+CREATE SEQUENCE versao_agendacarro;
+
+CREATE FUNCTION trg_versao_tabela() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM nextval('versao_' || lower(TG_TABLE_NAME));
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER versao_carro AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Carro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_categoria AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON Categoria
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_agendacarro AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON AgendaCarro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+
+COMMIT;
@@ -0,0 +1,73 @@
+-- ============================================
+-- MIGRAÇÃO 007: resumo por funcionário (FuncionarioResumo)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Cria tabela, funções e triggers e preenche os totais
+-- a partir de Aluguel, tudo em uma transação.
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+CREATE TABLE FuncionarioResumo (
+    num_funcionario INTEGER PRIMARY KEY,
+    total_alugueis INTEGER NOT NULL DEFAULT 0,
+    valor_total_vendas NUMERIC(14,2) NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (num_funcionario) REFERENCES Funcionario(num_funcionario) ON DELETE CASCADE
+);
+
+CREATE FUNCTION ajustar_funcionario_resumo(p_funcionario INTEGER, p_alugueis INTEGER, p_valor NUMERIC) RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO FuncionarioResumo AS f (num_funcionario, total_alugueis, valor_total_vendas)
+    VALUES (p_funcionario, p_alugueis, COALESCE(p_valor, 0))
+    ON CONFLICT (num_funcionario) DO UPDATE SET
+        total_alugueis = f.total_alugueis + EXCLUDED.total_alugueis,
+        valor_total_vendas = f.valor_total_vendas + EXCLUDED.valor_total_vendas;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_funcionario_resumo() RETURNS VOID
+LANGUAGE sql AS $$
+    LOCK TABLE Aluguel IN SHARE MODE;
+    DELETE FROM FuncionarioResumo;
+    INSERT INTO FuncionarioResumo (num_funcionario, total_alugueis, valor_total_vendas)
+    SELECT num_funcionario, COUNT(*), COALESCE(SUM(valor_previsto), 0)
+    FROM Aluguel
+    GROUP BY num_funcionario;
+$$;
+
+CREATE FUNCTION trg_funcionario_resumo() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM ajustar_funcionario_resumo(OLD.num_funcionario, -1, -OLD.valor_previsto);
+    ELSIF OLD.num_funcionario = NEW.num_funcionario THEN
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 0,
+                                           COALESCE(NEW.valor_previsto, 0) - COALESCE(OLD.valor_previsto, 0));
+    -- locação trocada de funcionário: duas linhas, sempre em ordem de chave
+    -- (mesmo cuidado contra deadlock do trg_frota_resumo)
+    ELSIF OLD.num_funcionario < NEW.num_funcionario THEN
+        PERFORM ajustar_funcionario_resumo(OLD.num_funcionario, -1, -OLD.valor_previsto);
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSE
+        PERFORM ajustar_funcionario_resumo(NEW.num_funcionario, 1, NEW.valor_previsto);
+        PERFORM ajustar_funcionario_resumo(OLD.num_funcionario, -1, -OLD.valor_previsto);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER funcionario_resumo AFTER INSERT OR DELETE ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_funcionario_resumo();
+CREATE TRIGGER funcionario_resumo_update AFTER UPDATE OF num_funcionario, valor_previsto ON Aluguel
+    FOR EACH ROW
+    WHEN ((OLD.num_funcionario, OLD.valor_previsto) IS DISTINCT FROM (NEW.num_funcionario, NEW.valor_previsto))
+    EXECUTE FUNCTION trg_funcionario_resumo();
+
+SELECT recalcular_funcionario_resumo();
+
+COMMIT;
+
+ANALYZE FuncionarioResumo;
@@ -0,0 +1,76 @@
+-- ============================================
+-- MIGRAÇÃO 008: vendas mensais por funcionário (VendasMensais)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Cria tabela, funções e triggers e preenche os totais
+-- a partir de Aluguel, tudo em uma transação.
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+CREATE TABLE VendasMensais (
+    mes DATE NOT NULL,
+    num_funcionario INTEGER NOT NULL,
+    total_alugueis INTEGER NOT NULL DEFAULT 0,
+    valor_total NUMERIC(14,2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (mes, num_funcionario),
+    FOREIGN KEY (num_funcionario) REFERENCES Funcionario(num_funcionario) ON DELETE CASCADE,
+    CHECK (mes = date_trunc('month', mes)::date)
+);
+
+CREATE FUNCTION ajustar_vendas_mensais(p_retirada TIMESTAMP, p_funcionario INTEGER,
+                                       p_alugueis INTEGER, p_valor NUMERIC) RETURNS VOID
+LANGUAGE sql AS $$
+    INSERT INTO VendasMensais AS v (mes, num_funcionario, total_alugueis, valor_total)
+    VALUES (date_trunc('month', p_retirada)::date, p_funcionario, p_alugueis, COALESCE(p_valor, 0))
+    ON CONFLICT (mes, num_funcionario) DO UPDATE SET
+        total_alugueis = v.total_alugueis + EXCLUDED.total_alugueis,
+        valor_total = v.valor_total + EXCLUDED.valor_total;
+$$;
+
+-- Reconstrução completa (carga inicial, migração, cargas em massa sem triggers)
+CREATE FUNCTION recalcular_vendas_mensais() RETURNS VOID
+LANGUAGE sql AS $$
+    LOCK TABLE Aluguel IN SHARE MODE;
+    DELETE FROM VendasMensais;
+    INSERT INTO VendasMensais (mes, num_funcionario, total_alugueis, valor_total)
+    SELECT date_trunc('month', data_retirada)::date, num_funcionario, COUNT(*), COALESCE(SUM(valor_previsto), 0)
+    FROM Aluguel
+    GROUP BY 1, 2;
+$$;
+
+CREATE FUNCTION trg_vendas_mensais() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM ajustar_vendas_mensais(NEW.data_retirada, NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM ajustar_vendas_mensais(OLD.data_retirada, OLD.num_funcionario, -1, -OLD.valor_previsto);
+    -- duas linhas (ou a mesma duas vezes): sempre em ordem de chave,
+    -- como em trg_frota_resumo
+    ELSIF (date_trunc('month', OLD.data_retirada), OLD.num_funcionario)
+        < (date_trunc('month', NEW.data_retirada), NEW.num_funcionario) THEN
+        PERFORM ajustar_vendas_mensais(OLD.data_retirada, OLD.num_funcionario, -1, -OLD.valor_previsto);
+        PERFORM ajustar_vendas_mensais(NEW.data_retirada, NEW.num_funcionario, 1, NEW.valor_previsto);
+    ELSE
+        PERFORM ajustar_vendas_mensais(NEW.data_retirada, NEW.num_funcionario, 1, NEW.valor_previsto);
+        PERFORM ajustar_vendas_mensais(OLD.data_retirada, OLD.num_funcionario, -1, -OLD.valor_previsto);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER vendas_mensais AFTER INSERT OR DELETE ON Aluguel
+    FOR EACH ROW EXECUTE FUNCTION trg_vendas_mensais();
+CREATE TRIGGER vendas_mensais_update AFTER UPDATE OF data_retirada, num_funcionario, valor_previsto ON Aluguel
+    FOR EACH ROW
+    WHEN ((OLD.data_retirada, OLD.num_funcionario, OLD.valor_previsto)
+          IS DISTINCT FROM (NEW.data_retirada, NEW.num_funcionario, NEW.valor_previsto))
+    EXECUTE FUNCTION trg_vendas_mensais();
+
+SELECT recalcular_vendas_mensais();
+
+COMMIT;
+
+ANALYZE VendasMensais;
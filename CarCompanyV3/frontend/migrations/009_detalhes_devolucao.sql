@@ -0,0 +1,26 @@
+-- ============================================
+-- MIGRAÇÃO 009: detalhes da devolução, multas e descontos
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Colunas gravadas por POST /aluguel/devolver: quilometragem e
+-- valor de danos da devolução, código/referência de cada multa
+-- e código de cada desconto. Linhas antigas ficam com NULL
+-- (valor_danos = 0).
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+ALTER TABLE Devolucao
+    ADD COLUMN km_registro INTEGER,
+    ADD COLUMN valor_danos NUMERIC(10,2) NOT NULL DEFAULT 0,
+    ADD CHECK (km_registro IS NULL OR km_registro >= 0),
+    ADD CHECK (valor_danos >= 0);
+
+ALTER TABLE Multa
+    ADD COLUMN codigo_motivo VARCHAR(20),
+    ADD COLUMN referencia VARCHAR(200);
+
+ALTER TABLE Desconto
+    ADD COLUMN codigo_desconto VARCHAR(20);
+
+COMMIT;
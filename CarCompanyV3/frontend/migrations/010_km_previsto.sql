@@ -0,0 +1,16 @@
+-- ============================================
+-- MIGRAÇÃO 010: franquia de quilometragem da locação
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Aluguel.km_previsto é a franquia contratada na reserva,
+-- usada pela multa de excesso de km na devolução. Locações
+-- antigas ficam com NULL (quilometragem livre).
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+ALTER TABLE Aluguel
+    ADD COLUMN km_previsto INTEGER,
+    ADD CHECK (km_previsto IS NULL OR km_previsto >= 0);
+
+COMMIT;
@@ -0,0 +1,76 @@
+-- ============================================
+-- MIGRAÇÃO 011: versão das tabelas transacional (ETag)
+-- Para bancos com a migração 006 aplicada.
+-- Troca as sequências versao_* (nextval aparece para os
+-- outros antes do COMMIT) pela tabela VersaoTabela, que
+-- avança junto com os dados e guarda o instante da mudança
+-- (Last-Modified igual em todos os workers).
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+DROP TRIGGER versao_carro ON Carro;
+DROP TRIGGER versao_categoria ON Categoria;
+DROP TRIGGER versao_agendacarro ON AgendaCarro;
+DROP FUNCTION trg_versao_tabela();
+
+-- ============================================
+-- 18. VERSÃO DAS TABELAS (ETag dos catálogos)
+-- Uma linha por tabela, avançada uma vez por transação que
+-- a altera. O trigger é de constraint, adiado para o COMMIT:
+-- a nova versão fica visível junto com os dados, nunca antes,
+-- e a linha só fica travada entre o trigger e o fim do COMMIT
+-- (reservas simultâneas não se enfileiram por ela).
+-- ============================================
+CREATE TABLE VersaoTabela (
+    tabela VARCHAR(50) PRIMARY KEY,
+    versao BIGINT NOT NULL DEFAULT 0,
+    modificado_em TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE FUNCTION trg_versao_tabela() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    marca TEXT := 'carcompany.versao_' || lower(TG_TABLE_NAME);
+BEGIN
+    -- trigger por linha: só a primeira linha da transação avança a versão
+    IF TG_LEVEL = 'ROW' AND current_setting(marca, true) IS NOT DISTINCT FROM '1' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM set_config(marca, '1', true);
+
+    INSERT INTO VersaoTabela AS v (tabela, versao, modificado_em)
+    VALUES (lower(TG_TABLE_NAME), 1, clock_timestamp())
+    ON CONFLICT (tabela) DO UPDATE SET
+        versao = v.versao + 1,
+        modificado_em = EXCLUDED.modificado_em;
+    RETURN NULL;
+END;
+$$;
+
+CREATE CONSTRAINT TRIGGER versao_carro AFTER INSERT OR UPDATE OR DELETE ON Carro
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+CREATE CONSTRAINT TRIGGER versao_categoria AFTER INSERT OR UPDATE OR DELETE ON Categoria
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+CREATE CONSTRAINT TRIGGER versao_agendacarro AFTER INSERT OR UPDATE OR DELETE ON AgendaCarro
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+-- TRUNCATE não tem trigger por linha; é raro, avança na hora
+CREATE TRIGGER versao_carro_truncate AFTER TRUNCATE ON Carro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_categoria_truncate AFTER TRUNCATE ON Categoria
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_agendacarro_truncate AFTER TRUNCATE ON AgendaCarro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+
+-- continua das versões atuais: ETags já emitidas não voltam a valer
+INSERT INTO VersaoTabela (tabela, versao)
+SELECT 'carro', last_value FROM versao_carro
+UNION ALL SELECT 'categoria', last_value FROM versao_categoria
+UNION ALL SELECT 'agendacarro', last_value FROM versao_agendacarro;
+
+DROP SEQUENCE versao_carro;
+DROP SEQUENCE versao_categoria;
+DROP SEQUENCE versao_agendacarro;
+
+COMMIT;
@@ -0,0 +1,87 @@
+-- ============================================
+-- MIGRAÇÃO 012: versões em fatias, gravadas em ordem fixa
+-- Para bancos com a migração 011 aplicada.
+-- A linha única por tabela travava no COMMIT todas as
+-- reservas e devoluções (uma esperava a outra) e podia dar
+-- deadlock entre transações que alteram carro e agendacarro
+-- em ordens diferentes. As versões atuais viram a fatia 0:
+-- a soma continua de onde estava (ETags emitidas seguem valendo).
+-- ============================================
+BEGIN;
+
+SET search_path TO aluguel;
+
+ALTER TABLE VersaoTabela ADD COLUMN fatia SMALLINT NOT NULL DEFAULT 0;
+ALTER TABLE VersaoTabela DROP CONSTRAINT versaotabela_pkey, ADD PRIMARY KEY (tabela, fatia);
+
+DROP FUNCTION trg_versao_tabela() CASCADE;
+
+-- por comando, na hora: só anota a tabela na transação (sem trava)
+CREATE FUNCTION trg_versao_pendente() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    alteradas TEXT := NULLIF(current_setting('carcompany.versao_alteradas', true), '');
+BEGIN
+    IF alteradas IS NULL OR NOT lower(TG_TABLE_NAME) = ANY (string_to_array(alteradas, ',')) THEN
+        PERFORM set_config('carcompany.versao_alteradas', concat_ws(',', alteradas, lower(TG_TABLE_NAME)), true);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- no COMMIT (por linha) ou no TRUNCATE: grava de uma vez as tabelas ainda não gravadas
+CREATE FUNCTION trg_versao_tabela() RETURNS TRIGGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    alteradas TEXT := NULLIF(current_setting('carcompany.versao_alteradas', true), '');
+    gravadas TEXT := NULLIF(current_setting('carcompany.versao_gravadas', true), '');
+    novas TEXT[];
+BEGIN
+    -- demais linhas da transação: tudo já gravado
+    IF alteradas IS NOT DISTINCT FROM gravadas AND lower(TG_TABLE_NAME) = ANY (string_to_array(gravadas, ',')) THEN
+        RETURN NULL;
+    END IF;
+    novas := ARRAY(
+        SELECT DISTINCT t
+        FROM unnest(string_to_array(alteradas, ',') || lower(TG_TABLE_NAME)::text) AS t
+        WHERE t <> ALL (COALESCE(string_to_array(gravadas, ','), '{}'))
+        ORDER BY t
+    );
+    IF cardinality(novas) = 0 THEN
+        RETURN NULL;
+    END IF;
+    gravadas := concat_ws(',', gravadas, array_to_string(novas, ','));
+    PERFORM set_config('carcompany.versao_alteradas', gravadas, true);
+    PERFORM set_config('carcompany.versao_gravadas', gravadas, true);
+
+    INSERT INTO VersaoTabela AS v (tabela, fatia, versao, modificado_em)
+    SELECT t, pg_backend_pid() % 16, 1, clock_timestamp()
+    FROM unnest(novas) AS t
+    ORDER BY t
+    ON CONFLICT (tabela, fatia) DO UPDATE SET
+        versao = v.versao + 1,
+        modificado_em = EXCLUDED.modificado_em;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER versao_carro_pendente AFTER INSERT OR UPDATE OR DELETE ON Carro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_pendente();
+CREATE TRIGGER versao_categoria_pendente AFTER INSERT OR UPDATE OR DELETE ON Categoria
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_pendente();
+CREATE TRIGGER versao_agendacarro_pendente AFTER INSERT OR UPDATE OR DELETE ON AgendaCarro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_pendente();
+CREATE CONSTRAINT TRIGGER versao_carro AFTER INSERT OR UPDATE OR DELETE ON Carro
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+CREATE CONSTRAINT TRIGGER versao_categoria AFTER INSERT OR UPDATE OR DELETE ON Categoria
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+CREATE CONSTRAINT TRIGGER versao_agendacarro AFTER INSERT OR UPDATE OR DELETE ON AgendaCarro
+    DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_carro_truncate AFTER TRUNCATE ON Carro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_categoria_truncate AFTER TRUNCATE ON Categoria
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+CREATE TRIGGER versao_agendacarro_truncate AFTER TRUNCATE ON AgendaCarro
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_versao_tabela();
+
+COMMIT;
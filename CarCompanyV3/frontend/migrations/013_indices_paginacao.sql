@@ -0,0 +1,27 @@
+-- ============================================
+-- MIGRAÇÃO 013: índices da paginação por chave (after=)
+-- Para bancos criados com uma versão anterior do banco.sql.
+-- Cada índice segue o ORDER BY da listagem: a próxima página
+-- começa no índice logo após a última chave, sem ler nem
+-- ordenar a tabela inteira.
+-- CREATE INDEX CONCURRENTLY não roda dentro de transação:
+-- execute com psql sem BEGIN/COMMIT (psql -f migrations/013_indices_paginacao.sql).
+-- ============================================
+SET search_path TO aluguel, public;
+
+-- GET /carros: ORDER BY nome, placa
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_nome_placa
+    ON Carro (nome, placa);
+
+-- GET /carros/disponiveis: mesma ordem, só os DISPONIVEL (substitui o índice só por nome)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carro_disponivel_nome_placa
+    ON Carro (nome, placa) WHERE status_carro = 'DISPONIVEL';
+DROP INDEX CONCURRENTLY IF EXISTS idx_carro_disponivel_nome;
+
+-- GET /clientes: ORDER BY nome, cpf
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_cliente_nome_cpf
+    ON Cliente (nome, cpf);
+
+-- GET /funcionarios: ORDER BY qnt_vendas DESC, nome, num_funcionario
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_funcionario_vendas_nome
+    ON Funcionario (qnt_vendas DESC, nome, num_funcionario);